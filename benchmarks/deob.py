@@ -0,0 +1,69 @@
+"""
+Compare the latency of disassembling bytecode in process with `dis` against
+running pycdas over it.
+
+Usage:
+
+    python benchmarks/deob.py [--repeat N] [module ...]
+
+Each module (by default, a few from the standard library) is compiled by the
+running Python, so its bytecode is always eligible for the in-process backend.
+"""
+
+import argparse
+import importlib.util
+import marshal
+import shutil
+import statistics
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inspector import deob  # noqa: E402
+
+DEFAULT_MODULES = ["json.decoder", "argparse", "typing"]
+
+
+def _pyc(module: str) -> bytes:
+    spec = importlib.util.find_spec(module)
+    source = Path(spec.origin).read_text()
+    code = compile(source, spec.origin, "exec")
+    return importlib.util.MAGIC_NUMBER + bytes(12) + marshal.dumps(code)
+
+
+def _time(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    has_pycdas = shutil.which("pycdas") is not None
+    print(f"{'module':<20} {'bytes':>9} {'dis (ms)':>10} {'pycdas (ms)':>12}")
+    for module in args.modules:
+        pyc = _pyc(module)
+        in_process = _time(lambda: deob._disassemble_in_process(pyc), args.repeat)
+        if has_pycdas:
+            subprocess = _time(lambda: deob._run("pycdas", pyc), args.repeat)
+            subprocess_ms = f"{subprocess * 1000:12.2f}"
+        else:
+            subprocess_ms = f"{'n/a':>12}"
+        print(f"{module:<20} {len(pyc):>9} {in_process * 1000:10.2f} {subprocess_ms}")
+
+    if not has_pycdas:
+        print("\npycdas was not found on PATH, so only dis was timed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Deterministic inputs for the benchmarks: wheels and sdists of varying size
+and member count, a corpus of text in several encodings, and a list of
+release versions.
+
+Everything is generated from fixed seeds, with fixed timestamps in the
+archives, so every run (on any machine) times exactly the same bytes. The
+digests of the archives are recorded with the results to check that.
+"""
+
+import gzip
+import io
+import os
+import random
+import tarfile
+import zipfile
+
+from hashlib import sha256
+
+PROJECT = "bench"
+VERSION = "1.0"
+
+# Member count, and approximate size of each member, of each archive
+SIZES = {
+    "small": (20, 2 * 1024),
+    "medium": (500, 8 * 1024),
+    "large": (5000, 4 * 1024),
+}
+
+# A large source file, to be shown a window of lines at a time, and a blob of
+# random bytes, as in a binary wheel.
+LARGE_MEMBER = f"{PROJECT}/generated.py"
+LARGE_MEMBER_BYTES = 4 * 1024 * 1024
+BLOB_MEMBER = f"{PROJECT}/_native.so"
+BLOB_MEMBER_BYTES = 1024 * 1024
+
+WORDS = (
+    "def class return import from self value result items key data name path "
+    "None True False if else for in while with as try except raise yield lambda "
+    "len range dict list str int bytes open read write print format join split"
+).split()
+
+# Text in each encoding that `decode_with_fallback` should recognize
+SAMPLES = {
+    "ascii": "def greet(name):\n    return f'Hello, {name}!'\n",
+    "utf-8": "# Ünïcödé: 你好, мир, こんにちは\nname = 'Zoë'\n",
+    "latin-1": "# Définition des paramètres généraux\nété = 'à côté'\n",
+    "cp1252": "# “Smart quotes” — and a dash… €100\nprice = 100\n",
+    "shift_jis": "# 日本語のコメントです。設定を読み込みます。\n",
+    "euc-kr": "# 한국어 주석입니다. 설정을 불러옵니다.\n",
+    "gb2312": "# 这是中文注释。正在加载配置。\n",
+    "big5": "# 這是中文註解。正在載入設定。\n",
+    "koi8-r": "# Это комментарий на русском языке.\n",
+}
+CORPUS_BYTES = 32 * 1024
+
+
+def _source(rng: random.Random, size: int, pool: list[str]) -> bytes:
+    lines, length = [], 0
+    while length < size:
+        line = rng.choice(pool)
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode()
+
+
+def members(count: int, size: int, seed: int = 0) -> dict[str, bytes]:
+    """
+    The members of an archive: `count` Python-like sources of about `size`
+    bytes each, spread over nested packages.
+    """
+    rng = random.Random(seed)
+    pool = [
+        " " * 4 * rng.randrange(3)
+        + " ".join(rng.choices(WORDS, k=rng.randrange(12)))
+        + "\n"
+        for _ in range(512)
+    ]
+    files = {}
+    for i in range(count):
+        package = "/".join(f"pkg{n}" for n in (i % 7, i % 5, i % 3)[: i % 4])
+        path = f"{PROJECT}/{package}/module{i}.py".replace("//", "/")
+        files[path] = _source(rng, size, pool)
+    files[LARGE_MEMBER] = _source(rng, LARGE_MEMBER_BYTES, pool)
+    files[BLOB_MEMBER] = rng.randbytes(BLOB_MEMBER_BYTES)
+    return files
+
+
+def wheel(files: dict[str, bytes]) -> bytes:
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data)
+    return f.getvalue()
+
+
+def sdist(files: dict[str, bytes]) -> bytes:
+    f = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=f, mtime=0) as gz:
+        with tarfile.open(fileobj=gz, mode="w", format=tarfile.PAX_FORMAT) as tf:
+            for name, data in files.items():
+                info = tarfile.TarInfo(f"{PROJECT}-{VERSION}/{name}")
+                info.size = len(data)
+                info.mode = 0o644
+                tf.addfile(info, io.BytesIO(data))
+    return f.getvalue()
+
+
+def filename(kind: str, size: str) -> str:
+    if kind == "wheel":
+        return f"{PROJECT}_{size}-{VERSION}-py3-none-any.whl"
+    return f"{PROJECT}_{size}-{VERSION}.tar.gz"
+
+
+def build(directory: str) -> dict[tuple[str, str], str]:
+    """
+    Write a wheel and an sdist of each size into `directory`. Returns their
+    paths, by kind and size.
+    """
+    paths = {}
+    for seed, (size, (count, member_size)) in enumerate(SIZES.items()):
+        files = members(count, member_size, seed)
+        for kind, archive in (("wheel", wheel), ("sdist", sdist)):
+            path = os.path.join(directory, filename(kind, size))
+            with open(path, "wb") as f:
+                f.write(archive(files))
+            paths[kind, size] = path
+    return paths
+
+
+def digests(paths: dict[tuple[str, str], str]) -> dict[str, str]:
+    result = {}
+    for path in sorted(paths.values()):
+        with open(path, "rb") as f:
+            result[os.path.basename(path)] = sha256(f.read()).hexdigest()
+    return result
+
+
+def corpus() -> dict[str, bytes]:
+    """
+    About `CORPUS_BYTES` of text in each encoding of `SAMPLES`, and of random
+    bytes.
+    """
+    texts = {}
+    for encoding, sample in SAMPLES.items():
+        text = sample.encode(encoding) * (CORPUS_BYTES // len(sample) + 1)
+        # Cut on a line boundary, so multi-byte encodings stay valid.
+        text = text[:CORPUS_BYTES]
+        texts[encoding] = text[: text.rindex(b"\n") + 1]
+    texts["binary"] = random.Random(0).randbytes(CORPUS_BYTES)
+    return texts
+
+
+def versions(count: int = 2000, seed: int = 0) -> list[str]:
+    """
+    Release versions as found on PyPI, mostly PEP 440 with some legacy ones,
+    in no particular order.
+    """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        release = ".".join(str(rng.randrange(20)) for _ in range(rng.randrange(1, 4)))
+        suffix = rng.choice(
+            ["", "", "", "a1", "b2", "rc1", ".post1", ".dev3", "-beta", "-2004d", "x"]
+        )
+        result.append(release + suffix)
+    return result
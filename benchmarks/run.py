@@ -0,0 +1,221 @@
+"""
+Time Inspector's hot paths over deterministic fixtures, and compare the
+results against a baseline.
+
+Usage:
+
+    python benchmarks/run.py [--repeat N] [--output FILE] [--baseline FILE]
+                             [--threshold FRACTION] [pattern ...]
+
+Each benchmark is timed like `timeit` does: a call is repeated enough times
+to take a measurable while, and that is sampled `--repeat` times. The fastest
+sample is the one compared, as the others mostly measure noise from the rest
+of the machine. Patterns (like "dist.*") select benchmarks by name.
+
+Results are written as JSON to `--output`. Given a `--baseline` (the output
+of an earlier run), each benchmark is compared with it, and the exit status
+is 1 if any got slower by more than `--threshold`.
+"""
+
+import argparse
+import fnmatch
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+import fixtures
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inspector.main  # noqa: E402
+
+from inspector.analysis.entropy import shannon_entropy  # noqa: E402
+from inspector.charset import decode_with_fallback  # noqa: E402
+from inspector.distribution import (  # noqa: E402
+    TarGzDistribution,
+    ZipDistribution,
+    _map,
+)
+from inspector.legacy import parse  # noqa: E402
+
+CLASSES = {"wheel": ZipDistribution, "sdist": TarGzDistribution}
+
+
+def _open(kind: str, path: str):
+    with open(path, "rb") as f:
+        return CLASSES[kind](_map(f))
+
+
+def _member(kind: str, name: str) -> str:
+    if kind == "sdist":
+        return f"{fixtures.PROJECT}-{fixtures.VERSION}/{name}"
+    return name
+
+
+def _metadata(**json):
+    return SimpleNamespace(status_code=200, json=lambda: json)
+
+
+def _stub_upstream(dists: dict) -> None:
+    """
+    Serve metadata and distributions from the fixtures, rather than PyPI.
+    """
+    versions = fixtures.versions()
+    inspector.main.project_metadata = lambda project_name: _metadata(
+        releases={version: [] for version in versions}
+    )
+    inspector.main.release_metadata = lambda project_name, version: _metadata(urls=[])
+    inspector.main._get_dist = lambda first, second, rest, distname: dists[distname]
+
+
+def benchmarks(paths: dict[tuple[str, str], str]) -> dict[str, Callable]:
+    """
+    The benchmarks over the fixtures at `paths`, by name.
+    """
+    suite = {}
+    dists = {}
+    for (kind, size), path in paths.items():
+        dist = dists[fixtures.filename(kind, size)] = _open(kind, path)
+        small = dist.namelist()[0]
+        large = _member(kind, fixtures.LARGE_MEMBER)
+        suite[f"dist.open.{kind}.{size}"] = lambda k=kind, p=path: _open(k, p)
+        suite[f"dist.namelist.{kind}.{size}"] = dist.namelist
+        suite[f"dist.contents.{kind}.{size}"] = lambda d=dist, m=small: d.contents(m)
+        if size == "large":
+            suite[f"dist.contents.{kind}.{size}.large-member"] = (
+                lambda d=dist, m=large: d.contents(m)
+            )
+
+    blob = dists[fixtures.filename("wheel", "small")].contents(fixtures.BLOB_MEMBER)
+    source = dists[fixtures.filename("wheel", "small")].contents(fixtures.LARGE_MEMBER)
+    suite["entropy.binary"] = lambda: shannon_entropy(blob)
+    suite["entropy.source"] = lambda: shannon_entropy(source)
+
+    for encoding, text in fixtures.corpus().items():
+        suite[f"charset.{encoding}"] = lambda t=text: decode_with_fallback(t)
+
+    versions = fixtures.versions()
+    suite["versions.sort"] = lambda: sorted(versions, key=parse, reverse=True)
+
+    _stub_upstream(dists)
+    client = inspector.main.app.test_client()
+    project = f"/project/{fixtures.PROJECT}/{fixtures.VERSION}"
+
+    def get(url):
+        def request():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+
+        return request
+
+    def dist_url(kind, size, member=""):
+        return f"{project}/packages/ab/cd/ef/{fixtures.filename(kind, size)}/{member}"
+
+    suite["request.versions"] = get(f"/project/{fixtures.PROJECT}/")
+    suite["request.distributions"] = get(f"{project}/")
+    suite["request.distribution.wheel.medium"] = get(dist_url("wheel", "medium"))
+    suite["request.distribution.sdist.large"] = get(dist_url("sdist", "large"))
+    first = dists[fixtures.filename("wheel", "medium")].namelist()[0]
+    suite["request.file.wheel.medium"] = get(dist_url("wheel", "medium", first))
+    suite["request.file.sdist.large.large-member"] = get(
+        dist_url("sdist", "large", _member("sdist", fixtures.LARGE_MEMBER))
+    )
+    return suite
+
+
+def measure(fn: Callable, repeat: int) -> dict[str, float]:
+    """
+    Time `fn`, in seconds per call.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    samples = [total / number for total in timer.repeat(repeat, number)]
+    return {
+        "number": number,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Print how each benchmark compares with `baseline`. Returns the names of
+    those slower by more than `threshold`.
+    """
+    if results["fixtures"] != baseline.get("fixtures"):
+        print("Warning: the fixtures differ from the baseline's.\n")
+
+    regressions = []
+    print(f"{'benchmark':<45} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, timing in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            print(f"{name:<45} {'n/a':>12} {_format(timing['min']):>12}")
+            continue
+        before = baseline["benchmarks"][name]["min"]
+        change = timing["min"] / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  slower"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(
+            f"{name:<45} {_format(before):>12} {_format(timing['min']):>12}"
+            f" {change:>+8.1%}{flag}"
+        )
+    return regressions
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("patterns", nargs="*", default=["*"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = fixtures.build(directory)
+        suite = benchmarks(paths)
+        results = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "fixtures": fixtures.digests(paths),
+            "benchmarks": {},
+        }
+        for name, fn in suite.items():
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in args.patterns):
+                results["benchmarks"][name] = timing = measure(fn, args.repeat)
+                if args.baseline is None:
+                    print(f"{name:<45} {_format(timing['min']):>12}")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
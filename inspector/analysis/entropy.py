@@ -1,14 +1,203 @@
-import collections
+import os
 
 from math import log2
+from typing import NamedTuple
+
+import numpy
+
+# Size and step, in bytes, of the window used for entropy profiles.
+ENTROPY_WINDOW = int(os.environ.get("INSPECTOR_ENTROPY_WINDOW", 4096))
+ENTROPY_STRIDE = int(os.environ.get("INSPECTOR_ENTROPY_STRIDE", 1024))
+
+
+class ByteHistogram:
+    """
+    Counts of each byte value, built up incrementally over chunks.
+
+    Each chunk is counted with a single `numpy.bincount` over a zero-copy view
+    of it, rather than one Python-level step per byte. The order in which byte
+    values first appeared is kept too, so that `entropy()` sums its terms in
+    the same order as it would over a `collections.Counter`, and gives exactly
+    the same result.
+    """
+
+    def __init__(self, data: bytes = b""):
+        self.counts = numpy.zeros(256, dtype=numpy.int64)
+        self.total = 0
+        self._order: list[int] = []
+        self.update(data)
+
+    def update(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+
+        counts = numpy.bincount(
+            numpy.frombuffer(chunk, dtype=numpy.uint8), minlength=256
+        )
+        new = numpy.flatnonzero((counts > 0) & (self.counts == 0)).tolist()
+        if new:
+            # At most 256 byte values are ever new, so searching the chunk
+            # for each of them is cheap.
+            positions = {b: chunk.find(bytes((b,))) for b in new}
+            self._order.extend(sorted(new, key=positions.__getitem__))
+
+        self.counts += counts
+        self.total += len(chunk)
+
+    def entropy(self) -> float:
+        result = 0.0
+
+        for b in self._order:
+            pr = int(self.counts[b]) / self.total
+            result -= pr * log2(pr)
+
+        return result
 
 
 def shannon_entropy(X: bytes):
-    result = 0.0
+    return ByteHistogram(X).entropy()
+
+
+class Region(NamedTuple):
+    """
+    A run of overlapping high-entropy windows.
+    """
+
+    #: Byte offsets of the region, the end being exclusive
+    start: int
+    end: int
+    #: Lines the region spans, to the nearest stride
+    first_line: int
+    last_line: int
+    #: Highest entropy of any window in the region
+    peak: float
+
+
+def _window_entropies(counts: numpy.ndarray, size: int) -> numpy.ndarray:
+    """
+    The entropy of each row of byte counts, for windows of `size` bytes.
+    """
+    p = counts / size
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        terms = numpy.where(counts > 0, p * numpy.log2(p), 0.0)
+    return -terms.sum(axis=1)
+
+
+class EntropyProfile:
+    """
+    The entropy of a window sliding over contents, built up incrementally over
+    chunks.
+
+    Contents are cut into `stride`-byte blocks, and each chunk's blocks are
+    counted with a single `bincount`. Windows span a whole number of blocks
+    (`window` is rounded up to a multiple of `stride`), so each window's
+    histogram is the difference of two running sums of block histograms, and
+    a whole profile costs O(n + 256 * n / stride).
+    """
+
+    def __init__(self, window: int = ENTROPY_WINDOW, stride: int = ENTROPY_STRIDE):
+        if window <= 0 or stride <= 0:
+            raise ValueError("window and stride must be positive")
+        self.stride = stride
+        self.blocks_per_window = -(-window // stride)
+        self.window = self.blocks_per_window * stride
+        self.total = 0
+
+        # Bytes of the last, incomplete block
+        self._pending = b""
+        # Histograms of the last `blocks_per_window - 1` complete blocks
+        self._tail = numpy.zeros((0, 256), dtype=numpy.int64)
+        self._entropies: list[numpy.ndarray] = []
+        self._newlines: list[numpy.ndarray] = []
+        self._finished = False
+
+    def update(self, chunk: bytes) -> None:
+        if self._finished:
+            raise ValueError("profile is already finished")
+        self.total += len(chunk)
+        if self._pending:
+            # Less than a block is ever pending, so this copy stays small.
+            chunk = self._pending + chunk
+        complete = len(chunk) - len(chunk) % self.stride
+        self._pending = chunk[complete:]
+        if complete:
+            data = numpy.frombuffer(chunk, dtype=numpy.uint8, count=complete)
+            self._add_blocks(data.reshape(-1, self.stride))
+
+    def _add_blocks(self, blocks: numpy.ndarray) -> None:
+        # Offset each block's bytes into its own 256 bins, and count them all
+        # at once.
+        nblocks = len(blocks)
+        bins = blocks + (numpy.arange(nblocks, dtype=numpy.intp) * 256)[:, None]
+        counts = numpy.bincount(bins.ravel(), minlength=nblocks * 256)
+        self._add_histograms(counts.reshape(nblocks, 256), self.stride)
+
+    def _add_histograms(self, histograms: numpy.ndarray, last_size: int) -> None:
+        self._newlines.append(histograms[:, ord("\n")].copy())
+
+        histograms = numpy.concatenate([self._tail, histograms])
+        m = self.blocks_per_window
+        if len(histograms) >= m:
+            sums = numpy.zeros((len(histograms) + 1, 256), dtype=numpy.int64)
+            numpy.cumsum(histograms, axis=0, out=sums[1:])
+            windows = sums[m:] - sums[:-m]
+            sizes = numpy.full(len(windows), self.window)
+            sizes[-1] -= self.stride - last_size
+            self._entropies.append(_window_entropies(windows, sizes[:, None]))
+        self._tail = histograms[max(0, len(histograms) - (m - 1)) :]  # noqa: E203
+
+    def finish(self) -> None:
+        """
+        Called once all chunks have been added, to count the last block.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        if self._pending:
+            data = numpy.frombuffer(self._pending, dtype=numpy.uint8)
+            counts = numpy.bincount(data, minlength=256)
+            self._add_histograms(counts[None, :], len(self._pending))
+            self._pending = b""
+
+    def entropies(self) -> numpy.ndarray:
+        """
+        The entropy of each window, window `i` starting at byte `i * stride`.
+        Contents shorter than a window have no windows at all.
+        """
+        self.finish()
+        if not self._entropies:
+            return numpy.zeros(0)
+        return numpy.concatenate(self._entropies)
+
+    def regions(self, threshold: float) -> list[Region]:
+        """
+        The regions where the entropy of the window rises above `threshold`.
+        """
+        entropies = self.entropies()
+        flagged = numpy.flatnonzero(entropies > threshold)
+        if not len(flagged):
+            return []
 
-    items = collections.Counter(X).items()
-    for b, count in items:
-        pr = count / len(X)
-        result -= pr * log2(pr)
+        # Flagged windows that overlap or touch make up a single region.
+        m = self.blocks_per_window
+        breaks = numpy.flatnonzero(numpy.diff(flagged) > m)
+        firsts = flagged[numpy.concatenate([[0], breaks + 1])]
+        lasts = flagged[numpy.concatenate([breaks, [len(flagged) - 1]])]
 
-    return result
+        newlines = numpy.concatenate(
+            [[0], numpy.cumsum(numpy.concatenate(self._newlines))]
+        )
+        nblocks = len(newlines) - 1
+        regions = []
+        for first, last in zip(firsts.tolist(), lasts.tolist()):
+            end_block = min(last + m, nblocks)
+            regions.append(
+                Region(
+                    start=first * self.stride,
+                    end=min(end_block * self.stride, self.total),
+                    first_line=int(newlines[first]) + 1,
+                    last_line=int(newlines[end_block]) + 1,
+                    peak=float(entropies[first : last + 1].max()),  # noqa: E203
+                )
+            )
+        return regions
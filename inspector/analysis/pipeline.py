@@ -0,0 +1,196 @@
+"""
+This module contains the single-pass analysis pipeline for distribution members.
+
+A member's contents are read once, as a stream of chunks, and every registered
+analyzer sees each chunk in turn. The contents themselves are kept as well, so
+the views can render them without reading the member a second time.
+"""
+
+import io
+import time
+
+from dataclasses import dataclass, field
+from hashlib import sha256
+from typing import Any, Iterator
+
+from inspector import metrics
+from inspector.analysis.codedetails import Detail, DetailSeverity
+from inspector.analysis.entropy import ByteHistogram, EntropyProfile, Region
+from inspector.distribution import Distribution
+
+# Entropy (in bits per byte) above which contents are flagged.
+HIGH_ENTROPY = 6.0
+
+# Number of high-entropy regions listed individually in the details.
+MAX_LISTED_REGIONS = 5
+
+
+class Analyzer:
+    """
+    Base class for analyzers, which see a member's contents chunk by chunk.
+    """
+
+    #: Key of the analyzer's result in `Analysis.results`
+    name: str
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def update(self, chunk: bytes) -> None:
+        pass
+
+    def result(self) -> Any:
+        return None
+
+    def details(self) -> Iterator[Detail]:
+        return iter(())
+
+
+class Sha256Analyzer(Analyzer):
+    name = "sha256"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self.hash = sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self.hash.update(chunk)
+
+    def result(self) -> str:
+        return self.hash.hexdigest()
+
+    def details(self) -> Iterator[Detail]:
+        yield Detail(
+            severity=DetailSeverity.NORMAL,
+            prop_name="SHA-256",
+            value=self.result(),
+        )
+
+
+class EntropyAnalyzer(Analyzer):
+    name = "entropy"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self.histogram = ByteHistogram()
+
+    def update(self, chunk: bytes) -> None:
+        self.histogram.update(chunk)
+
+    def result(self) -> float:
+        return self.histogram.entropy()
+
+    def details(self) -> Iterator[Detail]:
+        entropy = self.result()
+        ent_suspicious = entropy > HIGH_ENTROPY
+        yield Detail(
+            severity=DetailSeverity.HIGH if ent_suspicious else DetailSeverity.NORMAL,
+            prop_name="Entropy",
+            value=str(entropy) + " (HIGH)" if ent_suspicious else str(entropy),
+        )
+
+
+class EntropyRegionsAnalyzer(Analyzer):
+    """
+    Flags the regions of a member whose entropy spikes, e.g. a packed or
+    encrypted payload hidden in an otherwise ordinary source file.
+    """
+
+    name = "entropy_regions"
+
+    def __init__(self, filepath: str):
+        super().__init__(filepath)
+        self.profile = EntropyProfile()
+
+    def update(self, chunk: bytes) -> None:
+        self.profile.update(chunk)
+
+    def result(self) -> list[Region]:
+        return self.profile.regions(HIGH_ENTROPY)
+
+    def details(self) -> Iterator[Detail]:
+        regions = self.result()
+        if regions and regions[0].end - regions[0].start == self.profile.total:
+            # The whole member is high-entropy, as its overall entropy says.
+            return
+
+        for region in regions[:MAX_LISTED_REGIONS]:
+            yield Detail(
+                severity=DetailSeverity.HIGH,
+                prop_name="High-Entropy Region",
+                value=(
+                    f"bytes {region.start}-{region.end}, "
+                    f"lines {region.first_line}-{region.last_line} "
+                    f"(peak {region.peak:.2f})"
+                ),
+            )
+        if len(regions) > MAX_LISTED_REGIONS:
+            yield Detail(
+                severity=DetailSeverity.HIGH,
+                prop_name="High-Entropy Regions",
+                value=f"{len(regions) - MAX_LISTED_REGIONS} more",
+            )
+
+
+class CompiledAnalyzer(Analyzer):
+    name = "compiled"
+
+    def result(self) -> bool:
+        return self.filepath.endswith(".pyc") or self.filepath.endswith(".pyo")
+
+    def details(self) -> Iterator[Detail]:
+        if self.result():
+            yield Detail(
+                severity=DetailSeverity.MEDIUM, prop_name="Compiled Python Bytecode"
+            )
+
+
+# Analyzers run over every member, in the order their details are shown.
+ANALYZERS: list[type[Analyzer]] = [
+    Sha256Analyzer,
+    EntropyAnalyzer,
+    EntropyRegionsAnalyzer,
+    CompiledAnalyzer,
+]
+
+
+@dataclass
+class Analysis:
+    contents: bytes
+    details: list[Detail] = field(default_factory=list)
+    results: dict[str, Any] = field(default_factory=dict)
+
+
+def analyze(distribution: Distribution, filepath: str) -> Analysis:
+    """
+    Read `filepath` from `distribution` once, running every analyzer over it.
+    """
+    analyzers = [analyzer(filepath) for analyzer in ANALYZERS]
+    # Time spent reading (and decompressing) the member, and in each analyzer
+    read, elapsed = 0.0, [0.0] * len(analyzers)
+
+    contents = io.BytesIO()
+    chunks = distribution.iter_contents(filepath)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        read += time.perf_counter() - start
+        if chunk is None:
+            break
+        contents.write(chunk)
+        for i, analyzer in enumerate(analyzers):
+            start = time.perf_counter()
+            analyzer.update(chunk)
+            elapsed[i] += time.perf_counter() - start
+
+    analysis = Analysis(contents=contents.getvalue())
+    for i, analyzer in enumerate(analyzers):
+        start = time.perf_counter()
+        analysis.results[analyzer.name] = analyzer.result()
+        analysis.details.extend(analyzer.details())
+        elapsed[i] += time.perf_counter() - start
+
+    metrics.record("read", read)
+    for analyzer, seconds in zip(analyzers, elapsed):
+        metrics.record(f"analyze.{analyzer.name}", seconds)
+    return analysis
@@ -0,0 +1,353 @@
+"""
+This module contains the static asset pipeline: a build step that splits
+Prism into a core and per-language chunks, fingerprints every asset and
+precompresses it, and the lookups that serve the result.
+
+Build with `bin/build-assets`. Without a build, pages fall back to the
+unprocessed files in `inspector/static/`.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+
+from hashlib import sha256
+from typing import NamedTuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+BUILD_DIR = os.path.join(STATIC_DIR, "build")
+MANIFEST = "manifest.json"
+
+# Precompressed variants of each built asset, in order of preference.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_FINGERPRINT_RE = re.compile(r"(.*)\.[0-9a-f]{16}(\.[^./]+)")
+
+# A top-level statement starts in the first column, unless it's closing one.
+_STATEMENT_RE = re.compile(r"[^\s})\];]")
+_NAME = r"(?:\.([\w$]+)|\[\s*['\"]([\w-]+)['\"]\s*\])"
+# `Prism.languages.foo = ...`, and whether it's an alias of another language
+_DEFINITION_RE = re.compile(
+    rf"Prism\.languages{_NAME}\s*=(?!=)\s*(?:Prism\.languages{_NAME}\s*;)?"
+)
+_REFERENCE_RE = re.compile(
+    rf"(?:Prism\.)?languages\.(?:extend|insertBefore)\(\s*['\"]([\w-]+)"
+    rf"|Prism\.languages{_NAME}"
+)
+# Changes to another language's grammar: inserting tokens, assigning to its
+# tokens, or embedding in markup.
+_MODIFICATION_RE = re.compile(
+    rf"languages\.insertBefore\(\s*['\"]([\w-]+)"
+    rf"|Prism\.languages{_NAME}(?:\.[\w$]+|\[[^\]\n]+\])+\s*=(?!=)"
+)
+# `if (Prism.languages.foo)`, or `var foo = Prism.languages.foo; if (foo)`
+_GUARD_RE = re.compile(
+    rf"if\s*\(\s*Prism\.languages{_NAME}\s*\)"
+    rf"|var\s+([\w$]+)\s*=\s*Prism\.languages{_NAME};?\s*if\s*\(\s*\3\s*\)"
+)
+_MARKUP_EMBEDDING_RE = re.compile(r"\.tag\.add(?:Inlined|Attribute)\(")
+# Doc comments, like JSDoc, added to other languages by "javadoclike"
+_DOC_SUPPORT_RE = re.compile(r"\.addSupport\(\s*(\[[^\]]*\]|'[^']*')")
+_PLUGIN_RE = re.compile(r"Prism\.plugins\.[\w$]+\s*=(?!=)")
+
+
+class Chunk(NamedTuple):
+    #: Name of the chunk, after the first language it defines
+    name: str
+    source: str
+    #: Languages it defines, including aliases
+    languages: frozenset[str]
+    #: Other languages it needs to be loaded first
+    requires: frozenset[str]
+    #: Other languages it adds to, if they're loaded
+    modifies: frozenset[str]
+
+
+def _name(match: re.Match, group: int = 1) -> str:
+    return match.group(group) or match.group(group + 1)
+
+
+def _statements(source: str) -> list[str]:
+    """
+    Split `source` into its top-level statements, each with the comments
+    preceding it.
+    """
+    statements, current = [], []
+    code = comment = False
+    for line in source.splitlines(keepends=True):
+        starts = not comment and _STATEMENT_RE.match(line)
+        if starts and code:
+            statements.append("".join(current))
+            current, code = [], False
+        current.append(line)
+        if comment or line.startswith("/*"):
+            comment = "*/" not in line
+        elif starts and not line.startswith("//"):
+            code = True
+    statements.append("".join(current))
+    return statements
+
+
+def _defines(statement: str, languages: set[str]) -> bool:
+    """
+    Whether `statement` starts a new chunk, after a chunk defining
+    `languages`: it defines a new language, or an alias of a language
+    defined elsewhere.
+    """
+    for match in _DEFINITION_RE.finditer(statement):
+        if alias := _name(match, 3):
+            if alias not in languages:
+                return True
+        elif _name(match) not in languages:
+            return True
+    return False
+
+
+def _code(text: str) -> str:
+    """
+    `text` without its comment lines, which hold examples that would look
+    like code.
+    """
+    return "".join(
+        line
+        for line in text.splitlines(keepends=True)
+        if not line.lstrip().startswith(("/*", "*", "//"))
+    )
+
+
+def _modifies(code: str) -> set[str]:
+    modifies = {m.group(1) or _name(m, 2) for m in _MODIFICATION_RE.finditer(code)}
+    if _MARKUP_EMBEDDING_RE.search(code):
+        modifies.add("markup")
+    for match in _DOC_SUPPORT_RE.finditer(code):
+        modifies.update(re.findall(r"['\"]([\w-]+)['\"]", match.group(1)))
+    return modifies
+
+
+def _mentions(code: str, languages: set[str]) -> bool:
+    return any(
+        re.search(rf"['\"]{re.escape(name)}['\"]|\.{re.escape(name)}\b", code)
+        for name in languages
+    )
+
+
+def split_prism(source: str) -> tuple[str, list[Chunk]]:
+    """
+    Split a Prism bundle into its core (with any plugins) and chunks of
+    languages, which is how Prism's components are written: each chunk is a
+    run of top-level statements from one that defines a language up to the
+    next, or from one that only adds to languages defined elsewhere (like
+    "css-extras"). Returns the core and the chunks.
+    """
+    core, plugins, runs = [], [], []
+    languages: set[str] = set()
+    for statement in _statements(source):
+        code = _code(statement)
+        if plugins or runs and _PLUGIN_RE.search(code):
+            plugins.append(statement)
+        elif _defines(code, languages) or (
+            runs and _modifies(code) and not _mentions(code, languages)
+        ):
+            runs.append([statement])
+            languages = set()
+        elif runs:
+            runs[-1].append(statement)
+        else:
+            core.append(statement)
+            continue
+        languages.update(_name(m) for m in _DEFINITION_RE.finditer(code))
+
+    chunks = []
+    defined: dict[str, str] = {}
+    for run in runs:
+        text = "".join(run)
+        code = _code(text)
+        names = [_name(m) for m in _DEFINITION_RE.finditer(code)]
+        modifies = _modifies(code)
+        if names:
+            name = names[0]
+        else:
+            # Named after what it adds to, like "css-extras"
+            name = base = f"{min(modifies)}-extras"
+            while any(chunk.name == name for chunk in chunks):
+                name = (
+                    f"{base}-{sum(chunk.name.startswith(base) for chunk in chunks) + 1}"
+                )
+        for language in names:
+            defined.setdefault(language, name)
+        references = {m.group(1) or _name(m, 2) for m in _REFERENCE_RE.finditer(code)}
+        # Languages are only optional if checked for first.
+        guarded = {_name(m) or _name(m, 4) for m in _GUARD_RE.finditer(code)}
+        chunks.append(
+            Chunk(
+                name,
+                text,
+                frozenset(names),
+                frozenset(references - guarded - set(names)),
+                frozenset(modifies - set(names)),
+            )
+        )
+
+    # Only what's defined by another chunk is a dependency: the rest are
+    # Prism's own helpers, like `Prism.languages.extend`.
+    chunks = [
+        chunk._replace(
+            requires=frozenset(defined[n] for n in chunk.requires if n in defined),
+            modifies=frozenset(defined[n] for n in chunk.modifies if n in defined),
+        )
+        for chunk in chunks
+    ]
+    return "".join(core + plugins), chunks
+
+
+def resolve(chunks: list[Chunk]) -> dict[str, list[str]]:
+    """
+    The chunks to load for each language: its own, the ones it requires, and
+    the ones that modify any of those. They're in the order of the bundle, so
+    that each runs on the same grammars as it would in the full bundle.
+    """
+    by_name = {chunk.name: chunk for chunk in chunks}
+    position = {chunk.name: i for i, chunk in enumerate(chunks)}
+    modifiers: dict[str, list[str]] = {}
+    for chunk in chunks:
+        for name in chunk.modifies:
+            modifiers.setdefault(name, []).append(chunk.name)
+
+    resolved = {}
+    for chunk in chunks:
+        needed, pending = set(), [chunk.name]
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(by_name[name].requires)
+                pending.extend(modifiers.get(name, ()))
+        order = sorted(needed, key=position.__getitem__)
+        for language in chunk.languages:
+            resolved.setdefault(language, order)
+    return resolved
+
+
+def _fingerprinted(name: str, content: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{sha256(content).hexdigest()[:16]}{ext}"
+
+
+def _write(build_dir: str, name: str, content: bytes) -> None:
+    path = os.path.join(build_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    # mtime=0 keeps builds reproducible.
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(content))
+
+
+def build(static_dir: str = STATIC_DIR, build_dir: str = BUILD_DIR) -> dict:
+    """
+    Build the assets in `static_dir` into `build_dir`, replacing any previous
+    build, and return the manifest.
+    """
+    sources = {}
+    for name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                sources[name] = f.read()
+
+    core, chunks = split_prism(sources.pop("prism.js").decode())
+    sources["prism/core.js"] = core.encode()
+    for chunk in chunks:
+        sources[f"prism/{chunk.name}.js"] = chunk.source.encode()
+
+    shutil.rmtree(build_dir, ignore_errors=True)
+    files = {}
+    for name, content in sources.items():
+        files[name] = _fingerprinted(name, content)
+        _write(build_dir, files[name], content)
+
+    manifest = {
+        "files": files,
+        "prism": {
+            language: [f"prism/{name}.js" for name in order]
+            for language, order in sorted(resolve(chunks).items())
+        },
+    }
+    with open(os.path.join(build_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(build_dir: str = BUILD_DIR) -> dict | None:
+    try:
+        with open(os.path.join(build_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+manifest = load_manifest()
+
+
+def asset_url(name: str) -> str:
+    """
+    The URL of the static asset `name`: fingerprinted if it's been built, and
+    the unprocessed file otherwise.
+    """
+    if manifest is not None and name in manifest["files"]:
+        return "/assets/" + manifest["files"][name]
+    return "/static/" + name
+
+
+def prism_urls(language: str) -> list[str]:
+    """
+    The URLs of the scripts to highlight `language` with Prism, in order.
+    """
+    if manifest is None:
+        return [asset_url("prism.js")]
+    return [
+        asset_url(name)
+        for name in ["prism/core.js", *manifest["prism"].get(language, ())]
+    ]
+
+
+def find(filename: str, accept_encodings) -> tuple[str, str | None] | None:
+    """
+    The path of the built asset `filename`, in the best precompressed
+    encoding in `accept_encodings`, and that encoding. Returns None if there's
+    no such asset.
+    """
+    if manifest is None or filename not in manifest["files"].values():
+        return None
+    path = os.path.join(BUILD_DIR, filename)
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def current(filename: str) -> str | None:
+    """
+    The URL of the current build of the asset fingerprinted as `filename` in
+    another build, if there is one.
+    """
+    if (match := _FINGERPRINT_RE.fullmatch(filename)) is not None:
+        name = match.group(1) + match.group(2)
+        if manifest is not None and name in manifest["files"]:
+            return asset_url(name)
+    return None
+
+
+if __name__ == "__main__":
+    built = build()
+    print(f"Built {len(built['files'])} assets into {BUILD_DIR}")
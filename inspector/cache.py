@@ -0,0 +1,166 @@
+"""
+In-process caches shared by the views.
+"""
+
+import threading
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least-recently-used cache.
+
+    Every entry is weighed with ``sizeof`` and the least-recently used entries
+    are evicted until the total weight fits within ``max_bytes``. Values whose
+    weight can change while they are cached (e.g. a lazily-loaded archive) are
+    re-weighed whenever they are read.
+
+    Values may also hold memory that is mapped rather than on the heap (e.g.
+    a memory-mapped archive). That is weighed once with ``mapped_sizeof`` and
+    bounded separately by ``max_mapped_bytes``, so that it neither crowds out
+    the heap budget nor goes unbounded.
+
+    Usage:
+
+    >>> cache = LRUCache(max_bytes=1024)
+    >>> cache["key"] = b"value"
+    >>> cache.get("key")
+    b'value'
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = len,
+        max_mapped_bytes: int | None = None,
+        mapped_sizeof: Callable[[Any], int] = lambda value: 0,
+    ):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.max_mapped_bytes = max_mapped_bytes
+        self.mapped_sizeof = mapped_sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[Hashable, tuple[Any, int, int]] = OrderedDict()
+        self._size = 0
+        self._mapped_size = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    @property
+    def size(self) -> int:
+        """
+        The current total weight of all cached entries.
+        """
+        return self._size
+
+    @property
+    def mapped_size(self) -> int:
+        """
+        The current total mapped size of all cached entries.
+        """
+        return self._mapped_size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value, weight, mapped = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            self._reweigh(key, value, weight, mapped)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        weight = self.sizeof(value)
+        mapped = self.mapped_sizeof(value)
+        with self._lock:
+            self._discard(key)
+            if weight > self.max_bytes or mapped > self._max_mapped_bytes:
+                # Never cache something that would evict everything else.
+                return
+
+            self._entries[key] = (value, weight, mapped)
+            self._size += weight
+            self._mapped_size += mapped
+            self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._discard(key)
+            return default if value is _MISSING else value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._mapped_size = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "mapped_bytes": self._mapped_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    @property
+    def _max_mapped_bytes(self) -> float:
+        return float("inf") if self.max_mapped_bytes is None else self.max_mapped_bytes
+
+    def _reweigh(self, key: Hashable, value: Any, weight: int, mapped: int) -> None:
+        new_weight = self.sizeof(value)
+        if new_weight != weight:
+            self._entries[key] = (value, new_weight, mapped)
+            self._size += new_weight - weight
+            self._evict(keep=key)
+
+    def _discard(self, key: Hashable) -> Any:
+        try:
+            value, weight, mapped = self._entries.pop(key)
+        except KeyError:
+            return _MISSING
+        self._size -= weight
+        self._mapped_size -= mapped
+        return value
+
+    def _evict(self, keep: Hashable = _MISSING) -> None:
+        while (
+            self._size > self.max_bytes or self._mapped_size > self._max_mapped_bytes
+        ) and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                # The entry being re-weighed is the most recently used, so it
+                # is only at the front once everything else has been evicted.
+                break
+            self._discard(key)
+            self.evictions += 1
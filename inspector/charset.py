@@ -0,0 +1,249 @@
+"""
+This module contains the detection of the encoding of text files.
+
+Each encoding is judged by a few heuristics over the decoded text (how many
+control characters it has, whether it looks like text misdecoded by the wrong
+encoding). Rather than decode the whole file with every candidate encoding and
+count characters one at a time, the counts are derived wherever possible from a
+single histogram of the file's bytes, and the file is only decoded in full with
+the encoding that is eventually chosen, or with multi-byte encodings that get
+past a trial decode of a bounded sample.
+"""
+
+import string
+
+import numpy
+
+# Encodings tried after UTF-8, from most to least restrictive. Even with
+# improved heuristics, putting GBK/GB2312 early breaks too many other
+# encodings. The order below maximizes correct detections while minimizing
+# misdetections.
+COMMON_ENCODINGS = [
+    "shift_jis",  # Japanese (restrictive multi-byte)
+    "euc-kr",  # Korean (restrictive multi-byte)
+    "big5",  # Chinese Traditional (restrictive multi-byte)
+    "gbk",  # Chinese Simplified
+    "gb2312",  # Chinese Simplified, older
+    "cp1251",  # Cyrillic
+    "iso-8859-2",  # Central/Eastern European
+    "cp1252",  # Windows Western European (very permissive)
+    "latin-1",  # ISO-8859-1 fallback (never fails)
+]
+
+# Encodings that decode every byte to at least one character on its own.
+SINGLE_BYTE_ENCODINGS = ("cp1251", "iso-8859-2", "cp1252", "latin-1")
+WESTERN_ENCODINGS = ("cp1252", "latin-1")
+ASIAN_ENCODINGS = ("big5", "gbk", "gb2312", "shift_jis", "euc-kr")
+
+# Multi-byte encodings are first tried on a sample this long, and rejected if
+# decoding it fails this far from its end (which cutting a character in two
+# can't cause).
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_MARGIN = 8
+
+# Share of control characters above which text is likely decoded wrongly.
+MAX_CONTROL_RATIO = 0.3
+
+_CONTROL_CHARS = "".join(chr(i) for i in range(32) if chr(i) not in "\t\n\r")
+
+
+def _byte_classes(encoding: str) -> dict[str, numpy.ndarray]:
+    """
+    Masks over byte values, for a single-byte encoding, of the bytes it can't
+    decode and of the bytes it decodes to each class of character the
+    heuristics count.
+    """
+    chars = []
+    for b in range(256):
+        try:
+            chars.append(bytes((b,)).decode(encoding))
+        except UnicodeDecodeError:
+            chars.append(None)
+    return {
+        "undefined": numpy.array([c is None for c in chars]),
+        "control": numpy.array([c is not None and c in _CONTROL_CHARS for c in chars]),
+        "high_latin": numpy.array(
+            [c is not None and 0x0080 <= ord(c) <= 0x024F for c in chars]
+        ),
+    }
+
+
+_BYTE_CLASSES = {
+    encoding: _byte_classes(encoding) for encoding in SINGLE_BYTE_ENCODINGS
+}
+_CONTROL_BYTES = _CONTROL_CHARS.encode("ascii")
+_CONTROL_BYTE_MASK = numpy.zeros(256, dtype=bool)
+_CONTROL_BYTE_MASK[list(_CONTROL_BYTES)] = True
+_ASCII_LETTER_MASK = numpy.zeros(128, dtype=bool)
+_ASCII_LETTER_MASK[list(string.ascii_letters.encode())] = True
+
+
+def _is_likely_text(control_chars: int, length: int) -> bool:
+    """Check if decoded text looks like valid text (not corrupted)."""
+    if not length:
+        return True
+
+    # Too many control characters suggests wrong encoding
+    return control_chars / length <= MAX_CONTROL_RATIO
+
+
+def _is_likely_misencoded_asian_text(high_latin: int, spaces: int, length: int):
+    """
+    Detect when Western encodings decode Asian text as Latin Extended garbage.
+
+    When cp1252/latin-1 decode multi-byte Asian text, they produce strings
+    with many Latin Extended/Supplement characters (Ā-ʯ, À-ÿ) and few/no spaces.
+    """
+    if length <= 3:
+        return False
+
+    # If >50% high Latin chars and <10% spaces, likely misencoded
+    return high_latin / length > 0.5 and spaces < length * 0.1
+
+
+def _count_between(code_points: numpy.ndarray, low: int, high: int) -> int:
+    return int(numpy.count_nonzero((code_points >= low) & (code_points <= high)))
+
+
+def _is_likely_misencoded_cross_asian(
+    code_points: numpy.ndarray, ascii_counts: numpy.ndarray, encoding: str
+) -> bool:
+    """
+    Detect when Asian encodings misinterpret other Asian encodings.
+
+    Patterns:
+    - shift_jis decoding GB2312 produces excessive half-width katakana
+    - Asian encodings decoding Western text produce ASCII+CJK mix (unlikely)
+    """
+    length = len(code_points)
+    if length <= 3:
+        return False
+
+    # Pattern 1: Excessive half-width katakana (shift_jis misinterpreting GB2312)
+    # Half-width katakana range: U+FF61-FF9F
+    if encoding == "shift_jis":
+        half_width_katakana = _count_between(code_points, 0xFF61, 0xFF9F)
+        # If >30% is half-width katakana, likely wrong encoding
+        # (Real Japanese text uses mostly full-width kana and kanji)
+        if half_width_katakana / length > 0.3:
+            return True
+
+    # Pattern 2: ASCII mixed with CJK (Asian encoding misinterpreting Western)
+    # CJK Unified Ideographs: U+4E00-U+9FFF
+    if encoding in ASIAN_ENCODINGS:
+        ascii_chars = int(ascii_counts.sum())
+        cjk_chars = _count_between(code_points, 0x4E00, 0x9FFF)
+
+        # If we have ASCII letters and scattered CJK chars, likely misencoded
+        # Real CJK text is mostly CJK with occasional ASCII punctuation
+        if ascii_chars > 0 and cjk_chars > 0:
+            ascii_letters = int(ascii_counts[_ASCII_LETTER_MASK].sum())
+            # If we have ASCII letters AND CJK, and CJK is <50%, likely wrong
+            if ascii_letters >= 2 and cjk_chars / length < 0.5:
+                return True
+
+    return False
+
+
+def _fails_early(content_bytes: bytes, encoding: str) -> bool:
+    """
+    Whether decoding a sample of `content_bytes` shows that decoding all of it
+    would fail.
+    """
+    if len(content_bytes) <= SAMPLE_SIZE:
+        return False
+    try:
+        content_bytes[:SAMPLE_SIZE].decode(encoding)
+    except UnicodeDecodeError as exc:
+        return exc.end <= SAMPLE_SIZE - SAMPLE_MARGIN
+    return False
+
+
+def _decode_single_byte(content_bytes, counts, encoding):
+    classes = _BYTE_CLASSES[encoding]
+    if counts[classes["undefined"]].any():
+        return None
+
+    # Every byte is one character, so the histogram has all the counts.
+    length = len(content_bytes)
+    if not _is_likely_text(int(counts[classes["control"]].sum()), length):
+        return None
+
+    # Skip if Western encoding produced Asian-text-as-garbage pattern
+    if encoding in WESTERN_ENCODINGS and _is_likely_misencoded_asian_text(
+        int(counts[classes["high_latin"]].sum()), int(counts[ord(" ")]), length
+    ):
+        return None
+
+    return content_bytes.decode(encoding)
+
+
+def _decode_multi_byte(content_bytes, encoding):
+    if _fails_early(content_bytes, encoding):
+        return None
+    try:
+        decoded = content_bytes.decode(encoding)
+    except UnicodeDecodeError:
+        return None
+
+    # Count characters over an array of the text's code points.
+    code_points = numpy.frombuffer(decoded.encode("utf-32-le"), dtype=numpy.uint32)
+    ascii_counts = numpy.bincount(numpy.minimum(code_points, 128), minlength=129)
+    ascii_counts = ascii_counts[:128]
+
+    # Skip if decoded text looks corrupted
+    control_chars = int(ascii_counts[_CONTROL_BYTE_MASK[:128]].sum())
+    if not _is_likely_text(control_chars, len(decoded)):
+        return None
+
+    # Skip if Asian encoding misinterpreted other Asian/Western text
+    if _is_likely_misencoded_cross_asian(code_points, ascii_counts, encoding):
+        return None
+
+    return decoded
+
+
+def decode_with_fallback(content_bytes):
+    """
+    Decode bytes to string, trying multiple encodings.
+
+    Strategy:
+    1. Try UTF-8 (most common)
+    2. Try common encodings with sanity checks
+    3. Fall back to latin-1 (decodes anything, but may produce garbage)
+
+    Returns decoded string or None if all attempts fail (only if truly binary).
+    """
+    # Every encoding tried decodes ASCII the same way, so they would all
+    # agree with UTF-8.
+    if content_bytes.isascii():
+        length = len(content_bytes)
+        control_chars = length - len(content_bytes.translate(None, _CONTROL_BYTES))
+        if _is_likely_text(control_chars, length):
+            return content_bytes.decode("ascii")
+        return None
+
+    counts = numpy.bincount(
+        numpy.frombuffer(content_bytes, dtype=numpy.uint8), minlength=256
+    )
+
+    # Try UTF-8 first (most common)
+    try:
+        decoded = content_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    else:
+        # Control characters are single bytes in UTF-8.
+        if _is_likely_text(int(counts[_CONTROL_BYTE_MASK].sum()), len(decoded)):
+            return decoded
+
+    for encoding in COMMON_ENCODINGS:
+        if encoding in SINGLE_BYTE_ENCODINGS:
+            decoded = _decode_single_byte(content_bytes, counts, encoding)
+        else:
+            decoded = _decode_multi_byte(content_bytes, encoding)
+        if decoded is not None:
+            return decoded
+
+    # If we get here, all encodings failed sanity checks (truly binary data)
+    return None
@@ -2,10 +2,29 @@
 This module contains functions for decompiling and disassembling files.
 """
 
+import contextlib
+import dis
+import fcntl
+import importlib.util
+import io
+import marshal
+import os
+import selectors
 import subprocess
 import tempfile
+import time
+import types
 
-DISASM_HEADER = "This file was disassembled from bytecode by Inspector using pycdas."
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from typing import Iterator
+
+from . import metrics
+from .cache import LRUCache
+from .singleflight import SingleFlight
+from .store import FileStore
+
+DISASM_HEADER = "This file was disassembled from bytecode by Inspector using {tool}."
 DECOMPILE_HEADER = (
     '"""\n'
     "This file was decompiled from bytecode by Inspector using pycdc.\n"
@@ -13,30 +32,327 @@ DECOMPILE_HEADER = (
     '"""\n\n'
 )
 
+# Size limit of the in-memory cache of decompiler output, per worker.
+DEOB_CACHE_MAX_BYTES = int(
+    os.environ.get("INSPECTOR_DEOB_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+)
+
+# Directory of the on-disk cache of decompiler output shared by all workers,
+# and its size limit. The on-disk cache is disabled unless a directory is
+# configured.
+DEOB_CACHE_DIR = os.environ.get("INSPECTOR_DEOB_CACHE_DIR")
+DEOB_CACHE_MAX_DISK_BYTES = int(
+    os.environ.get("INSPECTOR_DEOB_CACHE_MAX_DISK_BYTES", 1024**3)
+)
+
+# Wall-clock limit, in seconds, on running a tool (including waiting for a
+# slot to run it in), and limit on the size of its output.
+DEOB_TIMEOUT = float(os.environ.get("INSPECTOR_DEOB_TIMEOUT", 4))
+DEOB_MAX_OUTPUT_BYTES = int(
+    os.environ.get("INSPECTOR_DEOB_MAX_OUTPUT_BYTES", 8 * 1024 * 1024)
+)
+
+# Number of tools that may run at once on this host, across all workers, and
+# the directory of the lock files (one per slot) that enforce it.
+DEOB_MAX_PROCESSES = int(
+    os.environ.get("INSPECTOR_DEOB_MAX_PROCESSES", os.cpu_count() or 1)
+)
+DEOB_SLOT_DIR = os.environ.get(
+    "INSPECTOR_DEOB_SLOT_DIR", os.path.join(tempfile.gettempdir(), "inspector-deob")
+)
+SLOT_POLL_INTERVAL = 0.05
+
+# Bytecode larger than this is disassembled by pycdas, in a subprocess that
+# can be killed, rather than in process.
+DEOB_IN_PROCESS_MAX_BYTES = int(
+    os.environ.get("INSPECTOR_DEOB_IN_PROCESS_MAX_BYTES", 1024 * 1024)
+)
+
+# Size of the header of .pyc files (PEP 552)
+PYC_HEADER_SIZE = 16
+
+TRUNCATED_MARKER = "\n\n[Inspector: output truncated, {reason}]\n"
+# Reasons for cutting output short that depend on the load on the host at the
+# time, rather than on the bytecode, so the output isn't fit for caching.
+TRANSIENT_REASONS = ("time limit reached", "too many files being decompiled")
 
-def decompile(code: bytes) -> str:
+# Output of each tool, keyed by tool and the SHA-256 of the bytecode.
+outputs = LRUCache(DEOB_CACHE_MAX_BYTES)
+store = FileStore(DEOB_CACHE_DIR, DEOB_CACHE_MAX_DISK_BYTES) if DEOB_CACHE_DIR else None
+runs = SingleFlight()
+executor = ThreadPoolExecutor(max_workers=DEOB_MAX_PROCESSES, thread_name_prefix="deob")
+
+metrics.register_cache("deob", outputs)
+if store is not None:
+    metrics.register_cache("deob_store", store)
+
+
+@contextlib.contextmanager
+def _slot(deadline: float) -> Iterator[None]:
     """
-    Decompile bytecode using pycdc.
+    Hold one of the host's `DEOB_MAX_PROCESSES` slots, waiting until
+    `deadline` for one. Raises `TimeoutError` if none frees up.
     """
+    os.makedirs(DEOB_SLOT_DIR, exist_ok=True)
+    while True:
+        for i in range(DEOB_MAX_PROCESSES):
+            with open(os.path.join(DEOB_SLOT_DIR, f"slot-{i}"), "ab") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                return
+        if time.monotonic() >= deadline:
+            raise TimeoutError("Timed out waiting for a decompiler slot")
+        time.sleep(SLOT_POLL_INTERVAL)
 
-    with tempfile.NamedTemporaryFile() as file:
-        file.write(code)
-        output = subprocess.Popen(
-            ["pycdc", file.name], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-        )
 
-        output = b"".join([line for line in output.stdout.readlines()]).decode()
+@contextlib.contextmanager
+def _bytecode_path(code: bytes) -> Iterator[tuple[str, tuple[int, ...]]]:
+    """
+    A path the tools can read `code` from, and the file descriptors they need
+    to inherit for it. The bytecode is kept in memory where possible.
+    """
+    if not hasattr(os, "memfd_create"):
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(code)
+            file.flush()
+            yield file.name, ()
+        return
+
+    fd = os.memfd_create("bytecode")
+    try:
+        with open(fd, "wb", closefd=False) as f:
+            f.write(code)
+        yield f"/dev/fd/{fd}", (fd,)
+    finally:
+        os.close(fd)
+
+
+def _read(stream, deadline: float, max_bytes: int) -> tuple[bytes, str | None]:
+    """
+    Read `stream` until EOF, `deadline`, or `max_bytes`, whichever comes
+    first. Returns what was read, and why it stopped short, if it did.
+    """
+    chunks, size = [], 0
+    fd = stream.fileno()
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return b"".join(chunks), "time limit reached"
+            if not selector.select(remaining):
+                continue
+            chunk = os.read(fd, 64 * 1024)
+            if not chunk:
+                return b"".join(chunks), None
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                return b"".join(chunks)[:max_bytes], "size limit reached"
+
+
+def _deadline(deadline: float | None) -> float:
+    """
+    The earlier of `deadline` (the caller's, if any) and `DEOB_TIMEOUT` from
+    now.
+    """
+    limit = time.monotonic() + DEOB_TIMEOUT
+    return limit if deadline is None else min(deadline, limit)
+
+
+def _run(tool: str, code: bytes, deadline: float | None = None) -> tuple[str, bool]:
+    """
+    Run `tool` over `code`, within the host's limits and by `deadline`.
+    Returns its output, and whether it's fit for caching (it isn't if cut
+    short by lack of time).
+    """
+    deadline = _deadline(deadline)
+    with metrics.timed(tool):
+        try:
+            with _slot(deadline), _bytecode_path(code) as (path, fds):
+                metrics.inc("inspector_subprocesses_total", tool=tool)
+                with subprocess.Popen(
+                    [tool, path],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    pass_fds=fds,
+                ) as process:
+                    output, reason = _read(
+                        process.stdout, deadline, DEOB_MAX_OUTPUT_BYTES
+                    )
+                    if reason is not None:
+                        process.kill()
+        except TimeoutError:
+            output, reason = b"", "too many files being decompiled"
+
+    output = output.decode(errors="replace")
+    if reason is None:
+        return output, True
+    return (
+        output + TRUNCATED_MARKER.format(reason=reason),
+        reason not in TRANSIENT_REASONS,
+    )
+
+
+def is_complete(output: str) -> bool:
+    """
+    Whether `output` would come out the same if produced again, as it wasn't
+    cut short for lack of time.
+    """
+    return not output.endswith(
+        tuple(TRUNCATED_MARKER.format(reason=reason) for reason in TRANSIENT_REASONS)
+    )
 
-    return DECOMPILE_HEADER + output
 
+def _load(key: str) -> str | None:
+    if store is None or (path := store.get(key)) is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read().decode()
+    except FileNotFoundError:
+        # Evicted by another worker in the meantime
+        return None
 
-def disassemble(code: bytes) -> str:
-    with tempfile.NamedTemporaryFile() as file:
-        file.write(code)
-        output = subprocess.Popen(
-            ["pycdas", file.name], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+
+def _cached_run(
+    tool: str, code: bytes, digest: str | None, deadline: float | None = None
+) -> str:
+    """
+    Run `tool` over `code` by `deadline`, unless its output for the same
+    bytecode (as identified by `digest`, its SHA-256) is already cached.
+    """
+    deadline = _deadline(deadline)
+    if digest is None:
+        digest = sha256(code).hexdigest()
+    key = f"{tool}/{digest}"
+
+    if (output := outputs.get(key)) is not None:
+        return output
+
+    try:
+        return runs.do(
+            key,
+            lambda: _load_or_run(key, tool, code, deadline),
+            max(0, deadline - time.monotonic()),
         )
+    except TimeoutError:
+        return TRUNCATED_MARKER.format(reason="time limit reached")
+
+
+def _load_or_run(key: str, tool: str, code: bytes, deadline: float) -> str:
+    if (output := _load(key)) is not None:
+        outputs[key] = output
+        return output
+
+    output, cacheable = _run(tool, code, deadline)
+    if cacheable:
+        if store is not None:
+            store.put(key, [output.encode()])
+        outputs[key] = output
+    return output
+
+
+class _OutputCutShort(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+class _BoundedWriter(io.StringIO):
+    """
+    Collects output until `deadline` or `max_chars`, then raises
+    `_OutputCutShort` to stop whatever is writing it.
+    """
+
+    def __init__(self, deadline: float, max_chars: int):
+        super().__init__()
+        self.deadline = deadline
+        self.max_chars = max_chars
 
-        disassembly = b"".join([line for line in output.stdout.readlines()]).decode()
+    def write(self, s: str) -> int:
+        if self.tell() + len(s) > self.max_chars:
+            super().write(s[: self.max_chars - self.tell()])
+            raise _OutputCutShort("size limit reached")
+        if time.monotonic() >= self.deadline:
+            raise _OutputCutShort("time limit reached")
+        return super().write(s)
 
-    return DISASM_HEADER + "\n\n" + disassembly
+
+def _disassemble_in_process(code: bytes, deadline: float | None = None) -> str | None:
+    """
+    Disassemble bytecode with `dis`, if it was compiled by a Python with the
+    same magic number as this one (and so the same bytecode), and is small
+    enough. Returns None otherwise, or if the bytecode can't be loaded or
+    disassembled.
+    """
+    if code[: len(importlib.util.MAGIC_NUMBER)] != importlib.util.MAGIC_NUMBER:
+        return None
+    if len(code) > DEOB_IN_PROCESS_MAX_BYTES:
+        return None
+
+    output = _BoundedWriter(_deadline(deadline), DEOB_MAX_OUTPUT_BYTES)
+    try:
+        with metrics.timed("dis"):
+            # Nothing is executed: the code object is only loaded and inspected.
+            code_object = marshal.loads(code[PYC_HEADER_SIZE:])
+            if not isinstance(code_object, types.CodeType):
+                return None
+            # Recurses into the code objects of functions, classes, etc.
+            dis.dis(code_object, file=output, depth=None)
+    except _OutputCutShort as exc:
+        return output.getvalue() + TRUNCATED_MARKER.format(reason=exc.reason)
+    except Exception:
+        return None
+    return output.getvalue()
+
+
+def decompile(
+    code: bytes, digest: str | None = None, deadline: float | None = None
+) -> str:
+    """
+    Decompile bytecode using pycdc.
+    """
+    return DECOMPILE_HEADER + _cached_run("pycdc", code, digest, deadline)
+
+
+def disassemble(
+    code: bytes, digest: str | None = None, deadline: float | None = None
+) -> str:
+    """
+    Disassemble bytecode, in process if this Python can, and using pycdas
+    otherwise.
+    """
+    tool = "dis"
+    disassembly = _disassemble_in_process(code, deadline)
+    if disassembly is None:
+        tool = "pycdas"
+        disassembly = _cached_run(tool, code, digest, deadline)
+    return DISASM_HEADER.format(tool=tool) + "\n\n" + disassembly
+
+
+def disassemble_and_decompile(
+    code: bytes, digest: str | None = None, deadline: float | None = None
+) -> tuple[str, str]:
+    """
+    Disassemble and decompile bytecode, running both tools at once, by
+    `deadline` (and within `DEOB_TIMEOUT`).
+    """
+    if digest is None:
+        digest = sha256(code).hexdigest()
+    deadline = _deadline(deadline)
+    decompilation = metrics.submit(executor, decompile, code, digest, deadline)
+    disassembly = disassemble(code, digest, deadline)
+    try:
+        return disassembly, decompilation.result(max(0, deadline - time.monotonic()))
+    except TimeoutError:
+        # Still waiting for a thread to run it on
+        return disassembly, DECOMPILE_HEADER + TRUNCATED_MARKER.format(
+            reason="time limit reached"
+        )
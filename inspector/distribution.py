@@ -1,98 +1,512 @@
-import gzip
+import io
+import mmap
+import os
+import posixpath
 import tarfile
+import tempfile
+import threading
 import zipfile
 import zlib
 
-from io import BytesIO
+from typing import BinaryIO, Iterator
 
 import requests
 
 from flask import abort
 
-from .errors import BadFileError
+from . import metrics
+from .cache import LRUCache
+from .errors import BadFileError, DownloadTimeoutError
+from .gzindex import IndexedGzipFile
+from .members import MemberTable
+from .remote import HTTPRangeFile, RangeNotSupported
+from .singleflight import SingleFlight
+from .store import FileStore
+from .tree import DirectoryIndex
 from .utilities import requests_session
 
-# Lightweight datastore ;)
-dists = {}
+# Zip general purpose flags (encryption, patched data) for which members are
+# read back with their original `ZipInfo`.
+ZIP_SPECIAL_FLAGS = 0x1 | 0x20 | 0x40
+
+# How many links to follow when reading a tarball member.
+MAX_LINK_DEPTH = 32
+
+# Size of the chunks distributions are streamed to disk with.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Size of the chunks members are read from distributions with.
+CONTENTS_CHUNK_SIZE = 1024 * 1024
+
+# Zip-based distributions at least this large are read remotely with HTTP Range
+# requests instead of being downloaded; zero or less disables remote reads.
+REMOTE_ZIP_MIN_BYTES = int(
+    os.environ.get("INSPECTOR_REMOTE_ZIP_MIN_BYTES", 32 * 1024 * 1024)
+)
+
+# Distance, in uncompressed bytes, between checkpoints of the index built for
+# random access into `.tar.gz` distributions.
+TAR_INDEX_SPAN = int(os.environ.get("INSPECTOR_TAR_INDEX_SPAN", 1024 * 1024))
+
+# Directory of the on-disk distribution store shared by all workers, and its
+# size limit. The store is disabled unless a directory is configured, and
+# without it downloads are only coalesced within each worker.
+STORE_DIR = os.environ.get("INSPECTOR_STORE_DIR")
+STORE_MAX_BYTES = int(os.environ.get("INSPECTOR_STORE_MAX_BYTES", 10 * 1024**3))
+
+# How long a request waits for a download started by another request (in this
+# or another worker), in seconds.
+DOWNLOAD_TIMEOUT = float(os.environ.get("INSPECTOR_DOWNLOAD_TIMEOUT", 8))
+
+# Upper bound on the memory used by cached distributions in each worker, and,
+# separately, on the size of the archives they keep memory-mapped (which the
+# kernel pages in and out as needed, but which pin disk space until evicted).
+DIST_CACHE_MAX_BYTES = int(
+    os.environ.get("INSPECTOR_DIST_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+DIST_CACHE_MAX_MAPPED_BYTES = int(
+    os.environ.get("INSPECTOR_DIST_CACHE_MAX_MAPPED_BYTES", 4 * 1024**3)
+)
+
+
+class MappedFile(io.RawIOBase):
+    """
+    A read-only, seekable file object over a memory-mapped file.
+
+    Reads are served straight from the mapping, so the archive is paged in by
+    the kernel on demand instead of being copied onto the heap.
+    """
+
+    def __init__(self, mapping: mmap.mmap):
+        self.mapping = mapping
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = len(self.mapping) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._pos
+        end = len(self.mapping) if size is None or size < 0 else start + size
+        data = self.mapping[start:end]
+        self._pos += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.mapping.close()
+        super().close()
 
 
 class Distribution:
-    def namelist(self):
-        raise NotImplementedError
+    members: MemberTable
+    _tree: DirectoryIndex | None = None
+
+    def __init__(self, f):
+        self.file = f
+        f.seek(0, os.SEEK_END)
+        self.archive_size = f.tell()
+        f.seek(0)
+
+    def namelist(self) -> tuple[str, ...]:
+        return self.members.files()
 
-    def read(self):
+    def exists(self, filepath) -> bool:
+        return filepath in self.members
+
+    def size(self, filepath) -> int:
+        try:
+            return self.members.size(filepath)
+        except KeyError:
+            raise FileNotFoundError
+
+    def iter_contents(self, filepath) -> Iterator[bytes]:
+        """
+        The contents of `filepath`, in chunks of up to `CONTENTS_CHUNK_SIZE`
+        bytes, without reading the whole member into memory at once.
+        """
         raise NotImplementedError
 
+    def contents(self, filepath) -> bytes:
+        return b"".join(self.iter_contents(filepath))
+
+    def tree(self) -> DirectoryIndex:
+        """
+        The index of the distribution's directories, built on first use.
+        """
+        if self._tree is None:
+            self._tree = DirectoryIndex(self.members)
+        return self._tree
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate heap memory held by this distribution: its member table
+        and directory index, plus whatever part of the archive is held on the
+        heap. A memory-mapped archive is left out, see `mapped_bytes`.
+        """
+        if isinstance(self.file, MappedFile):
+            file_nbytes = 0
+        else:
+            file_nbytes = getattr(self.file, "nbytes", self.archive_size)
+        return (
+            file_nbytes
+            + self.members.nbytes
+            + (self._tree.nbytes if self._tree is not None else 0)
+        )
+
+    @property
+    def mapped_bytes(self) -> int:
+        """
+        Size of the archive, if it is memory-mapped.
+        """
+        return len(self.file) if isinstance(self.file, MappedFile) else 0
+
+
+# Lightweight datastore ;)
+dists = LRUCache(
+    DIST_CACHE_MAX_BYTES,
+    sizeof=lambda dist: dist.nbytes,
+    max_mapped_bytes=DIST_CACHE_MAX_MAPPED_BYTES,
+    mapped_sizeof=lambda dist: dist.mapped_bytes,
+)
+store = FileStore(STORE_DIR, STORE_MAX_BYTES) if STORE_DIR else None
+downloads = SingleFlight()
+
+metrics.register_cache("dists", dists)
+if store is not None:
+    metrics.register_cache("dist_store", store)
+
 
 class ZipDistribution(Distribution):
     def __init__(self, f):
-        f.seek(0)
+        super().__init__(f)
         try:
             self.zipfile = zipfile.ZipFile(f)
         except zipfile.BadZipFile:
             raise BadFileError("Bad zipfile")
 
-    def namelist(self):
-        return [i.filename for i in self.zipfile.infolist() if not i.is_dir()]
+        self.members = MemberTable()
+        for info in self.zipfile.infolist():
+            i = self.members.add(
+                info.filename,
+                offset=info.header_offset,
+                size=info.file_size,
+                compressed_size=info.compress_size,
+                crc=info.CRC,
+                method=info.compress_type,
+                flags=MemberTable.DIRECTORY if info.is_dir() else 0,
+                # Set by `zipfile` to catch overlapping entries (zip bombs).
+                end_offset=getattr(info, "_end_offset", None) or 0,
+            )
+            if (
+                info.flag_bits & ZIP_SPECIAL_FLAGS
+                or info.orig_filename != info.filename
+            ):
+                self.members.special[i] = info
+        self.members.freeze()
 
-    def contents(self, filepath) -> bytes:
-        try:
-            return self.zipfile.read(filepath)
-        except KeyError:
+        # Everything needed to read members back is in the member table now.
+        self.zipfile.filelist = []
+        self.zipfile.NameToInfo = {}
+
+    def _zipinfo(self, i) -> zipfile.ZipInfo:
+        if (info := self.members.special.get(i)) is not None:
+            return info
+
+        info = zipfile.ZipInfo(self.members.names[i])
+        info.header_offset = self.members.offsets[i]
+        info.file_size = self.members.sizes[i]
+        info.compress_size = self.members.compressed_sizes[i]
+        info.CRC = self.members.crcs[i]
+        info.compress_type = self.members.methods[i]
+        if end_offset := self.members.end_offsets[i]:
+            info._end_offset = end_offset
+        return info
+
+    def iter_contents(self, filepath) -> Iterator[bytes]:
+        i = self.members.find(filepath)
+        if i is None:
             raise FileNotFoundError
+        try:
+            with self.zipfile.open(self._zipinfo(i)) as f:
+                while chunk := f.read(CONTENTS_CHUNK_SIZE):
+                    yield chunk
+        except (zipfile.BadZipFile, zlib.error, EOFError):
+            raise BadFileError("Bad zipfile")
 
 
 class TarGzDistribution(Distribution):
     def __init__(self, f):
-        f.seek(0)
+        super().__init__(f)
+        # Reading the tarball through a checkpointed gzip reader means that
+        # extracting a member only inflates from the nearest checkpoint,
+        # instead of from the start of the archive.
+        self.index = IndexedGzipFile(f, span=TAR_INDEX_SPAN)
+        self._lock = threading.Lock()
         try:
-            self.tarfile = tarfile.open(fileobj=f, mode="r:gz")
-        except gzip.BadGzipFile:
+            self.tarfile = tarfile.open(fileobj=self.index, mode="r:")
+            # Walk the whole archive once, building both the checkpoint index
+            # and the member to offset table.
+            self.members = MemberTable()
+            for info in self.tarfile:
+                self._add_member(info)
+        except (tarfile.TarError, zlib.error, EOFError):
             raise BadFileError("Bad gzip file")
+        self.members.freeze()
 
-    def namelist(self):
-        return [i.name for i in self.tarfile.getmembers() if not i.isdir()]
+        # Don't keep a `TarInfo` per member around.
+        self.tarfile.members = []
 
-    def contents(self, filepath):
-        try:
-            file_ = self.tarfile.extractfile(filepath)
-            if file_:
-                return file_.read()
-            else:
+    def _add_member(self, info: tarfile.TarInfo) -> None:
+        if info.isdir():
+            flags = MemberTable.DIRECTORY
+        elif info.issym():
+            flags = MemberTable.SYMLINK
+        elif info.islnk():
+            flags = MemberTable.HARDLINK
+        elif info.isreg():
+            flags = 0
+        else:
+            flags = MemberTable.OTHER
+
+        i = self.members.add(
+            info.name, offset=info.offset_data, size=info.size, flags=flags
+        )
+        if flags & (MemberTable.SYMLINK | MemberTable.HARDLINK):
+            self.members.links[i] = info.linkname
+        elif info.issparse():
+            self.members.special[i] = info
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + self.index.nbytes
+
+    def _resolve(self, filepath) -> int:
+        """
+        Find the member holding the data for `filepath`, following links the
+        same way `TarFile.extractfile()` does.
+        """
+        i = self.members.find(filepath)
+        for _ in range(MAX_LINK_DEPTH):
+            if i is None:
                 raise FileNotFoundError
-        except (KeyError, EOFError):
+
+            flags = self.members.flags[i]
+            if flags & MemberTable.SYMLINK:
+                name = self.members.names[i]
+                linkname = posixpath.join(
+                    posixpath.dirname(name), self.members.links[i]
+                )
+            elif flags & MemberTable.HARDLINK:
+                linkname = self.members.links[i]
+            elif flags & (MemberTable.DIRECTORY | MemberTable.OTHER):
+                raise FileNotFoundError
+            else:
+                return i
+            i = self._find_link_target(linkname)
+
+        raise FileNotFoundError
+
+    def _find_link_target(self, linkname) -> int | None:
+        if (i := self.members.find(linkname)) is not None:
+            return i
+
+        # Link targets are compared normalized, e.g. "./a/../b" matches "b".
+        linkname = posixpath.normpath(linkname)
+        for i in reversed(range(len(self.members))):
+            if posixpath.normpath(self.members.names[i]) == linkname:
+                return i
+        return None
+
+    def iter_contents(self, filepath) -> Iterator[bytes]:
+        i = self._resolve(filepath)
+        try:
+            if (info := self.members.special.get(i)) is not None:
+                with self._lock:
+                    data = self.tarfile.extractfile(info).read()
+                yield data
+                return
+
+            offset, remaining = self.members.offsets[i], self.members.sizes[i]
+            while remaining:
+                # Other threads may read from the index between chunks, so
+                # seek every time.
+                with self._lock:
+                    self.index.seek(offset)
+                    chunk = self.index.read(min(remaining, CONTENTS_CHUNK_SIZE))
+                if not chunk:
+                    raise BadFileError("Bad tarfile")
+                offset += len(chunk)
+                remaining -= len(chunk)
+                yield chunk
+        except EOFError:
             raise FileNotFoundError
         except (tarfile.TarError, zlib.error):
             raise BadFileError("Bad tarfile")
 
 
-def _get_dist(first, second, rest, distname):
-    if distname in dists:
-        return dists[distname]
+def _stream(url: str, resp: requests.Response | None = None) -> Iterator[bytes]:
+    """
+    Stream the body of `url` in chunks, reusing `resp` if it is an
+    already-open streaming response for `url`.
+    """
+    if resp is None:
+        try:
+            resp = requests_session().get(url, stream=True)
+            resp.raise_for_status()
+        except requests.HTTPError as exc:
+            abort(exc.response.status_code)
+
+    with resp:
+        for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+            metrics.inc("inspector_downloaded_bytes_total", len(chunk))
+            yield chunk
+
+
+def _map(f: BinaryIO) -> MappedFile:
+    try:
+        # The mapping keeps its own reference to the file, so it stays valid
+        # after the file is closed (or unlinked).
+        return MappedFile(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except ValueError:
+        raise BadFileError("Empty distribution")
 
-    url = f"https://files.pythonhosted.org/packages/{first}/{second}/{rest}/{distname}"
+
+def _download(url: str, key: str, resp: requests.Response | None = None) -> MappedFile:
+    """
+    Download `url` to disk and memory-map it.
+
+    With a persistent store configured the file is kept there under `key`,
+    otherwise it goes to an anonymous temporary file.
+    """
+    if store is not None:
+        # Only one process downloads a given file, the others wait for it
+        # and then find it in the store.
+        with store.lock(key, DOWNLOAD_TIMEOUT):
+            if (f := _open_stored(key)) is not None:
+                if resp is not None:
+                    resp.close()
+                return f
+            with open(store.put(key, _stream(url, resp)), "rb") as f:
+                return _map(f)
+
+    with tempfile.TemporaryFile() as f:
+        for chunk in _stream(url, resp):
+            f.write(chunk)
+        f.flush()
+        return _map(f)
+
+
+def _open_stored(key: str) -> MappedFile | None:
+    if store is None or (path := store.get(key)) is None:
+        return None
     try:
-        resp = requests_session().get(url, stream=True)
-        resp.raise_for_status()
+        with open(path, "rb") as f:
+            return _map(f)
+    except FileNotFoundError:
+        # Evicted by another process in the meantime.
+        return None
+
+
+def _open_remote_zip(url: str, key: str) -> HTTPRangeFile | MappedFile:
+    """
+    Open a zip archive for remote reading, unless it is small enough that a
+    single download is cheaper or the server does not support Range requests.
+    """
+    try:
+        f = HTTPRangeFile(url, requests_session())
+    except RangeNotSupported as exc:
+        return _download(url, key, exc.response)
     except requests.HTTPError as exc:
         abort(exc.response.status_code)
 
-    f = BytesIO(resp.content)
+    if len(f) < REMOTE_ZIP_MIN_BYTES:
+        return _download(url, key)
+    return f
+
+
+def _open(key: str, distribution_class: type[Distribution]):
+    if (f := _open_stored(key)) is not None:
+        return f
+
+    url = f"https://files.pythonhosted.org/packages/{key}"
+    if distribution_class is ZipDistribution and REMOTE_ZIP_MIN_BYTES > 0:
+        return _open_remote_zip(url, key)
+    return _download(url, key)
+
+
+def _load_dist(key: str, distname: str, distribution_class: type[Distribution]):
+    # Another request may have loaded it just before this one took the lead.
+    if (distfile := dists.get(distname)) is not None:
+        return distfile
+
+    with metrics.timed("download"):
+        f = _open(key, distribution_class)
+
+    with metrics.timed("open"):
+        distfile = distribution_class(f)
+    dists[distname] = distfile
+    return distfile
+
 
+def _distribution_class(distname: str) -> type[Distribution] | None:
     if (
         distname.endswith(".whl")
         or distname.endswith(".zip")
         or distname.endswith(".egg")
     ):
-        distfile = ZipDistribution(f)
-        dists[distname] = distfile
-        return distfile
-
+        return ZipDistribution
     elif distname.endswith(".tar.gz"):
-        distfile = TarGzDistribution(f)
-        dists[distname] = distfile
-        return distfile
-
+        return TarGzDistribution
     else:
         # Not supported
         return None
+
+
+def _get_dist(first, second, rest, distname):
+    if (distfile := dists.get(distname)) is not None:
+        return distfile
+
+    if (distribution_class := _distribution_class(distname)) is None:
+        return None
+
+    # Distribution files never change once published, so their path is
+    # enough to identify them.
+    key = f"{first}/{second}/{rest}/{distname}"
+    try:
+        # Concurrent requests for the same distribution share one download.
+        return downloads.do(
+            key,
+            lambda: _load_dist(key, distname, distribution_class),
+            timeout=DOWNLOAD_TIMEOUT,
+        )
+    except TimeoutError:
+        raise DownloadTimeoutError(f"Timed out waiting for {distname}")
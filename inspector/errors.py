@@ -4,3 +4,13 @@ class InspectorError(Exception):
 
 class BadFileError(InspectorError):
     pass
+
+
+class DownloadTimeoutError(InspectorError):
+    pass
+
+
+class UpstreamError(InspectorError):
+    """
+    Reading a distribution from PyPI failed partway.
+    """
@@ -0,0 +1,190 @@
+"""
+This module contains a random-access reader for gzip streams.
+
+Seeking in a gzip stream normally means inflating everything before the
+target offset. Like zlib's `zran` example, `IndexedGzipFile` records a
+checkpoint of the inflater every `span` bytes of output the first time the
+stream is read, so that later reads only need to inflate from the nearest
+checkpoint before the requested offset.
+"""
+
+import bisect
+import io
+import os
+import zlib
+
+from typing import BinaryIO
+
+# Inflater state saved at each checkpoint: the 32 KiB window plus zlib's own
+# bookkeeping, rounded up.
+CHECKPOINT_OVERHEAD = 48 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class Checkpoint:
+    __slots__ = ("out_offset", "in_offset", "inflater")
+
+    def __init__(self, out_offset: int, in_offset: int, inflater):
+        self.out_offset = out_offset
+        self.in_offset = in_offset
+        self.inflater = inflater
+
+
+def _inflater():
+    # Expect (and verify) a gzip header and trailer.
+    return zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+
+class IndexedGzipFile(io.RawIOBase):
+    """
+    A read-only, seekable file object over the decompressed contents of a
+    (possibly multi-member) gzip stream.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        span: int = 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.fileobj = fileobj
+        self.span = span
+        self.chunk_size = chunk_size
+        self.checkpoints = [Checkpoint(0, 0, _inflater())]
+        self._offsets = [0]
+
+        self._pos = 0
+        self._restore(self.checkpoints[0])
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the checkpoint index.
+        """
+        return len(self.checkpoints) * CHECKPOINT_OVERHEAD
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            # The uncompressed size is only known once everything is inflated.
+            self._advance(float("inf"))
+            pos = self._head + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        pos = self._pos
+        if not self._buffer_offset <= pos <= self._head:
+            checkpoint = self._checkpoint_for(pos)
+            if pos < self._buffer_offset or checkpoint.out_offset > self._head:
+                self._restore(checkpoint)
+
+        if pos > self._head:
+            # Inflate up to `pos` without keeping the output around.
+            self._advance(pos, keep=False)
+
+        end = float("inf") if size is None or size < 0 else pos + size
+        self._advance(end)
+
+        start = pos - self._buffer_offset
+        stop = min(end, self._head) - self._buffer_offset
+        data = bytes(self._buffer[start:stop])
+        # Reads are mostly sequential, so drop what has been read.
+        del self._buffer[:stop]
+        self._buffer_offset += stop
+
+        self._pos = pos + len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def _checkpoint_for(self, pos: int) -> Checkpoint:
+        return self.checkpoints[bisect.bisect_right(self._offsets, pos) - 1]
+
+    def _restore(self, checkpoint: Checkpoint) -> None:
+        self._inflater = checkpoint.inflater.copy()
+        self._in_offset = checkpoint.in_offset
+        self._input = b""
+        self._buffer = bytearray()
+        self._buffer_offset = self._head = checkpoint.out_offset
+        self._eof = False
+
+    def _advance(self, target: float, keep: bool = True) -> None:
+        """
+        Inflate until the output reaches `target` or the end of the stream.
+        """
+        while self._head < target and not self._eof:
+            if not keep:
+                self._buffer.clear()
+                self._buffer_offset = self._head
+
+            out = self._inflate()
+            self._buffer += out
+            self._head += len(out)
+
+            last = self.checkpoints[-1]
+            if self._head >= last.out_offset + self.span:
+                self.checkpoints.append(
+                    Checkpoint(self._head, self._in_offset, self._inflater.copy())
+                )
+                self._offsets.append(self._head)
+
+    def _inflate(self) -> bytes:
+        if self._inflater.eof:
+            self._next_member()
+            if self._eof:
+                return b""
+
+        if not self._input:
+            self._read_input()
+            if not self._input:
+                raise EOFError(
+                    "Compressed file ended before the end-of-stream marker was "
+                    "reached"
+                )
+
+        # Never inflate more than a span at once, so that checkpoints end up
+        # roughly `span` bytes apart.
+        max_length = min(self.chunk_size * 4, self.span)
+        out = self._inflater.decompress(self._input, max_length)
+        if self._inflater.eof:
+            remaining = self._inflater.unused_data
+        else:
+            remaining = self._inflater.unconsumed_tail
+        self._in_offset += len(self._input) - len(remaining)
+        self._input = remaining
+        return out
+
+    def _read_input(self) -> None:
+        self.fileobj.seek(self._in_offset + len(self._input))
+        self._input += self.fileobj.read(self.chunk_size)
+
+    def _next_member(self) -> None:
+        if len(self._input) < len(GZIP_MAGIC):
+            self._read_input()
+
+        if self._input[:2] == GZIP_MAGIC:
+            self._inflater = _inflater()
+        else:
+            # End of the stream, ignoring any trailing padding.
+            self._eof = True
@@ -0,0 +1,94 @@
+"""
+This module contains server-side syntax highlighting, as an alternative to
+highlighting in the browser with Prism.
+"""
+
+import functools
+import os
+import re
+
+from hashlib import sha256
+
+from pygments import highlight as pygments_highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexer import Lexer
+from pygments.lexers import TextLexer, get_lexer_by_name, get_lexer_for_filename
+from pygments.util import ClassNotFound
+
+from . import metrics
+from .cache import LRUCache
+
+# Highlighting on the server is opt-in. Text longer than this is always left
+# to the browser, as it would take too long to highlight.
+SERVER_HIGHLIGHTING = bool(os.environ.get("INSPECTOR_SERVER_HIGHLIGHTING"))
+HIGHLIGHT_MAX_CHARS = int(os.environ.get("INSPECTOR_HIGHLIGHT_MAX_CHARS", 256 * 1024))
+
+HIGHLIGHT_CACHE_MAX_BYTES = int(
+    os.environ.get("INSPECTOR_HIGHLIGHT_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+
+# Pygments names line anchors "line-N", Prism's linkable line numbers (used
+# when highlighting in the browser) "line.N". Links to lines use the latter,
+# whichever way the page was highlighted.
+_line_anchor_re = re.compile(r'(id="|name="|href="#)line-(\d+)"')
+
+# Highlighted HTML, keyed by the SHA-256 of the text, its language, the number
+# of its first line, and the lines to mark.
+highlighted = LRUCache(HIGHLIGHT_CACHE_MAX_BYTES)
+metrics.register_cache("highlighted", highlighted)
+
+
+@functools.lru_cache(maxsize=256)
+def _lexer(filename: str | None, language: str | None) -> Lexer:
+    try:
+        if language is not None:
+            return get_lexer_by_name(language)
+        return get_lexer_for_filename(filename)
+    except ClassNotFound:
+        return TextLexer()
+
+
+def highlight(
+    text: str,
+    filename: str | None = None,
+    language: str | None = None,
+    first_line: int = 1,
+    marked_lines: tuple[tuple[int, int], ...] = (),
+) -> str | None:
+    """
+    Highlight `text`, a file named `filename` or in `language`, as HTML with
+    line numbers starting at `first_line` and the (inclusive) ranges of
+    `marked_lines` marked. Returns None if highlighting is left to the
+    browser.
+    """
+    if not SERVER_HIGHLIGHTING or len(text) > HIGHLIGHT_MAX_CHARS:
+        return None
+
+    lexer = _lexer(filename, language)
+    key = (
+        sha256(text.encode(errors="surrogatepass")).hexdigest(),
+        lexer.name,
+        first_line,
+        marked_lines,
+    )
+    if (html := highlighted.get(key)) is not None:
+        return html
+
+    formatter = HtmlFormatter(
+        linenos="inline",
+        linenostart=first_line,
+        lineanchors="line",
+        anchorlinenos=True,
+        # Relative to the first line, whatever its number
+        hl_lines=[
+            line - first_line + 1
+            for first, last in marked_lines
+            for line in range(first, last + 1)
+        ],
+        wrapcode=True,
+    )
+    html = _line_anchor_re.sub(
+        r'\1line.\2"', pygments_highlight(text, lexer, formatter)
+    )
+    highlighted[key] = html
+    return html
@@ -0,0 +1,79 @@
+"""
+This module contains an index of the lines of text files, for rendering large
+files a window of lines at a time.
+"""
+
+import os
+import re
+
+import numpy
+
+from . import metrics
+from .cache import LRUCache
+
+# Files are shown this many lines at a time, with at most this many
+# characters inline (minified files can be a few huge lines).
+CODE_WINDOW_LINES = int(os.environ.get("INSPECTOR_CODE_WINDOW_LINES", 2000))
+CODE_WINDOW_MAX_CHARS = int(
+    os.environ.get("INSPECTOR_CODE_WINDOW_MAX_CHARS", 1024 * 1024)
+)
+
+LINE_INDEX_CACHE_MAX_BYTES = int(
+    os.environ.get("INSPECTOR_LINE_INDEX_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+)
+
+_RANGE_RE = re.compile(r"(\d+)(?:-(\d+))?")
+
+
+class LineIndex:
+    """
+    The offsets at which each line of a text starts, found in one vectorized
+    pass over its code points.
+    """
+
+    def __init__(self, text: str):
+        code_points = numpy.frombuffer(text.encode("utf-32-le"), dtype=numpy.uint32)
+        newlines = numpy.flatnonzero(code_points == ord("\n"))
+        self.starts = numpy.concatenate([[0], newlines + 1])
+        self.length = len(text)
+        # A trailing newline ends the last line rather than starting another.
+        self.lines = len(self.starts) - (1 if text.endswith("\n") else 0)
+
+    def span(self, first: int, last: int) -> tuple[int, int]:
+        """
+        The offsets of the start and end of lines `first` to `last` (counting
+        from one, and inclusive), without the newline ending the last one.
+        """
+        start = int(self.starts[first - 1])
+        end = int(self.starts[last]) - 1 if last < len(self.starts) else self.length
+        return start, end
+
+    @property
+    def nbytes(self) -> int:
+        return self.starts.nbytes
+
+
+# Line indexes, keyed by the SHA-256 of the file.
+line_indexes = LRUCache(LINE_INDEX_CACHE_MAX_BYTES, sizeof=lambda index: index.nbytes)
+metrics.register_cache("line_indexes", line_indexes)
+
+
+def line_index(text: str, digest: str) -> LineIndex:
+    if (index := line_indexes.get(digest)) is None:
+        index = line_indexes[digest] = LineIndex(text)
+    return index
+
+
+def parse_range(value: str) -> tuple[int, int]:
+    """
+    Parse a range of lines like "10-20" (or just "10"). Raises `ValueError`
+    if it isn't one.
+    """
+    match = _RANGE_RE.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Invalid range of lines: {value!r}")
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if first < 1 or last < first:
+        raise ValueError(f"Invalid range of lines: {value!r}")
+    return first, last
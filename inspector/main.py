@@ -1,176 +1,241 @@
+import hashlib
+import math
+import mimetypes
 import os
+import time
 import urllib.parse
 
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import gunicorn.http.errors
+import requests
 import sentry_sdk
 
-from flask import Flask, Response, abort, redirect, render_template, request, url_for
+from flask import (
+    Flask,
+    Response,
+    abort,
+    g,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    url_for,
+)
 from packaging.utils import canonicalize_name
 from sentry_sdk.integrations.flask import FlaskIntegration
 
-from .analysis.checks import basic_details
-from .deob import decompile, disassemble
+from . import assets, metrics
+from .analysis.pipeline import analyze
+from .charset import decode_with_fallback
+from .deob import disassemble_and_decompile, is_complete
 from .distribution import _get_dist
-from .errors import InspectorError
+from .errors import DownloadTimeoutError, InspectorError, UpstreamError
+from .highlight import highlight
 from .legacy import parse
-from .utilities import pypi_report_form, requests_session
+from .lines import CODE_WINDOW_LINES, CODE_WINDOW_MAX_CHARS, line_index, parse_range
+from .metadata import project_metadata, release_metadata
+from .prefetch import PREFETCH, prefetcher
+from .utilities import pypi_report_form
 
 
-def _is_likely_text(decoded_str):
-    """Check if decoded string looks like valid text (not corrupted)."""
-    if not decoded_str:
-        return True
+def traces_sampler(sampling_context):
+    """
+    Filter out noisy transactions.
+    See https://github.com/getsentry/sentry-python/discussions/1569
+    """
+    path = sampling_context.get("wsgi_environ", {}).get("PATH_INFO", None)
+    if path and path in ("/_health/", "/_metrics/"):
+        return 0
+    return 1
 
-    # Too many control characters suggests wrong encoding
-    control_chars = sum(1 for c in decoded_str if ord(c) < 32 and c not in "\t\n\r")
-    return control_chars / len(decoded_str) <= 0.3
 
+if SENTRY_DSN := os.environ.get("SENTRY_DSN"):
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        integrations=[FlaskIntegration()],
+        traces_sample_rate=1.0,
+        traces_sampler=traces_sampler,
+    )
 
-def _is_likely_misencoded_asian_text(decoded_str, encoding):
-    """
-    Detect when Western encodings decode Asian text as Latin Extended garbage.
+# Upstream fetches (metadata and distributions) run concurrently on this pool.
+# A request must be answered within REQUEST_DEADLINE seconds, which stays
+# below gunicorn's 10 s timeout: it stops waiting for upstream fetches then,
+# and later stages (like decompiling) get whatever time is left.
+UPSTREAM_WORKERS = int(os.environ.get("INSPECTOR_UPSTREAM_WORKERS", 8))
+REQUEST_DEADLINE = float(os.environ.get("INSPECTOR_REQUEST_DEADLINE", 8))
 
-    When cp1252/latin-1 decode multi-byte Asian text, they produce strings
-    with many Latin Extended/Supplement characters and few/no spaces.
-    """
-    if encoding not in ("cp1252", "latin-1") or len(decoded_str) <= 3:
-        return False
+upstream = ThreadPoolExecutor(
+    max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream"
+)
 
-    # Count Latin Extended-A/B (Ā-ʯ) and Latin-1 Supplement (À-ÿ)
-    high_latin = sum(1 for c in decoded_str if 0x0080 <= ord(c) <= 0x024F)
-    spaces = decoded_str.count(" ")
+# Stands in for a distribution that is still being fetched at the deadline.
+PENDING = object()
 
-    # If >50% high Latin chars and <10% spaces, likely misencoded
-    return high_latin / len(decoded_str) > 0.5 and spaces < len(decoded_str) * 0.1
+# Distributions with more files than this are browsed one directory at a
+# time, a page of entries at a time, rather than listed in full.
+FLAT_LISTING_MAX_FILES = int(os.environ.get("INSPECTOR_FLAT_LISTING_MAX_FILES", 1000))
+LISTING_PAGE_SIZE = int(os.environ.get("INSPECTOR_LISTING_PAGE_SIZE", 500))
 
+# Pages of distributions and their files never change, so they're cached for
+# a year and revalidated by ETag. Whether the project and release are still on
+# PyPI can change, so the breadcrumbs say so in a fragment fetched separately,
+# with a short lifetime.
+IMMUTABLE_ENDPOINTS = {"distribution", "file"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+BREADCRUMBS_MAX_AGE = int(os.environ.get("INSPECTOR_BREADCRUMBS_MAX_AGE", 300))
 
-def _is_likely_misencoded_cross_asian(decoded_str, encoding):
-    """
-    Detect when Asian encodings misinterpret other Asian encodings.
+H2_PAREN = "View this project on PyPI"
+H3_PAREN = "View this release on PyPI"
+
+app = Flask(__name__)
+
+app.jinja_env.filters["unquote"] = lambda u: urllib.parse.unquote(u)
+app.jinja_env.trim_blocks = True
+app.jinja_env.lstrip_blocks = True
+app.jinja_env.globals.update(asset_url=assets.asset_url, prism_urls=assets.prism_urls)
+
+
+@app.errorhandler(gunicorn.http.errors.ParseException)
+def handle_bad_request(e):
+    return abort(400)
+
+
+def _status_code(future: Future, deadline: float) -> int | None:
+    try:
+        return future.result(timeout=max(0, deadline - time.monotonic())).status_code
+    except (TimeoutError, requests.RequestException):
+        return None
 
-    Patterns:
-    - shift_jis decoding GB2312 produces excessive half-width katakana
-    - Asian encodings decoding Western text produce ASCII+CJK mix (unlikely)
+
+def _deadline() -> float:
     """
-    if len(decoded_str) <= 3:
-        return False
-
-    # Pattern 1: Excessive half-width katakana (shift_jis misinterpreting GB2312)
-    # Half-width katakana range: U+FF61-FF9F
-    if encoding == "shift_jis":
-        half_width_katakana = sum(1 for c in decoded_str if 0xFF61 <= ord(c) <= 0xFF9F)
-        # If >30% is half-width katakana, likely wrong encoding
-        # (Real Japanese text uses mostly full-width kana and kanji)
-        if half_width_katakana / len(decoded_str) > 0.3:
-            return True
-
-    # Pattern 2: ASCII mixed with CJK (Asian encoding misinterpreting Western)
-    # CJK Unified Ideographs: U+4E00-U+9FFF
-    if encoding in ("big5", "gbk", "gb2312", "shift_jis", "euc-kr"):
-        ascii_chars = sum(1 for c in decoded_str if ord(c) < 128)
-        cjk_chars = sum(1 for c in decoded_str if 0x4E00 <= ord(c) <= 0x9FFF)
-
-        # If we have ASCII letters and scattered CJK chars, likely misencoded
-        # Real CJK text is mostly CJK with occasional ASCII punctuation
-        if ascii_chars > 0 and cjk_chars > 0:
-            # Check if there are ASCII letters (not just punctuation)
-            ascii_letters = sum(1 for c in decoded_str if c.isalpha() and ord(c) < 128)
-            # If we have ASCII letters AND CJK, and CJK is <50%, likely wrong
-            if ascii_letters >= 2 and cjk_chars / len(decoded_str) < 0.5:
-                return True
-
-    return False
-
-
-def decode_with_fallback(content_bytes):
+    When the current request must be answered by.
     """
-    Decode bytes to string, trying multiple encodings.
+    return g.setdefault("deadline", time.monotonic() + REQUEST_DEADLINE)
 
-    Strategy:
-    1. Try UTF-8 (most common)
-    2. Try common encodings with sanity checks
-    3. Fall back to latin-1 (decodes anything, but may produce garbage)
 
-    Returns decoded string or None if all attempts fail (only if truly binary).
+def _fetch_dist(first, second, rest, distname):
+    """
+    Fetch the distribution, returning `PENDING` if it isn't ready by the
+    request deadline.
     """
-    # Try UTF-8 first (most common)
+    dist = metrics.submit(upstream, _get_dist, first, second, rest, distname)
     try:
-        decoded = content_bytes.decode("utf-8")
-        # Apply same heuristics as other encodings
-        if _is_likely_text(decoded):
-            return decoded
-    except (UnicodeDecodeError, AttributeError):
-        pass
-
-    # Try encodings from most to least restrictive. Even with improved heuristics,
-    # putting GBK/GB2312 early breaks too many other encodings. The order below
-    # maximizes correct detections while minimizing misdetections.
-    common_encodings = [
-        "shift_jis",  # Japanese (restrictive multi-byte)
-        "euc-kr",  # Korean (restrictive multi-byte)
-        "big5",  # Chinese Traditional (restrictive multi-byte)
-        "gbk",  # Chinese Simplified
-        "gb2312",  # Chinese Simplified, older
-        "cp1251",  # Cyrillic
-        "iso-8859-2",  # Central/Eastern European
-        "cp1252",  # Windows Western European (very permissive)
-        "latin-1",  # ISO-8859-1 fallback (never fails)
-    ]
-
-    for encoding in common_encodings:
-        try:
-            decoded = content_bytes.decode(encoding)
+        # The download carries on in the background if this times out, so a
+        # retry will likely find it cached.
+        with metrics.timed("dist"):
+            return dist.result(max(0, _deadline() - time.monotonic()))
+    except TimeoutError:
+        return PENDING
 
-            # Skip if decoded text looks corrupted
-            if not _is_likely_text(decoded):
-                continue
 
-            # Skip if Western encoding produced Asian-text-as-garbage pattern
-            if _is_likely_misencoded_asian_text(decoded, encoding):
-                continue
+def _breadcrumb_labels(project_name, version):
+    """
+    Fetch the project and release metadata concurrently, for the labels of
+    the breadcrumbs. Metadata that isn't ready by the request deadline leaves
+    the labels at their defaults.
+    """
+    deadline = _deadline()
+    project = metrics.submit(upstream, project_metadata, project_name)
+    release = metrics.submit(upstream, release_metadata, project_name, version)
 
-            # Skip if Asian encoding misinterpreted other Asian/Western text
-            if _is_likely_misencoded_cross_asian(decoded, encoding):
-                continue
+    h2_paren = H2_PAREN
+    if _status_code(project, deadline) == 404:
+        h2_paren = "❌ Project no longer on PyPI"
 
-            return decoded
+    h3_paren = H3_PAREN
+    if _status_code(release, deadline) == 404:
+        h3_paren = "❌ Release no longer on PyPI"
 
-        except (UnicodeDecodeError, LookupError):
-            continue
+    return h2_paren, h3_paren
 
-    # If we get here, all encodings failed sanity checks (truly binary data)
-    return None
 
+def _source_digest():
+    """
+    A digest of Inspector's code, templates and built assets, and of its
+    configuration, so that a deploy changing any of them invalidates every
+    ETag.
+    """
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in sorted(os.walk(os.path.dirname(__file__))):
+        for filename in sorted(filenames):
+            if filename.endswith((".py", ".html", assets.MANIFEST)):
+                with open(os.path.join(dirpath, filename), "rb") as f:
+                    digest.update(f.read())
+    for key, value in sorted(os.environ.items()):
+        if key.startswith("INSPECTOR_"):
+            digest.update(f"{key}={value}\n".encode())
+    return digest.hexdigest()
 
-def traces_sampler(sampling_context):
+
+ETAG_SALT = _source_digest()
+
+
+def _etag():
     """
-    Filter out noisy transactions.
-    See https://github.com/getsentry/sentry-python/discussions/1569
+    A strong validator for the current request. Distribution paths are
+    content-addressed, so the page at a given URL only changes when Inspector
+    itself does.
     """
-    path = sampling_context.get("wsgi_environ", {}).get("PATH_INFO", None)
-    if path and path == "/_health/":
-        return 0
-    return 1
+    key = f"{ETAG_SALT}\n{request.path}?{request.query_string.decode()}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
 
 
-if SENTRY_DSN := os.environ.get("SENTRY_DSN"):
-    sentry_sdk.init(
-        dsn=SENTRY_DSN,
-        integrations=[FlaskIntegration()],
-        traces_sample_rate=1.0,
-        traces_sampler=traces_sampler,
-    )
+@app.before_request
+def _start_deadline():
+    g.deadline = time.monotonic() + REQUEST_DEADLINE
 
-app = Flask(__name__)
 
-app.jinja_env.filters["unquote"] = lambda u: urllib.parse.unquote(u)
-app.jinja_env.trim_blocks = True
-app.jinja_env.lstrip_blocks = True
+@app.before_request
+def _start_timings():
+    g.started = time.perf_counter()
+    g.timings = metrics.start_request()
 
 
-@app.errorhandler(gunicorn.http.errors.ParseException)
-def handle_bad_request(e):
-    return abort(400)
+@app.after_request
+def _server_timing(response):
+    if "timings" in g:
+        total = time.perf_counter() - g.started
+        metrics.observe(
+            "inspector_request_seconds", total, endpoint=request.endpoint or "none"
+        )
+        response.headers["Server-Timing"] = metrics.server_timing(
+            [*g.timings, ("total", total)]
+        )
+    return response
+
+
+@app.before_request
+def _not_modified():
+    # Answered before the view runs, so before any download or archive work.
+    if request.endpoint in IMMUTABLE_ENDPOINTS:
+        etag = _etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            return response
+
+
+@app.after_request
+def _cache_immutable(response):
+    if request.endpoint in IMMUTABLE_ENDPOINTS and response.status_code == 200:
+        if g.get("incomplete"):
+            # Another try may well get further.
+            response.headers["Cache-Control"] = "no-store"
+        else:
+            response.set_etag(_etag())
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _pending(**breadcrumbs):
+    return (
+        render_template("pending.html", **breadcrumbs),
+        503,
+        {"Retry-After": "5"},
+    )
 
 
 @app.route("/")
@@ -188,7 +253,7 @@ def versions(project_name):
             url_for("versions", project_name=canonicalize_name(project_name)), 301
         )
 
-    resp = requests_session().get(f"https://pypi.org/pypi/{project_name}/json")
+    resp = project_metadata(project_name)
     pypi_project_url = f"https://pypi.org/project/{project_name}"
 
     # Self-host 404 page to mitigate iframe embeds
@@ -225,16 +290,16 @@ def distributions(project_name, version):
             301,
         )
 
-    resp = requests_session().get(
-        f"https://pypi.org/pypi/{project_name}/{version}/json"
-    )
+    resp = release_metadata(project_name, version)
     if resp.status_code != 200:
         return redirect(f"/project/{project_name}/")
 
-    dist_urls = [
-        "." + urllib.parse.urlparse(url["url"]).path + "/"
-        for url in resp.json()["urls"]
-    ]
+    files = resp.json()["urls"]
+    if PREFETCH:
+        # One of them is usually opened next.
+        prefetcher.schedule(files)
+
+    dist_urls = ["." + urllib.parse.urlparse(url["url"]).path + "/" for url in files]
     return render_template(
         "links.html",
         links=dist_urls,
@@ -268,44 +333,98 @@ def distribution(project_name, version, first, second, rest, distname):
         )
 
     try:
-        dist = _get_dist(first, second, rest, distname)
+        dist = _fetch_dist(first, second, rest, distname)
+    except DownloadTimeoutError:
+        return abort(504)
+    except UpstreamError:
+        return abort(502)
     except InspectorError:
         return abort(400)
 
-    h2_paren = "View this project on PyPI"
-    resp = requests_session().get(f"https://pypi.org/pypi/{project_name}/json")
-    if resp.status_code == 404:
-        h2_paren = "❌ Project no longer on PyPI"
-
-    h3_paren = "View this release on PyPI"
-    resp = requests_session().get(
-        f"https://pypi.org/pypi/{project_name}/{version}/json"
-    )
-    if resp.status_code == 404:
-        h3_paren = "❌ Release no longer on PyPI"
-
-    if dist:
-        file_urls = [
-            "./" + urllib.parse.quote(filename) for filename in dist.namelist()
-        ]
-        return render_template(
-            "links.html",
-            links=file_urls,
+    if dist is PENDING:
+        return _pending(
             h2=f"{project_name}",
             h2_link=f"/project/{project_name}",
-            h2_paren=h2_paren,
-            h2_paren_link=f"https://pypi.org/project/{project_name}",
             h3=f"{project_name}=={version}",
             h3_link=f"/project/{project_name}/{version}",
-            h3_paren=h3_paren,
-            h3_paren_link=f"https://pypi.org/project/{project_name}/{version}",
             h4=distname,
-            h4_link=f"/project/{project_name}/{version}/packages/{first}/{second}/{rest}/{distname}/",  # noqa
         )
+
+    if dist:
+        common_params = {
+            "h2": f"{project_name}",
+            "h2_link": f"/project/{project_name}",
+            "h2_paren": H2_PAREN,
+            "h2_paren_link": f"https://pypi.org/project/{project_name}",
+            "h3": f"{project_name}=={version}",
+            "h3_link": f"/project/{project_name}/{version}",
+            "h3_paren": H3_PAREN,
+            "h3_paren_link": f"https://pypi.org/project/{project_name}/{version}",
+            "breadcrumbs_url": url_for(
+                "breadcrumbs", project_name=project_name, version=version
+            ),
+            "h4": distname,
+            "h4_link": f"/project/{project_name}/{version}/packages/{first}/{second}/{rest}/{distname}/",  # noqa
+        }
+
+        path = request.args.get("path")
+        if path is None and len(dist.namelist()) <= FLAT_LISTING_MAX_FILES:
+            file_urls = [
+                "./" + urllib.parse.quote(filename) for filename in dist.namelist()
+            ]
+            return render_template("links.html", links=file_urls, **common_params)
+
+        return _directory(dist, path or "", request.args.get("after"), common_params)
     else:
         return "Distribution type not supported"
 
 
+def _directory_url(path: str, after: str | None = None) -> str:
+    query = {"path": path}
+    if after is not None:
+        query["after"] = after
+    return "?" + urllib.parse.urlencode(query, safe="/", quote_via=urllib.parse.quote)
+
+
+def _directory(dist, path, after, common_params):
+    """
+    Render one page of the immediate children of the directory `path`.
+    """
+    if path and not path.endswith("/"):
+        path += "/"
+    tree = dist.tree()
+    if path not in tree:
+        return abort(404)
+
+    entries, cursor = tree.page(path, after, LISTING_PAGE_SIZE)
+    parents = []
+    prefix = ""
+    for name in path.split("/")[:-1]:
+        prefix += name + "/"
+        parents.append({"name": name + "/", "url": _directory_url(prefix)})
+
+    return render_template(
+        "tree.html",
+        directory=tree.stats(path),
+        root_url=_directory_url(""),
+        parents=parents,
+        entries=[
+            {
+                "entry": entry,
+                "url": (
+                    _directory_url(entry.path)
+                    if entry.is_dir
+                    else "./" + urllib.parse.quote(entry.path)
+                ),
+            }
+            for entry in entries
+        ],
+        first_url=_directory_url(path) if after is not None else None,
+        next_url=_directory_url(path, cursor) if cursor is not None else None,
+        **common_params,
+    )
+
+
 @app.route(
     "/project/<project_name>/<version>/packages/<first>/<second>/<rest>/<distname>/<path:filepath>"  # noqa
 )
@@ -325,41 +444,54 @@ def file(project_name, version, first, second, rest, distname, filepath):
             301,
         )
 
-    h2_paren = "View this project on PyPI"
-    resp = requests_session().get(f"https://pypi.org/pypi/{project_name}/json")
-    if resp.status_code == 404:
-        h2_paren = "❌ Project no longer on PyPI"
+    try:
+        dist = _fetch_dist(first, second, rest, distname)
+    except DownloadTimeoutError:
+        return abort(504)
+    except UpstreamError:
+        return abort(502)
+    except InspectorError:
+        return abort(400)
 
-    h3_paren = "View this release on PyPI"
-    resp = requests_session().get(
-        f"https://pypi.org/pypi/{project_name}/{version}/json"
-    )
-    if resp.status_code == 404:
-        h3_paren = "❌ Release no longer on PyPI"
+    if dist is PENDING:
+        return _pending(
+            h2=f"{project_name}",
+            h2_link=f"/project/{project_name}",
+            h3=f"{project_name}=={version}",
+            h3_link=f"/project/{project_name}/{version}",
+            h4=distname,
+            h5=filepath,
+        )
 
-    dist = _get_dist(first, second, rest, distname)
     if dist:
         try:
-            contents = dist.contents(filepath)
+            # Read the member once, for both the analysis and the rendering.
+            analysis = analyze(dist, filepath)
         except FileNotFoundError:
             return abort(404)
+        except UpstreamError:
+            return abort(502)
         except InspectorError:
             return abort(400)
+        contents = analysis.contents
         file_extension = filepath.split(".")[-1]
         report_link = pypi_report_form(project_name, version, filepath, request.url)
 
-        details = [detail.html() for detail in basic_details(dist, filepath)]
+        details = [detail.html() for detail in analysis.details]
         common_params = {
             "file_details": details,
             "mailto_report_link": report_link,
             "h2": f"{project_name}",
             "h2_link": f"/project/{project_name}",
-            "h2_paren": h2_paren,
+            "h2_paren": H2_PAREN,
             "h2_paren_link": f"https://pypi.org/project/{project_name}",
             "h3": f"{project_name}=={version}",
             "h3_link": f"/project/{project_name}/{version}",
-            "h3_paren": h3_paren,
+            "h3_paren": H3_PAREN,
             "h3_paren_link": f"https://pypi.org/project/{project_name}/{version}",
+            "breadcrumbs_url": url_for(
+                "breadcrumbs", project_name=project_name, version=version
+            ),
             "h4": distname,
             "h4_link": f"/project/{project_name}/{version}/packages/{first}/{second}/{rest}/{distname}/",  # noqa
             "h5": filepath,
@@ -367,33 +499,148 @@ def file(project_name, version, first, second, rest, distname, filepath):
         }
 
         if file_extension in ["pyc", "pyo"]:
-            disassembly = disassemble(contents)
-            decompilation = decompile(contents)
-            return render_template(
-                "disasm.html",
-                disassembly=disassembly,
-                decompilation=decompilation,
-                **common_params,
+            # Output is cached by the hash of the bytecode.
+            digest = analysis.results["sha256"]
+            disassembly, decompilation = disassemble_and_decompile(
+                contents, digest, _deadline()
             )
+            g.incomplete = not (is_complete(disassembly) and is_complete(decompilation))
+            highlighted = None
+            # Otherwise left to the browser
+            if time.monotonic() < _deadline():
+                with metrics.timed("highlight"):
+                    highlighted = highlight(decompilation, language="python")
+            with metrics.timed("render"):
+                return render_template(
+                    "disasm.html",
+                    disassembly=disassembly,
+                    decompilation=decompilation,
+                    highlighted_decompilation=highlighted,
+                    **common_params,
+                )
 
         if isinstance(contents, bytes):
-            decoded_contents = decode_with_fallback(contents)
+            with metrics.timed("decode"):
+                decoded_contents = decode_with_fallback(contents)
             if decoded_contents is None:
                 return "Binary files are not supported."
             contents = decoded_contents
 
-        return render_template(
-            "code.html", code=contents, name=file_extension, **common_params
-        )  # noqa
+        window = {}
+        lines = request.args.get("lines")
+        if lines is not None or len(contents) > CODE_WINDOW_MAX_CHARS:
+            # Large files are shown a window of lines at a time.
+            with metrics.timed("lines"):
+                index = line_index(contents, analysis.results["sha256"])
+            try:
+                line_first, line_last = (
+                    parse_range(lines) if lines else (1, CODE_WINDOW_LINES)
+                )
+            except ValueError:
+                return abort(400)
+            if line_first > index.lines:
+                return abort(404)
+            line_last = min(line_last, line_first + CODE_WINDOW_LINES - 1, index.lines)
+
+            start, end = index.span(line_first, line_last)
+            window = {
+                "first": line_first,
+                "last": line_last,
+                "lines": index.lines,
+                "truncated": end - start > CODE_WINDOW_MAX_CHARS,
+                "previous_url": (
+                    f"?lines={max(1, line_first - CODE_WINDOW_LINES)}-{line_first - 1}"
+                    if line_first > 1
+                    else None
+                ),
+                "next_url": (
+                    f"?lines={line_last + 1}-{line_last + CODE_WINDOW_LINES}"
+                    if line_last < index.lines
+                    else None
+                ),
+            }
+            end = min(end, start + CODE_WINDOW_MAX_CHARS)
+            contents = contents[start:end]
+
+        line_first, line_last = window.get("first", 1), window.get("last", math.inf)
+        marked_lines = tuple(
+            (max(region.first_line, line_first), min(region.last_line, line_last))
+            for region in analysis.results["entropy_regions"]
+            if region.first_line <= line_last and region.last_line >= line_first
+        )
+        highlighted = None
+        # Otherwise left to the browser
+        if time.monotonic() < _deadline():
+            with metrics.timed("highlight"):
+                highlighted = highlight(
+                    contents,
+                    filename=filepath,
+                    first_line=line_first,
+                    marked_lines=marked_lines,
+                )
+        with metrics.timed("render"):
+            return render_template(
+                "code.html",
+                code=contents,
+                name=file_extension,
+                highlight_lines=",".join(f"{a}-{b}" for a, b in marked_lines),
+                highlighted=highlighted,
+                window=window,
+                **common_params,
+            )
     else:
         return "Distribution type not supported"
 
 
+@app.route("/_breadcrumbs/<project_name>/<version>/")
+def breadcrumbs(project_name, version):
+    """
+    The labels of the breadcrumbs of a distribution's pages, which are filled
+    in from here so that the pages themselves can be cached indefinitely.
+    """
+    h2_paren, h3_paren = _breadcrumb_labels(project_name, version)
+    return (
+        {"h2_paren": h2_paren, "h3_paren": h3_paren},
+        200,
+        {"Cache-Control": f"public, max-age={BREADCRUMBS_MAX_AGE}"},
+    )
+
+
+@app.route("/assets/<path:filename>")
+def asset(filename):
+    """
+    A built static asset, precompressed if the client accepts it. Their names
+    are fingerprinted, so they're cached indefinitely.
+    """
+    found = assets.find(filename, request.accept_encodings)
+    if found is None:
+        # Pages cached from a previous build can still refer to its assets.
+        if (url := assets.current(filename)) is not None:
+            return redirect(url)
+        return abort(404)
+
+    path, encoding = found
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0])
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
 @app.route("/_health/")
 def health():
     return "OK"
 
 
+@app.route("/_metrics/")
+def prometheus():
+    """
+    This worker's metrics, in the Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/robots.txt")
 def robots():
     return Response("User-agent: *\nDisallow: /", mimetype="text/plain")
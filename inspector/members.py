@@ -0,0 +1,124 @@
+"""
+This module contains a compact index of the members of an archive.
+"""
+
+import sys
+
+from array import array
+from typing import Any
+
+
+class MemberTable:
+    """
+    The members of an archive, stored in parallel arrays.
+
+    Keeping a `TarInfo`/`ZipInfo` object per member costs hundreds of bytes
+    each, which adds up for sdists with tens of thousands of files. Here each
+    member is a row across a few typed arrays, with its (interned) name as the
+    key. Members that need more than that to be read back (e.g. sparse tar
+    members or encrypted zip members) keep their original info object in
+    `special`.
+    """
+
+    # Flags
+    DIRECTORY = 1
+    SYMLINK = 2
+    HARDLINK = 4
+    # Not a regular file, and no way to read its data
+    OTHER = 8
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.offsets = array("Q")
+        # Where a member's data must end: the next member's offset (0 if
+        # unknown), to detect overlapping zip entries.
+        self.end_offsets = array("Q")
+        self.sizes = array("Q")
+        self.compressed_sizes = array("Q")
+        self.crcs = array("L")
+        self.methods = array("H")
+        self.flags = array("B")
+        self.links: dict[int, str] = {}
+        self.special: dict[int, Any] = {}
+
+        self._index: dict[str, int] = {}
+        self._files: tuple[str, ...] = ()
+        self._nbytes = 0
+
+    def add(
+        self,
+        name: str,
+        offset: int,
+        size: int,
+        compressed_size: int = 0,
+        crc: int = 0,
+        method: int = 0,
+        flags: int = 0,
+        end_offset: int = 0,
+    ) -> int:
+        i = len(self.names)
+        name = sys.intern(name)
+        self.names.append(name)
+        self.offsets.append(offset)
+        self.end_offsets.append(end_offset)
+        self.sizes.append(size)
+        self.compressed_sizes.append(compressed_size)
+        self.crcs.append(crc)
+        self.methods.append(method)
+        self.flags.append(flags)
+        # Like `tarfile` and `zipfile`, the last member with a name wins.
+        self._index[name] = i
+        return i
+
+    def freeze(self) -> None:
+        """
+        Called once all members have been added.
+        """
+        self.names = tuple(self.names)
+        self._files = tuple(
+            name
+            for name, flags in zip(self.names, self.flags)
+            if not flags & self.DIRECTORY
+        )
+
+        arrays = (
+            self.offsets,
+            self.end_offsets,
+            self.sizes,
+            self.compressed_sizes,
+            self.crcs,
+            self.methods,
+            self.flags,
+        )
+        self._nbytes = (
+            sum(sys.getsizeof(a) for a in arrays)
+            + sum(sys.getsizeof(name) for name in self.names)
+            + sys.getsizeof(self.names)
+            + sys.getsizeof(self._files)
+            + sys.getsizeof(self._index)
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def find(self, name: str) -> int | None:
+        return self._index.get(name)
+
+    def files(self) -> tuple[str, ...]:
+        """
+        The names of all members that are not directories, in archive order.
+        """
+        return self._files
+
+    def size(self, name: str) -> int:
+        return self.sizes[self._index[name]]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the table, as of the last `freeze()`.
+        """
+        return self._nbytes
@@ -0,0 +1,174 @@
+"""
+This module contains a cache for PyPI's JSON API.
+"""
+
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import metrics
+from .cache import LRUCache
+from .utilities import requests_session
+
+# How long, in seconds, responses are fresh for: project pages change with
+# every upload, releases only when files are yanked or deleted.
+PROJECT_TTL = float(os.environ.get("INSPECTOR_PROJECT_METADATA_TTL", 60))
+RELEASE_TTL = float(os.environ.get("INSPECTOR_RELEASE_METADATA_TTL", 600))
+NOT_FOUND_TTL = float(os.environ.get("INSPECTOR_NOT_FOUND_METADATA_TTL", 60))
+
+# How long past their TTL responses are still served while they are
+# revalidated in the background.
+STALE_WHILE_REVALIDATE = float(
+    os.environ.get("INSPECTOR_METADATA_STALE_WHILE_REVALIDATE", 3600)
+)
+
+METADATA_CACHE_MAX_BYTES = int(
+    os.environ.get("INSPECTOR_METADATA_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+
+# Responses worth caching; anything else is treated as a transient error.
+CACHEABLE_STATUSES = (200, 404)
+
+
+class Metadata:
+    """
+    A cached response from the JSON API.
+    """
+
+    __slots__ = ("status_code", "etag", "content", "expires")
+
+    def __init__(self, status_code: int, etag: str | None, content: bytes, expires):
+        self.status_code = status_code
+        self.etag = etag
+        self.content = content
+        self.expires = expires
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class MetadataCache:
+    """
+    A cache of JSON API responses with per-URL TTLs.
+
+    Expired responses are revalidated with `If-None-Match`, and for up to
+    `stale_while_revalidate` seconds past their TTL they keep being served
+    while that happens in the background. 404s are cached too, for
+    `not_found_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        not_found_ttl: float = NOT_FOUND_TTL,
+        stale_while_revalidate: float = STALE_WHILE_REVALIDATE,
+    ):
+        self.not_found_ttl = not_found_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.revalidations = 0
+
+        self._entries = LRUCache(max_bytes, sizeof=lambda m: len(m.content) + 200)
+        self._revalidating: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="metadata"
+        )
+
+    def get(self, url: str, ttl: float) -> Metadata:
+        now = time.monotonic()
+        entry = self._entries.get(url)
+        if entry is None:
+            return self._fetch(url, ttl)
+        if now < entry.expires:
+            return entry
+        if now < entry.expires + self.stale_while_revalidate:
+            self._revalidate_later(url, ttl, entry)
+            return entry
+        return self._fetch(url, ttl, entry)
+
+    @property
+    def hits(self) -> int:
+        return self._entries.hits
+
+    @property
+    def misses(self) -> int:
+        return self._entries.misses
+
+    @property
+    def evictions(self) -> int:
+        return self._entries.evictions
+
+    @property
+    def size(self) -> int:
+        return self._entries.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {**self._entries.stats(), "revalidations": self.revalidations}
+
+    def _revalidate_later(self, url: str, ttl: float, entry: Metadata) -> None:
+        with self._lock:
+            if url in self._revalidating:
+                return
+            self._revalidating.add(url)
+
+        def revalidate():
+            try:
+                self._fetch(url, ttl, entry)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(url)
+
+        self._executor.submit(revalidate)
+
+    def _fetch(self, url: str, ttl: float, entry: Metadata | None = None) -> Metadata:
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+
+        try:
+            with metrics.timed("metadata"):
+                resp = requests_session().get(url, headers=headers)
+        except requests.RequestException:
+            if entry is None:
+                raise
+            return entry
+        if resp.status_code == 304 and entry is not None:
+            self.revalidations += 1
+            status_code, etag, content = entry.status_code, entry.etag, entry.content
+        else:
+            status_code = resp.status_code
+            etag, content = resp.headers.get("ETag"), resp.content
+
+        if status_code not in CACHEABLE_STATUSES:
+            # Keep serving what we had rather than a transient error.
+            return (
+                entry if entry is not None else Metadata(status_code, etag, content, 0)
+            )
+
+        if status_code == 404:
+            ttl = self.not_found_ttl
+        metadata = Metadata(status_code, etag, content, time.monotonic() + ttl)
+        self._entries[url] = metadata
+        return metadata
+
+
+cache = MetadataCache(METADATA_CACHE_MAX_BYTES)
+metrics.register_cache("metadata", cache)
+
+
+def project_metadata(project_name: str) -> Metadata:
+    return cache.get(f"https://pypi.org/pypi/{project_name}/json", PROJECT_TTL)
+
+
+def release_metadata(project_name: str, version: str) -> Metadata:
+    return cache.get(
+        f"https://pypi.org/pypi/{project_name}/{version}/json", RELEASE_TTL
+    )
@@ -0,0 +1,170 @@
+"""
+This module contains lightweight instrumentation: timers for the stages of
+handling a request, which are reported in its Server-Timing header, and
+counters and histograms, which are exposed in the Prometheus text format.
+
+Metrics are kept per worker process, so each scrape of `/_metrics` reports
+the worker that served it.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+
+from bisect import bisect_left
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Iterator
+
+# Upper bounds of the buckets of duration histograms, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    "inspector_request_seconds": ("histogram", "Time spent handling requests."),
+    "inspector_stage_seconds": ("histogram", "Time spent in each stage."),
+    "inspector_downloaded_bytes_total": ("counter", "Bytes downloaded from PyPI."),
+    "inspector_subprocesses_total": ("counter", "Decompiler subprocesses run."),
+    "inspector_cache_hits_total": ("counter", "Cache hits."),
+    "inspector_cache_misses_total": ("counter", "Cache misses."),
+    "inspector_cache_evictions_total": ("counter", "Cache evictions."),
+    "inspector_cache_bytes": ("gauge", "Size of the cache."),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, Labels], float] = {}
+_histograms: dict[tuple[str, Labels], _Histogram] = {}
+_caches: dict[str, Any] = {}
+
+# The timings of the stages of the current request, if any
+_timings: contextvars.ContextVar[list[tuple[str, float]] | None] = (
+    contextvars.ContextVar("timings", default=None)
+)
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        if (histogram := _histograms.get(key)) is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.counts[bisect_left(BUCKETS, value)] += 1
+        histogram.sum += value
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """
+    Report the hits, misses, evictions and size of `cache` (an `LRUCache`,
+    a `MetadataCache` or a `FileStore`) as `name`.
+    """
+    _caches[name] = cache
+
+
+def record(stage: str, seconds: float) -> None:
+    """
+    Record that `stage` took `seconds`, in the histograms and in the timings
+    of the current request.
+    """
+    observe("inspector_stage_seconds", seconds, stage=stage)
+    if (timings := _timings.get()) is not None:
+        timings.append((stage, seconds))
+
+
+@contextlib.contextmanager
+def timed(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def start_request() -> list[tuple[str, float]]:
+    """
+    Start collecting the timings of a request.
+    """
+    timings: list[tuple[str, float]] = []
+    _timings.set(timings)
+    return timings
+
+
+def submit(executor: Executor, fn: Callable, *args: Any) -> Future:
+    """
+    Submit `fn` to `executor`, so that its stages count towards the timings
+    of the current request.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def server_timing(timings: list[tuple[str, float]]) -> str:
+    """
+    A Server-Timing header for `timings`, adding up repeated stages.
+    """
+    totals: dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0) + seconds
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()
+    )
+
+
+def _format(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+        name = f"{name}{{{pairs}}}"
+    # Every digit is kept, as counters of bytes soon outgrow `:g`.
+    if isinstance(value, int):
+        return f"{name} {value}"
+    return f"{name} {float(value)!r}"
+
+
+def render() -> str:
+    """
+    All metrics, in the Prometheus text format.
+    """
+    samples: dict[str, list[str]] = {name: [] for name in HELP}
+
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            samples[name].append(_format(name, labels, value))
+        for (name, labels), histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts):
+                cumulative += count
+                le = labels + (("le", str(bound)),)
+                samples[name].append(_format(f"{name}_bucket", le, cumulative))
+            samples[name].append(_format(f"{name}_sum", labels, histogram.sum))
+            samples[name].append(_format(f"{name}_count", labels, cumulative))
+
+    for cache_name, cache in sorted(_caches.items()):
+        labels = (("cache", cache_name),)
+        for name, value in [
+            ("inspector_cache_hits_total", cache.hits),
+            ("inspector_cache_misses_total", cache.misses),
+            ("inspector_cache_evictions_total", cache.evictions),
+            ("inspector_cache_bytes", cache.size),
+        ]:
+            samples[name].append(_format(name, labels, value))
+
+    lines = []
+    for name, (kind, description) in HELP.items():
+        if samples[name]:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
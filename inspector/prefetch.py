@@ -0,0 +1,176 @@
+"""
+This module contains an opt-in prefetcher, which downloads a release's
+distributions in the background when its page is viewed, as one of them is
+usually opened next.
+"""
+
+import os
+import threading
+import time
+import urllib.parse
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .distribution import (
+    DIST_CACHE_MAX_MAPPED_BYTES,
+    _distribution_class,
+    _get_dist,
+    dists,
+    downloads,
+)
+
+PREFETCH = bool(os.environ.get("INSPECTOR_PREFETCH"))
+PREFETCH_WORKERS = int(os.environ.get("INSPECTOR_PREFETCH_WORKERS", 2))
+
+# At most this many distributions of a release are prefetched, and only those
+# up to this size.
+PREFETCH_MAX_FILES = int(os.environ.get("INSPECTOR_PREFETCH_MAX_FILES", 2))
+PREFETCH_MAX_FILE_BYTES = int(
+    os.environ.get("INSPECTOR_PREFETCH_MAX_FILE_BYTES", 64 * 1024 * 1024)
+)
+
+# Budgets, per worker: how much is prefetched per minute, and how full the
+# distribution cache may get from prefetching, in mapped archive bytes (so that
+# it doesn't evict distributions that were actually opened).
+PREFETCH_BYTES_PER_MINUTE = int(
+    os.environ.get("INSPECTOR_PREFETCH_BYTES_PER_MINUTE", 256 * 1024 * 1024)
+)
+PREFETCH_MAX_CACHE_BYTES = int(
+    os.environ.get(
+        "INSPECTOR_PREFETCH_MAX_CACHE_BYTES", DIST_CACHE_MAX_MAPPED_BYTES // 2
+    )
+)
+
+# Prefetching stops, and what's queued is cancelled, while requests have this
+# many downloads in flight.
+PREFETCH_BUSY_DOWNLOADS = int(os.environ.get("INSPECTOR_PREFETCH_BUSY_DOWNLOADS", 2))
+
+
+def _candidates(files: list[dict]) -> list[dict]:
+    """
+    The distributions worth prefetching among a release's `files` (as listed
+    by PyPI's JSON API), best first: sdists, then pure wheels, then the rest.
+    """
+
+    def rank(file: dict) -> int:
+        if file["packagetype"] == "sdist":
+            return 0
+        if file["filename"].endswith("-none-any.whl"):
+            return 1
+        return 2
+
+    return sorted(
+        (
+            file
+            for file in files
+            if _distribution_class(file["filename"]) is not None
+            and file["size"] <= PREFETCH_MAX_FILE_BYTES
+        ),
+        key=rank,
+    )
+
+
+class Prefetcher:
+    """
+    Download distributions into the cache on a bounded pool of background
+    threads, within a budget of bytes per minute and of cache size. Nothing
+    is prefetched while requests are busy downloading.
+    """
+
+    def __init__(
+        self,
+        workers: int = PREFETCH_WORKERS,
+        bytes_per_minute: int = PREFETCH_BYTES_PER_MINUTE,
+        max_cache_bytes: int = PREFETCH_MAX_CACHE_BYTES,
+        busy_downloads: int = PREFETCH_BUSY_DOWNLOADS,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="prefetch"
+        )
+        self.bytes_per_minute = bytes_per_minute
+        self.max_cache_bytes = max_cache_bytes
+        self.busy_downloads = busy_downloads
+
+        self._lock = threading.Lock()
+        self._queued: dict[str, Future] = {}
+        self._running = 0
+        # When, and how much, was prefetched in the last minute
+        self._spent: deque[tuple[float, int]] = deque()
+
+    def busy(self) -> bool:
+        with self._lock:
+            running = self._running
+        return downloads.in_flight() - running >= self.busy_downloads
+
+    def cancel(self) -> None:
+        with self._lock:
+            queued = list(self._queued.values())
+        for future in queued:
+            future.cancel()
+
+    def schedule(self, files: list[dict]) -> list[str]:
+        """
+        Queue the best of a release's `files` (as listed by PyPI's JSON API)
+        for prefetching. Returns the names of those queued.
+        """
+        if self.busy():
+            self.cancel()
+            return []
+
+        queued = []
+        for file in _candidates(files)[:PREFETCH_MAX_FILES]:
+            distname = file["filename"]
+            with self._lock:
+                if distname in self._queued or distname in dists:
+                    continue
+                future = self._queued[distname] = self.executor.submit(
+                    self._prefetch, file
+                )
+            future.add_done_callback(lambda _, name=distname: self._dequeue(name))
+            queued.append(distname)
+        return queued
+
+    def _dequeue(self, distname: str) -> None:
+        with self._lock:
+            self._queued.pop(distname, None)
+
+    def _spend(self, size: int) -> bool:
+        """
+        Take `size` bytes from the budget for this minute, if they fit in it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._spent and self._spent[0][0] <= now - 60:
+                self._spent.popleft()
+            if sum(spent for _, spent in self._spent) + size > self.bytes_per_minute:
+                return False
+            self._spent.append((now, size))
+            return True
+
+    def _prefetch(self, file: dict) -> None:
+        self._dequeue(file["filename"])
+        if self.busy():
+            self.cancel()
+            return
+        if dists.mapped_size + file["size"] > self.max_cache_bytes:
+            return
+        if not self._spend(file["size"]):
+            return
+
+        # https://files.pythonhosted.org/packages/<first>/<second>/<rest>/<name>
+        path = urllib.parse.urlparse(file["url"]).path
+        first, second, rest, distname = path.split("/")[2:6]
+        with self._lock:
+            self._running += 1
+        try:
+            _get_dist(first, second, rest, distname)
+        except Exception:
+            # Left for the request that opens it, if any, to retry and report.
+            pass
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+prefetcher = Prefetcher()
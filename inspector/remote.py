@@ -0,0 +1,191 @@
+"""
+This module contains a file object for reading remote files with HTTP Range requests.
+"""
+
+import io
+import os
+import re
+
+from collections import OrderedDict
+
+import requests
+
+from .errors import InspectorError, UpstreamError
+
+_content_range_re = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class RangeNotSupported(InspectorError):
+    """
+    The server answered a Range request with the full resource.
+
+    The still-unread response is kept so the caller can fall back to
+    consuming it as a regular download.
+    """
+
+    def __init__(self, response: requests.Response):
+        super().__init__("Server does not support Range requests")
+        self.response = response
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    A read-only, seekable file object over a remote HTTP resource.
+
+    Only the byte ranges that are actually read are fetched, in blocks of
+    `block_size` bytes which are kept in a small LRU so that neighbouring
+    reads (e.g. a zip local header followed by its data) cost a single
+    request. Opening the file fetches the last `tail_size` bytes, which for
+    a zip archive usually covers the end of central directory record and
+    the central directory itself, and keeps them for as long as the file.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: requests.Session,
+        block_size: int = 256 * 1024,
+        tail_size: int = 64 * 1024,
+        max_cached_bytes: int = 16 * 1024 * 1024,
+    ):
+        self.url = url
+        self.session = session
+        self.block_size = block_size
+        self.max_cached_bytes = max_cached_bytes
+        self.requests = 0
+
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        # Kept up to date as blocks come and go, so it can be read from other
+        # threads (by the distribution cache) without walking `_blocks`.
+        self._cached_bytes = 0
+        self._pos = 0
+
+        resp = self._request(f"bytes=-{tail_size}")
+        self._tail_start, end, self.size = self._content_range(resp)
+        try:
+            self._tail = resp.content
+        except requests.RequestException as exc:
+            raise UpstreamError(f"Range request failed: {exc}") from exc
+        if len(self._tail) != end + 1 - self._tail_start:
+            raise UpstreamError("Short read from Range request")
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the tail and the block cache.
+        """
+        return len(self._tail) + self._cached_bytes
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._pos
+        end = self.size if size is None or size < 0 else min(self.size, start + size)
+        if end <= start:
+            return b""
+        data = self._read_range(start, end)
+        self._pos = end
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        if start >= self._tail_start:
+            offset = self._tail_start
+            return self._tail[start - offset : end - offset]  # noqa: E203
+
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        if (last - first + 1) * self.block_size > self.max_cached_bytes:
+            # Too big to be worth caching, e.g. a large member's data.
+            return self._fetch(start, end)
+
+        missing = [i for i in range(first, last + 1) if i not in self._blocks]
+        if missing:
+            # Fetch the whole run of missing blocks with a single request.
+            lo, hi = missing[0], missing[-1]
+            offset = lo * self.block_size
+            data = self._fetch(offset, min((hi + 1) * self.block_size, self.size))
+            for index in missing:
+                block_start = (index - lo) * self.block_size
+                block_end = block_start + self.block_size
+                self._add_block(index, data[block_start:block_end])
+
+        for index in range(first, last + 1):
+            self._blocks.move_to_end(index)
+        data = b"".join(self._blocks[i] for i in range(first, last + 1))
+
+        while self._cached_bytes > self.max_cached_bytes:
+            _, block = self._blocks.popitem(last=False)
+            self._cached_bytes -= len(block)
+
+        offset = first * self.block_size
+        start, end = start - offset, end - offset
+        return data[start:end]
+
+    def _add_block(self, index: int, block: bytes) -> None:
+        self._blocks[index] = block
+        self._cached_bytes += len(block)
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        try:
+            resp = self._request(f"bytes={start}-{end - 1}")
+            data = resp.content
+        except requests.RequestException as exc:
+            # A timeout, a dropped connection, or an error once retries ran out
+            raise UpstreamError(f"Range request failed: {exc}") from exc
+        except RangeNotSupported as exc:
+            # It did support them when the file was opened.
+            exc.response.close()
+            raise UpstreamError("Range request answered with the full file")
+        if len(data) != end - start:
+            raise UpstreamError("Short read from Range request")
+        return data
+
+    def _request(self, byte_range: str) -> requests.Response:
+        self.requests += 1
+        try:
+            resp = self.session.get(
+                self.url, headers={"Range": byte_range}, stream=True
+            )
+        except requests.RequestException as exc:
+            raise UpstreamError(f"Range request failed: {exc}") from exc
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            raise RangeNotSupported(resp)
+        return resp
+
+    @staticmethod
+    def _content_range(resp: requests.Response) -> tuple[int, int, int]:
+        match = _content_range_re.fullmatch(resp.headers.get("Content-Range", ""))
+        if not match:
+            resp.close()
+            raise UpstreamError("Range request answered without a Content-Range")
+        start, end, size = (int(group) for group in match.groups())
+        return start, end, size
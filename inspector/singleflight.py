@@ -0,0 +1,70 @@
+"""
+This module contains a helper for deduplicating concurrent calls.
+"""
+
+import threading
+
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single call.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for, and share, its result or
+    exception.
+
+    Usage:
+
+    >>> flight = SingleFlight()
+    >>> flight.do("key", lambda: "value", timeout=1)
+    'value'
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: float) -> Any:
+        """
+        Run `fn`, unless a call for `key` is already in flight, in which case
+        wait up to `timeout` seconds for it. Raises `TimeoutError` if the
+        in-flight call takes longer than that.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as exc:
+                call.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for {key!r}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -8,3 +8,20 @@ document.addEventListener("keydown", (e) => {
   input.focus();
   input.select();
 });
+
+// Pages of distributions are cached indefinitely, so whether the project and
+// release are still on PyPI is filled in from a separately cached fragment.
+document.addEventListener("DOMContentLoaded", () => {
+  const meta = document.querySelector('meta[name="inspector-breadcrumbs"]');
+  if (!meta) return;
+  fetch(meta.content)
+    .then((response) => (response.ok ? response.json() : null))
+    .then((labels) => {
+      if (!labels) return;
+      for (const [id, label] of [["h2-paren", labels.h2_paren], ["h3-paren", labels.h3_paren]]) {
+        const link = document.getElementById(id);
+        if (link) link.textContent = label;
+      }
+    })
+    .catch(() => {});
+});
@@ -0,0 +1,183 @@
+"""
+This module contains an on-disk store for downloaded files, shared between
+processes.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from typing import Iterable, Iterator
+
+# Number of hex digits of the key digest used to pick its lock file.
+LOCK_PREFIX_LENGTH = 3
+LOCK_POLL_INTERVAL = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_last_access ON objects (last_access);
+"""
+
+
+class FileStore:
+    """
+    A size-bounded store of immutable files, indexed with SQLite.
+
+    Files are stored under `root` by the SHA-256 of their key, so any number
+    of processes can share the same store: files are written to a temporary
+    file and atomically renamed into place, and the least recently accessed
+    files are deleted once the store grows beyond `max_bytes`.
+
+    Usage:
+
+    >>> store = FileStore("/var/cache/inspector", max_bytes=2**30)
+    >>> path = store.put("some/key", [b"chunk", b"chunk"])
+    >>> store.get("some/key") == path
+    True
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        os.makedirs(os.path.join(root, "locks"), exist_ok=True)
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, nor survive a
+        # fork, so keep one per thread and process.
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    @contextlib.contextmanager
+    def lock(self, key: str, timeout: float) -> Iterator[None]:
+        """
+        Hold an exclusive, cross-process lock for `key`, waiting up to
+        `timeout` seconds for it. Raises `TimeoutError` if it can't be taken.
+
+        Keys share a fixed number of lock files, so that they don't pile up.
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        path = os.path.join(self.root, "locks", digest[:LOCK_PREFIX_LENGTH])
+        deadline = time.monotonic() + timeout
+        with open(path, "ab") as f:
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timed out waiting for {key!r}")
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> str | None:
+        """
+        Return the path of the file stored under `key`, if any.
+
+        The file may still be evicted by another process before it is opened,
+        so callers should treat a `FileNotFoundError` as a miss.
+        """
+        with self._db() as db:
+            updated = db.execute(
+                "UPDATE objects SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            ).rowcount
+        path = self.path(key)
+        if updated and os.path.exists(path):
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> str:
+        """
+        Store the concatenation of `chunks` under `key`, returning its path.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.join(self.root, "tmp"), delete=False
+        ) as f:
+            try:
+                for chunk in chunks:
+                    f.write(chunk)
+                f.flush()
+                size = f.tell()
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        # Readers only ever see complete files.
+        os.replace(f.name, path)
+
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)",
+                (key, os.path.basename(path), size, time.time()),
+            )
+        self.evict(keep=key)
+        return path
+
+    @property
+    def size(self) -> int:
+        with self._db() as db:
+            (size,) = db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM objects"
+            ).fetchone()
+        return size
+
+    def evict(self, keep: str | None = None) -> None:
+        """
+        Delete the least recently accessed files (other than `keep`) until the
+        store fits within `max_bytes`.
+        """
+        excess = self.size - self.max_bytes
+        if excess <= 0:
+            return
+
+        with self._db() as db:
+            rows = db.execute(
+                "SELECT key, digest, size FROM objects ORDER BY last_access"
+            )
+            for key, digest, size in rows.fetchall():
+                if excess <= 0:
+                    break
+                if key == keep:
+                    continue
+                db.execute("DELETE FROM objects WHERE key = ?", (key,))
+                try:
+                    # Processes that have the file open or mapped keep it.
+                    os.unlink(os.path.join(self.root, digest[:2], digest))
+                except FileNotFoundError:
+                    pass
+                excess -= size
+                self.evictions += 1
@@ -0,0 +1,125 @@
+"""
+This module contains an index of the directories of an archive, for browsing
+archives too large to list in one page.
+"""
+
+import sys
+
+from array import array
+from bisect import bisect_right
+from typing import NamedTuple
+
+from .members import MemberTable
+
+
+class Entry(NamedTuple):
+    #: Name within its directory, ending with "/" for directories
+    name: str
+    #: Path within the archive
+    path: str
+    #: Number of files in it (one, for a file)
+    files: int
+    #: Total size of those files, uncompressed
+    size: int
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+
+class _Listing:
+    """
+    The children of a directory, sorted by name.
+    """
+
+    __slots__ = ("names", "files", "sizes", "total_files", "total_size")
+
+    def __init__(self, children: dict[str, list[int]]):
+        self.names = tuple(sorted(children))
+        self.files = array("Q", (children[name][0] for name in self.names))
+        self.sizes = array("Q", (children[name][1] for name in self.names))
+        self.total_files = sum(self.files)
+        self.total_size = sum(self.sizes)
+
+
+class DirectoryIndex:
+    """
+    The immediate children of every directory of an archive, with the number
+    and total size of the files under each.
+
+    It's built once, in a single pass over the member table. After that,
+    listing a page of a directory only costs as much as the page itself:
+    entries are sorted by name, and pages are found by bisecting for the
+    name of the last entry of the previous page.
+
+    Directories are those implied by the paths of files: directory members
+    of the archive (and so empty directories) are ignored.
+    """
+
+    def __init__(self, members: MemberTable):
+        tree: dict[str, dict[str, list[int]]] = {"": {}}
+        for name in dict.fromkeys(members.files()):
+            size = members.size(name)
+            *dirnames, basename = name.split("/")
+            prefix = ""
+            for dirname in dirnames:
+                stats = tree[prefix].setdefault(dirname + "/", [0, 0])
+                stats[0] += 1
+                stats[1] += size
+                prefix += dirname + "/"
+                tree.setdefault(prefix, {})
+            tree[prefix][basename] = [1, size]
+
+        self._listings = {path: _Listing(children) for path, children in tree.items()}
+
+        self._nbytes = sys.getsizeof(self._listings) + sum(
+            sys.getsizeof(path)
+            + sys.getsizeof(listing.names)
+            + sum(sys.getsizeof(name) for name in listing.names)
+            + sys.getsizeof(listing.files)
+            + sys.getsizeof(listing.sizes)
+            for path, listing in self._listings.items()
+        )
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._listings
+
+    def stats(self, path: str) -> Entry:
+        """
+        The directory `path` (e.g. "" or "foo/bar/") itself.
+        """
+        listing = self._listings[path]
+        name = path.rstrip("/").rpartition("/")[2] + "/" if path else ""
+        return Entry(name, path, listing.total_files, listing.total_size)
+
+    def page(
+        self, path: str, after: str | None = None, limit: int = 500
+    ) -> tuple[list[Entry], str | None]:
+        """
+        Up to `limit` children of the directory `path` (e.g. "" or
+        "foo/bar/"), starting after the one named `after`. Returns them, and
+        the name to start the next page after, if there are more. Raises
+        `KeyError` if there's no such directory.
+        """
+        listing = self._listings[path]
+        start = 0 if after is None else bisect_right(listing.names, after)
+        end = min(start + limit, len(listing.names))
+
+        entries = [
+            Entry(
+                listing.names[i],
+                path + listing.names[i],
+                listing.files[i],
+                listing.sizes[i],
+            )
+            for i in range(start, end)
+        ]
+        cursor = entries[-1].name if entries and end < len(listing.names) else None
+        return entries, cursor
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the index.
+        """
+        return self._nbytes
@@ -1,7 +1,22 @@
+import os
+import threading
 import urllib.parse
 
 import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Tunables for the upstream HTTP client shared by each worker.
+HTTP_POOL_SIZE = int(os.environ.get("INSPECTOR_HTTP_POOL_SIZE", 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("INSPECTOR_HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get("INSPECTOR_HTTP_READ_TIMEOUT", 5))
+HTTP_RETRIES = int(os.environ.get("INSPECTOR_HTTP_RETRIES", 2))
+HTTP_RETRY_BACKOFF = float(os.environ.get("INSPECTOR_HTTP_RETRY_BACKOFF", 0.1))
+
+_sessions: dict[tuple[int, str], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
 
 def mailto_report_link(project_name, version, file_path, request_url):
     """
@@ -43,20 +58,64 @@ def pypi_report_form(project_name, version, file_path, request_url):
     )
 
 
-def requests_session(custom_user_agent: str = "inspector.pypi.io") -> requests.Session:
+class TimeoutSession(requests.Session):
+    """
+    A `requests.Session` that applies a default timeout to every request.
     """
-    Custom `requests` session with default headers applied.
 
-    Usage:
+    def __init__(self, timeout: tuple[float, float]):
+        super().__init__()
+        self.timeout = timeout
 
-    >>> from inspector.utilities import requests_session
-    >>> response = requests_session().get(<url>)
-    """
-    session = requests.Session()
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _new_session(user_agent: str) -> requests.Session:
+    session = TimeoutSession(timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
     session.headers.update(
         {
-            "User-Agent": custom_user_agent,
+            "User-Agent": user_agent,
         }
     )
 
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        # Only retry requests that are safe to repeat.
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def requests_session(custom_user_agent: str = "inspector.pypi.io") -> requests.Session:
+    """
+    Shared `requests` session with default headers, timeouts and retries
+    applied.
+
+    The session is created once per process (and user agent), so that its
+    connection pool keeps connections to upstream hosts alive across
+    requests. It is safe to use from multiple threads, but must not be
+    modified.
+
+    Usage:
+
+    >>> from inspector.utilities import requests_session
+    >>> response = requests_session().get(<url>)
+    """
+    # Connection pools can't be shared with a forked child.
+    key = (os.getpid(), custom_user_agent)
+    with _sessions_lock:
+        if (session := _sessions.get(key)) is None:
+            session = _sessions[key] = _new_session(custom_user_agent)
     return session
@@ -0,0 +1,41 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from inspector.distribution import ZipDistribution
+
+
+@pytest.fixture
+def wheel():
+    def wheel(files, compression=zipfile.ZIP_STORED):
+        f = io.BytesIO()
+        with zipfile.ZipFile(f, "w", compression=compression) as zf:
+            for name, data in files.items():
+                zf.writestr(name, data)
+        return f.getvalue()
+
+    return wheel
+
+
+@pytest.fixture
+def sdist():
+    def sdist(files):
+        f = io.BytesIO()
+        with tarfile.open(fileobj=f, mode="w:gz") as tf:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+        return f.getvalue()
+
+    return sdist
+
+
+@pytest.fixture
+def zip_dist(wheel):
+    def zip_dist(files):
+        return ZipDistribution(io.BytesIO(wheel(files)))
+
+    return zip_dist
@@ -0,0 +1,118 @@
+import collections
+
+from math import log2
+from random import Random
+
+import pretend
+import pytest
+
+from inspector.analysis import pipeline
+from inspector.analysis.checks import basic_details
+from inspector.analysis.entropy import ByteHistogram, EntropyProfile, shannon_entropy
+
+
+def test_analyze_reads_each_member_once(monkeypatch, zip_dist):
+    dist = zip_dist({"foo/bar.pyc": bytes(range(256)) * 10})
+    iter_contents = pretend.call_recorder(dist.iter_contents)
+    monkeypatch.setattr(dist, "iter_contents", iter_contents)
+
+    analysis = pipeline.analyze(dist, "foo/bar.pyc")
+
+    assert len(iter_contents.calls) == 1
+    assert analysis.contents == bytes(range(256)) * 10
+    assert analysis.results["entropy"] == 8.0
+    assert [(d.prop_name, d.value) for d in analysis.details] == [
+        ("SHA-256", analysis.results["sha256"]),
+        ("Entropy", "8.0 (HIGH)"),
+        ("Compiled Python Bytecode", None),
+    ]
+
+
+def test_analyzers_see_every_chunk(monkeypatch, zip_dist):
+    monkeypatch.setattr("inspector.distribution.CONTENTS_CHUNK_SIZE", 7)
+    data = b"print('hello world')\n" * 10
+    dist = zip_dist({"foo.py": data})
+
+    analysis = pipeline.analyze(dist, "foo.py")
+
+    assert analysis.contents == data
+    assert analysis.results["entropy"] == shannon_entropy(data)
+    assert list(basic_details(dist, "foo.py")) == analysis.details
+
+
+def test_incremental_histogram_matches_whole():
+    data = b"some text with a few \x00\xff bytes" * 3
+    histogram = ByteHistogram()
+    for i in range(0, len(data), 5):
+        histogram.update(data[i : i + 5])  # noqa: E203
+
+    assert histogram.entropy() == shannon_entropy(data)
+
+
+def test_histogram_matches_counter():
+    random = Random(0)
+    for size in (0, 1, 100, 10000):
+        data = bytes(random.randrange(random.randint(1, 256)) for _ in range(size))
+
+        expected = 0.0
+        for count in collections.Counter(data).values():
+            pr = count / size
+            expected -= pr * log2(pr)
+
+        assert shannon_entropy(data) == expected
+
+
+def test_entropy_profile_matches_each_window():
+    random = Random(0)
+    data = bytes(random.randrange(random.randint(1, 256)) for _ in range(3000))
+    profile = EntropyProfile(window=200, stride=50)
+    for i in range(0, len(data), 333):
+        profile.update(data[i : i + 333])  # noqa: E203
+
+    # The last window ends with the last, shorter block.
+    assert profile.entropies().tolist() == pytest.approx(
+        [shannon_entropy(data[i : i + 200]) for i in range(0, 2850, 50)]  # noqa: E203
+    )
+
+
+def test_entropy_profile_locates_payload():
+    text = b"print('hello world')\n" * 1000
+    payload = Random(0).randbytes(4096)
+    profile = EntropyProfile(window=1024, stride=256)
+    profile.update(text + payload + text)
+
+    [region] = profile.regions(6.0)
+
+    assert region.start <= len(text) < len(text) + len(payload) <= region.end
+    assert region.end - region.start < 2 * len(payload)
+    assert region.first_line <= 1001 <= region.last_line
+    assert region.peak > 7.5
+
+
+def test_entropy_profile_of_short_contents():
+    profile = EntropyProfile(window=1024, stride=256)
+    profile.update(bytes(range(256)))
+
+    assert len(profile.entropies()) == 0
+    assert profile.regions(6.0) == []
+
+
+def test_analyze_reports_entropy_regions(monkeypatch, zip_dist):
+    monkeypatch.setattr(
+        pipeline, "EntropyProfile", lambda: EntropyProfile(window=1024, stride=256)
+    )
+    text = b"print('hello world')\n" * 1000
+    dist = zip_dist({"foo.py": text + Random(0).randbytes(4096) + text})
+
+    analysis = pipeline.analyze(dist, "foo.py")
+
+    [region] = analysis.results["entropy_regions"]
+    assert [d.prop_name for d in analysis.details] == [
+        "SHA-256",
+        "Entropy",
+        "High-Entropy Region",
+    ]
+    assert analysis.details[2].value == (
+        f"bytes {region.start}-{region.end}, "
+        f"lines {region.first_line}-{region.last_line} (peak {region.peak:.2f})"
+    )
@@ -0,0 +1,187 @@
+import gzip
+
+import pytest
+
+import inspector.assets
+import inspector.main
+
+BUNDLE = """\
+/* PrismJS */
+var Prism = (function () {
+    /**
+     * Prism.languages['css-with-colors'] = Prism.languages.extend('css', {});
+     */
+    return {};
+}());
+
+Prism.languages.markup = {
+    'tag': {}
+};
+
+Prism.languages.html = Prism.languages.markup;
+
+// Another component
+Prism.languages.clike = {
+    'comment': /#/
+};
+
+(function (Prism) {
+    Prism.languages.javascript = Prism.languages.extend('clike', {});
+
+    if (Prism.languages.markup) {
+        Prism.languages.markup.tag.addInlined('script', 'javascript');
+    }
+}(Prism));
+
+Prism.languages.js = Prism.languages.javascript;
+
+Prism.languages.python = {
+    'comment': /#/
+};
+
+Prism.languages.py = Prism.languages.python;
+
+(function (Prism) {
+    Prism.languages.insertBefore('javascript', 'keyword', {});
+}(Prism));
+
+(function () {
+    Prism.plugins.lineNumbers = {};
+}());
+"""
+
+
+def test_split_prism():
+    core, chunks = inspector.assets.split_prism(BUNDLE)
+
+    assert core.startswith("/* PrismJS */")
+    assert "Prism.plugins.lineNumbers" in core
+    assert [
+        (chunk.name, set(chunk.languages), set(chunk.requires), set(chunk.modifies))
+        for chunk in chunks
+    ] == [
+        ("markup", {"markup", "html"}, set(), set()),
+        ("clike", {"clike"}, set(), set()),
+        ("javascript", {"javascript", "js"}, {"clike"}, {"markup"}),
+        ("python", {"python", "py"}, set(), set()),
+        ("javascript-extras", set(), {"javascript"}, {"javascript"}),
+    ]
+    assert chunks[0].source.endswith(
+        "Prism.languages.html = Prism.languages.markup;\n\n"
+    )
+    assert chunks[1].source.startswith("// Another component\n")
+
+
+def test_split_prism_is_lossless():
+    core, chunks = inspector.assets.split_prism(BUNDLE)
+    plugins = core.index("(function () {\n    Prism.plugins")
+
+    assert (
+        core[:plugins] + "".join(chunk.source for chunk in chunks) + core[plugins:]
+        == BUNDLE
+    )
+
+
+def test_resolve():
+    _, chunks = inspector.assets.split_prism(BUNDLE)
+    resolved = inspector.assets.resolve(chunks)
+
+    assert resolved["py"] == ["python"]
+    assert resolved["js"] == ["clike", "javascript", "javascript-extras"]
+    # Modifiers load with what they modify, in the order of the bundle.
+    assert resolved["html"] == [
+        "markup",
+        "clike",
+        "javascript",
+        "javascript-extras",
+    ]
+    assert "javascript-extras" not in resolved
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "prism.js").write_text(BUNDLE)
+    (static / "style.css").write_text("body { color: red }")
+    build = tmp_path / "build"
+
+    manifest = inspector.assets.build(str(static), str(build))
+    monkeypatch.setattr(inspector.assets, "BUILD_DIR", str(build))
+    monkeypatch.setattr(inspector.assets, "manifest", manifest)
+    return build, manifest
+
+
+def test_build(built):
+    build, manifest = built
+
+    style = manifest["files"]["style.css"]
+    assert style.startswith("style.") and style.endswith(".css")
+    assert (build / style).read_text() == "body { color: red }"
+    assert gzip.decompress((build / (style + ".gz")).read_bytes()) == (
+        b"body { color: red }"
+    )
+    assert "prism.js" not in manifest["files"]
+    assert manifest["prism"]["py"] == ["prism/python.js"]
+    assert inspector.assets.load_manifest(str(build)) == manifest
+
+
+def test_build_is_reproducible(built, tmp_path):
+    build, manifest = built
+
+    assert inspector.assets.build(str(tmp_path / "static"), str(build)) == manifest
+
+
+def test_urls(built):
+    _, manifest = built
+
+    assert inspector.assets.asset_url("style.css") == (
+        "/assets/" + manifest["files"]["style.css"]
+    )
+    assert inspector.assets.prism_urls("py") == [
+        "/assets/" + manifest["files"]["prism/core.js"],
+        "/assets/" + manifest["files"]["prism/python.js"],
+    ]
+    assert inspector.assets.prism_urls("txt") == [
+        "/assets/" + manifest["files"]["prism/core.js"]
+    ]
+
+
+def test_urls_without_build(monkeypatch):
+    monkeypatch.setattr(inspector.assets, "manifest", None)
+
+    assert inspector.assets.asset_url("style.css") == "/static/style.css"
+    assert inspector.assets.prism_urls("py") == ["/static/prism.js"]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,content_encoding",
+    [("gzip, br", "br"), ("gzip", "gzip"), ("", None)],
+)
+def test_asset(built, accept_encoding, content_encoding):
+    _, manifest = built
+    if inspector.assets.brotli is None and content_encoding == "br":
+        content_encoding = "gzip"
+
+    response = inspector.main.app.test_client().get(
+        "/assets/" + manifest["files"]["style.css"],
+        headers={"Accept-Encoding": accept_encoding},
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/css"
+    assert response.headers.get("Content-Encoding") == content_encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+
+
+def test_asset_from_another_build(built):
+    _, manifest = built
+    client = inspector.main.app.test_client()
+
+    stale = client.get("/assets/style.0123456789abcdef.css")
+    missing = client.get("/assets/nope.0123456789abcdef.css")
+
+    assert stale.status_code == 302
+    assert stale.location == "/assets/" + manifest["files"]["style.css"]
+    assert missing.status_code == 404
@@ -0,0 +1,69 @@
+import pretend
+
+from inspector.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=10)
+    cache["a"] = b"aaaa"
+    cache["b"] = b"bbbb"
+    assert cache.get("a") == b"aaaa"
+
+    cache["c"] = b"cccc"
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.size == 8
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": 8,
+        "max_bytes": 10,
+        "mapped_bytes": 0,
+        "hits": 1,
+        "misses": 0,
+        "evictions": 1,
+    }
+
+
+def test_lru_cache_skips_oversized_values():
+    cache = LRUCache(max_bytes=4)
+    cache["a"] = b"aaa"
+    cache["b"] = b"bbbbb"
+
+    assert "a" in cache
+    assert cache.get("b") is None
+    assert cache.misses == 1
+
+
+def test_lru_cache_reweighs_on_read():
+    value = pretend.stub(nbytes=2)
+    cache = LRUCache(max_bytes=10, sizeof=lambda v: v.nbytes)
+    cache["a"] = pretend.stub(nbytes=2)
+    cache["b"] = value
+
+    value.nbytes = 9
+    assert cache.get("b") is value
+
+    assert "a" not in cache
+    assert cache.size == 9
+
+
+def test_lru_cache_bounds_mapped_bytes_separately():
+    cache = LRUCache(
+        max_bytes=10,
+        sizeof=lambda v: v.nbytes,
+        max_mapped_bytes=100,
+        mapped_sizeof=lambda v: v.mapped_bytes,
+    )
+    cache["a"] = pretend.stub(nbytes=1, mapped_bytes=60)
+    cache["b"] = pretend.stub(nbytes=1, mapped_bytes=200)
+    assert "a" in cache
+    assert "b" not in cache
+
+    cache["c"] = pretend.stub(nbytes=1, mapped_bytes=60)
+
+    assert "a" not in cache
+    assert "c" in cache
+    assert cache.size == 1
+    assert cache.mapped_size == 60
@@ -0,0 +1,192 @@
+import random
+
+import pytest
+
+from inspector import charset
+
+# The heuristics as they were first written, one decode and several passes over
+# the decoded text per encoding, which the engine must agree with.
+
+
+def _reference_is_likely_text(decoded_str):
+    """Check if decoded string looks like valid text (not corrupted)."""
+    if not decoded_str:
+        return True
+
+    # Too many control characters suggests wrong encoding
+    control_chars = sum(1 for c in decoded_str if ord(c) < 32 and c not in "\t\n\r")
+    return control_chars / len(decoded_str) <= 0.3
+
+
+def _reference_misencoded_asian(decoded_str, encoding):
+    """
+    Detect when Western encodings decode Asian text as Latin Extended garbage.
+
+    When cp1252/latin-1 decode multi-byte Asian text, they produce strings
+    with many Latin Extended/Supplement characters and few/no spaces.
+    """
+    if encoding not in ("cp1252", "latin-1") or len(decoded_str) <= 3:
+        return False
+
+    # Count Latin Extended-A/B (Ā-ʯ) and Latin-1 Supplement (À-ÿ)
+    high_latin = sum(1 for c in decoded_str if 0x0080 <= ord(c) <= 0x024F)
+    spaces = decoded_str.count(" ")
+
+    # If >50% high Latin chars and <10% spaces, likely misencoded
+    return high_latin / len(decoded_str) > 0.5 and spaces < len(decoded_str) * 0.1
+
+
+def _reference_misencoded_cross_asian(decoded_str, encoding):
+    """
+    Detect when Asian encodings misinterpret other Asian encodings.
+
+    Patterns:
+    - shift_jis decoding GB2312 produces excessive half-width katakana
+    - Asian encodings decoding Western text produce ASCII+CJK mix (unlikely)
+    """
+    if len(decoded_str) <= 3:
+        return False
+
+    # Pattern 1: Excessive half-width katakana (shift_jis misinterpreting GB2312)
+    # Half-width katakana range: U+FF61-FF9F
+    if encoding == "shift_jis":
+        half_width_katakana = sum(1 for c in decoded_str if 0xFF61 <= ord(c) <= 0xFF9F)
+        # If >30% is half-width katakana, likely wrong encoding
+        # (Real Japanese text uses mostly full-width kana and kanji)
+        if half_width_katakana / len(decoded_str) > 0.3:
+            return True
+
+    # Pattern 2: ASCII mixed with CJK (Asian encoding misinterpreting Western)
+    # CJK Unified Ideographs: U+4E00-U+9FFF
+    if encoding in ("big5", "gbk", "gb2312", "shift_jis", "euc-kr"):
+        ascii_chars = sum(1 for c in decoded_str if ord(c) < 128)
+        cjk_chars = sum(1 for c in decoded_str if 0x4E00 <= ord(c) <= 0x9FFF)
+
+        # If we have ASCII letters and scattered CJK chars, likely misencoded
+        # Real CJK text is mostly CJK with occasional ASCII punctuation
+        if ascii_chars > 0 and cjk_chars > 0:
+            # Check if there are ASCII letters (not just punctuation)
+            ascii_letters = sum(1 for c in decoded_str if c.isalpha() and ord(c) < 128)
+            # If we have ASCII letters AND CJK, and CJK is <50%, likely wrong
+            if ascii_letters >= 2 and cjk_chars / len(decoded_str) < 0.5:
+                return True
+
+    return False
+
+
+def reference_decode(content_bytes):
+    """
+    Decode bytes to string, trying multiple encodings.
+
+    Strategy:
+    1. Try UTF-8 (most common)
+    2. Try common encodings with sanity checks
+    3. Fall back to latin-1 (decodes anything, but may produce garbage)
+
+    Returns decoded string or None if all attempts fail (only if truly binary).
+    """
+    # Try UTF-8 first (most common)
+    try:
+        decoded = content_bytes.decode("utf-8")
+        # Apply same heuristics as other encodings
+        if _reference_is_likely_text(decoded):
+            return decoded
+    except (UnicodeDecodeError, AttributeError):
+        pass
+
+    # Try encodings from most to least restrictive. Even with improved heuristics,
+    # putting GBK/GB2312 early breaks too many other encodings. The order below
+    # maximizes correct detections while minimizing misdetections.
+    common_encodings = [
+        "shift_jis",  # Japanese (restrictive multi-byte)
+        "euc-kr",  # Korean (restrictive multi-byte)
+        "big5",  # Chinese Traditional (restrictive multi-byte)
+        "gbk",  # Chinese Simplified
+        "gb2312",  # Chinese Simplified, older
+        "cp1251",  # Cyrillic
+        "iso-8859-2",  # Central/Eastern European
+        "cp1252",  # Windows Western European (very permissive)
+        "latin-1",  # ISO-8859-1 fallback (never fails)
+    ]
+
+    for encoding in common_encodings:
+        try:
+            decoded = content_bytes.decode(encoding)
+
+            # Skip if decoded text looks corrupted
+            if not _reference_is_likely_text(decoded):
+                continue
+
+            # Skip if Western encoding produced Asian-text-as-garbage pattern
+            if _reference_misencoded_asian(decoded, encoding):
+                continue
+
+            # Skip if Asian encoding misinterpreted other Asian/Western text
+            if _reference_misencoded_cross_asian(decoded, encoding):
+                continue
+
+            return decoded
+
+        except (UnicodeDecodeError, LookupError):
+            continue
+
+    # If we get here, all encodings failed sanity checks (truly binary data)
+    return None
+
+
+TEXTS = [
+    "",
+    "Hello, World!",
+    "Windows™ text",
+    "こんにちは世界",
+    "안녕하세요",
+    "繁體中文",
+    "Привет мир",
+    "你好世界",
+    "中文测试",
+    "Héllo Wörld",
+    "Cześć świat",
+    "ｱｲｳｴｵ ｶｷｸｹｺ",
+    "def main():\n    print('日本語のテキスト')\n",
+    "# -*- coding: latin-1 -*-\nname = 'Ångström'\n",
+]
+ENCODINGS = ["utf-8", *charset.COMMON_ENCODINGS, "iso-8859-1"]
+
+
+def _corpus():
+    rng = random.Random(0)
+    for text in TEXTS:
+        for encoding in ENCODINGS:
+            try:
+                encoded = text.encode(encoding)
+            except UnicodeEncodeError:
+                continue
+            yield encoded
+            yield encoded * 50
+            yield encoded + b"\x00\x01\x02"
+    for _ in range(200):
+        yield rng.randbytes(rng.randint(1, 64))
+    for _ in range(50):
+        yield bytes(
+            rng.choice(b"abc \n\x00\x01\xa4\xa2\xe3\x81\x82") for _ in range(40)
+        )
+
+
+@pytest.mark.parametrize("content", list(_corpus()))
+def test_decode_matches_reference(content):
+    assert charset.decode_with_fallback(content) == reference_decode(content)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "日本語のテキスト\n".encode("shift_jis") * 100 + b"\x80",
+        b"\x80" + "日本語のテキスト\n".encode("shift_jis") * 100,
+        "한국어 텍스트\n".encode("euc-kr") * 100,
+        "Привет мир\n".encode("cp1251") * 100,
+    ],
+)
+def test_decode_with_sample_matches_reference(monkeypatch, content):
+    monkeypatch.setattr(charset, "SAMPLE_SIZE", 64)
+
+    assert charset.decode_with_fallback(content) == reference_decode(content)
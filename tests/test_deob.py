@@ -0,0 +1,230 @@
+import importlib.util
+import marshal
+import time
+
+import pretend
+import pytest
+
+from inspector import deob, metrics
+from inspector.cache import LRUCache
+from inspector.store import FileStore
+
+
+def test_output_is_cached_by_digest(monkeypatch):
+    run = pretend.call_recorder(
+        lambda tool, code, deadline=None: (f"{tool} output", True)
+    )
+    monkeypatch.setattr(deob, "_run", run)
+    monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+    monkeypatch.setattr(deob, "store", None)
+
+    assert deob.decompile(b"code") == deob.DECOMPILE_HEADER + "pycdc output"
+    assert deob.decompile(b"code") == deob.DECOMPILE_HEADER + "pycdc output"
+    assert (
+        deob.disassemble(b"code")
+        == deob.DISASM_HEADER.format(tool="pycdas") + "\n\npycdas output"
+    )
+    assert deob.decompile(b"other code") == deob.DECOMPILE_HEADER + "pycdc output"
+
+    assert [call.args[:2] for call in run.calls] == [
+        ("pycdc", b"code"),
+        ("pycdas", b"code"),
+        ("pycdc", b"other code"),
+    ]
+
+
+def test_output_is_shared_on_disk(monkeypatch, tmp_path):
+    run = pretend.call_recorder(lambda tool, code, deadline=None: ("décompiled", True))
+    monkeypatch.setattr(deob, "_run", run)
+    monkeypatch.setattr(deob, "store", FileStore(str(tmp_path), 1024))
+
+    for _ in range(2):
+        # Each worker starts with an empty in-memory cache.
+        monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+        assert deob.decompile(b"code", "digest").endswith("décompiled")
+
+    assert [call.args[:2] for call in run.calls] == [("pycdc", b"code")]
+
+
+@pytest.fixture
+def tool(tmp_path, monkeypatch):
+    monkeypatch.setattr(deob, "DEOB_SLOT_DIR", str(tmp_path / "slots"))
+
+    def tool(script):
+        path = tmp_path / "tool"
+        path.write_text(f"#!/bin/sh\n{script}\n")
+        path.chmod(0o755)
+        return str(path)
+
+    return tool
+
+
+def test_run_reads_bytecode(tool):
+    assert deob._run(tool('cat "$1"'), b"bytecode") == ("bytecode", True)
+
+
+def test_run_caps_output(tool, monkeypatch):
+    monkeypatch.setattr(deob, "DEOB_MAX_OUTPUT_BYTES", 10)
+
+    output, cacheable = deob._run(tool("yes"), b"")
+
+    assert output == "y\ny\ny\ny\ny\n" + deob.TRUNCATED_MARKER.format(
+        reason="size limit reached"
+    )
+    assert cacheable
+
+
+def test_run_times_out(tool, monkeypatch):
+    monkeypatch.setattr(deob, "DEOB_TIMEOUT", 0.2)
+
+    start = time.monotonic()
+    output, cacheable = deob._run(tool("echo partial; exec sleep 10"), b"")
+
+    assert time.monotonic() - start < 5
+    assert output == "partial\n" + deob.TRUNCATED_MARKER.format(
+        reason="time limit reached"
+    )
+    assert not cacheable
+
+
+def test_run_waits_for_a_slot(tool, monkeypatch):
+    monkeypatch.setattr(deob, "DEOB_MAX_PROCESSES", 1)
+    monkeypatch.setattr(deob, "DEOB_TIMEOUT", 0.2)
+
+    with deob._slot(time.monotonic()):
+        output, cacheable = deob._run(tool("echo ran"), b"")
+    assert output == deob.TRUNCATED_MARKER.format(
+        reason="too many files being decompiled"
+    )
+    assert not cacheable
+
+    assert deob._run(tool("echo ran"), b"") == ("ran\n", True)
+
+
+def test_disassemble_and_decompile(monkeypatch):
+    monkeypatch.setattr(
+        deob, "_run", lambda tool, code, deadline=None: (f"{tool} output", True)
+    )
+    monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+    monkeypatch.setattr(deob, "store", None)
+
+    assert deob.disassemble_and_decompile(b"code") == (
+        deob.DISASM_HEADER.format(tool="pycdas") + "\n\npycdas output",
+        deob.DECOMPILE_HEADER + "pycdc output",
+    )
+
+
+def _pyc(source, magic=importlib.util.MAGIC_NUMBER):
+    code = compile(source, "<test>", "exec")
+    return magic + bytes(12) + marshal.dumps(code)
+
+
+def test_disassemble_in_process(monkeypatch):
+    run = pretend.call_recorder(
+        lambda tool, code, deadline=None: ("pycdas output", True)
+    )
+    monkeypatch.setattr(deob, "_run", run)
+    timings = metrics.start_request()
+
+    disassembly = deob.disassemble(
+        _pyc("def outer():\n    def inner():\n        pass\n")
+    )
+
+    assert disassembly.startswith(deob.DISASM_HEADER.format(tool="dis") + "\n\n")
+    assert "Disassembly of <code object outer" in disassembly
+    assert "Disassembly of <code object inner" in disassembly
+    assert run.calls == []
+    assert [stage for stage, _ in timings] == ["dis"]
+
+
+def test_disassemble_other_python_is_not_timed_as_dis(monkeypatch):
+    monkeypatch.setattr(
+        deob, "_run", lambda tool, code, deadline=None: (f"{tool} output", True)
+    )
+    monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+    monkeypatch.setattr(deob, "store", None)
+    timings = metrics.start_request()
+
+    deob.disassemble(_pyc("pass", magic=b"\x00\x00\r\n"))
+
+    assert "dis" not in [stage for stage, _ in timings]
+
+
+@pytest.mark.parametrize(
+    "pyc",
+    [
+        _pyc("pass", magic=b"\x00\x00\r\n"),
+        importlib.util.MAGIC_NUMBER + bytes(12) + b"garbage",
+        importlib.util.MAGIC_NUMBER + bytes(12) + marshal.dumps(42),
+    ],
+)
+def test_disassemble_falls_back_to_pycdas(monkeypatch, pyc):
+    monkeypatch.setattr(
+        deob, "_run", lambda tool, code, deadline=None: (f"{tool} output", True)
+    )
+    monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+    monkeypatch.setattr(deob, "store", None)
+
+    assert (
+        deob.disassemble(pyc)
+        == deob.DISASM_HEADER.format(tool="pycdas") + "\n\npycdas output"
+    )
+
+
+def test_disassemble_large_bytecode_in_a_subprocess(monkeypatch):
+    run = pretend.call_recorder(
+        lambda tool, code, deadline=None: ("pycdas output", True)
+    )
+    monkeypatch.setattr(deob, "_run", run)
+    monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+    monkeypatch.setattr(deob, "store", None)
+    pyc = _pyc("x = 1\n" * 100)
+    monkeypatch.setattr(deob, "DEOB_IN_PROCESS_MAX_BYTES", len(pyc) - 1)
+
+    assert deob.disassemble(pyc).endswith("pycdas output")
+    assert [call.args[:2] for call in run.calls] == [("pycdas", pyc)]
+
+
+@pytest.mark.parametrize(
+    "setting,value,reason",
+    [
+        ("DEOB_MAX_OUTPUT_BYTES", 100, "size limit reached"),
+        ("DEOB_TIMEOUT", 0, "time limit reached"),
+    ],
+)
+def test_disassemble_in_process_stops_early(monkeypatch, setting, value, reason):
+    monkeypatch.setattr(deob, setting, value)
+
+    disassembly = deob._disassemble_in_process(_pyc("x = 1\n" * 1000))
+
+    assert disassembly.endswith(deob.TRUNCATED_MARKER.format(reason=reason))
+    assert len(disassembly) <= 100 + len(deob.TRUNCATED_MARKER.format(reason=reason))
+
+
+def test_is_complete():
+    truncated = "output" + deob.TRUNCATED_MARKER.format(reason="{}")
+
+    assert deob.is_complete("output")
+    assert deob.is_complete(truncated.format("size limit reached"))
+    assert not deob.is_complete(truncated.format("time limit reached"))
+    assert not deob.is_complete(truncated.format("too many files being decompiled"))
+
+
+def test_disassemble_and_decompile_by_deadline(tool, monkeypatch):
+    monkeypatch.setattr(deob, "outputs", LRUCache(1024))
+    monkeypatch.setattr(deob, "store", None)
+    monkeypatch.setattr(deob, "_disassemble_in_process", lambda code, deadline: None)
+    sleep, run = tool("exec sleep 5"), deob._run
+    monkeypatch.setattr(
+        deob, "_run", lambda name, code, deadline: run(sleep, code, deadline)
+    )
+
+    start = time.monotonic()
+    disassembly, decompilation = deob.disassemble_and_decompile(
+        b"code", deadline=start + 0.2
+    )
+
+    assert time.monotonic() - start < 2
+    truncated = deob.TRUNCATED_MARKER.format(reason="time limit reached")
+    assert disassembly.endswith(truncated)
+    assert decompilation.endswith(truncated)
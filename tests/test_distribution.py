@@ -0,0 +1,201 @@
+import io
+import struct
+import tarfile
+import zipfile
+import zlib
+
+import pretend
+import pytest
+
+import inspector.distribution
+
+
+def _chunks(body, chunk_size):
+    f = io.BytesIO(body)
+    while chunk := f.read(chunk_size):
+        yield chunk
+
+
+def _response(body):
+    return pretend.stub(
+        raise_for_status=lambda: None,
+        iter_content=lambda chunk_size: _chunks(body, chunk_size),
+        __enter__=lambda: None,
+        __exit__=lambda *a: None,
+    )
+
+
+def test_get_dist_caches_distributions(monkeypatch, wheel):
+    body = wheel({"foo/__init__.py": b"print('hi')"})
+    get = pretend.call_recorder(lambda url, stream: _response(body))
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 0)
+    monkeypatch.setattr(
+        inspector.distribution, "requests_session", lambda: pretend.stub(get=get)
+    )
+    monkeypatch.setattr(
+        inspector.distribution,
+        "dists",
+        inspector.distribution.LRUCache(
+            1024 * 1024,
+            sizeof=lambda dist: dist.nbytes,
+            mapped_sizeof=lambda dist: dist.mapped_bytes,
+        ),
+    )
+
+    first = inspector.distribution._get_dist("ab", "cd", "ef", "foo-1.0.whl")
+    second = inspector.distribution._get_dist("ab", "cd", "ef", "foo-1.0.whl")
+
+    assert first is second
+    assert first.namelist() == ("foo/__init__.py",)
+    assert len(get.calls) == 1
+    assert inspector.distribution.dists.hits == 1
+    assert inspector.distribution.dists.size == first.nbytes
+    assert inspector.distribution.dists.mapped_size == first.mapped_bytes == len(body)
+
+
+def test_get_dist_weighs_mapped_archives_separately(monkeypatch, wheel):
+    bodies = {
+        name: wheel({"foo/data.bin": bytes(range(256)) * 64})
+        for name in ("foo-1.0.whl", "foo-2.0.whl")
+    }
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 0)
+    monkeypatch.setattr(
+        inspector.distribution,
+        "requests_session",
+        lambda: pretend.stub(
+            get=lambda url, stream: _response(bodies[url.rsplit("/", 1)[1]])
+        ),
+    )
+    body_size = len(bodies["foo-1.0.whl"])
+    monkeypatch.setattr(
+        inspector.distribution,
+        "dists",
+        inspector.distribution.LRUCache(
+            # Less than the archive itself, which is not on the heap.
+            body_size // 2,
+            sizeof=lambda dist: dist.nbytes,
+            max_mapped_bytes=body_size * 3 // 2,
+            mapped_sizeof=lambda dist: dist.mapped_bytes,
+        ),
+    )
+
+    inspector.distribution._get_dist("ab", "cd", "ef", "foo-1.0.whl")
+    assert "foo-1.0.whl" in inspector.distribution.dists
+
+    inspector.distribution._get_dist("ab", "cd", "ef", "foo-2.0.whl")
+    assert "foo-1.0.whl" not in inspector.distribution.dists
+    assert "foo-2.0.whl" in inspector.distribution.dists
+
+
+def test_get_dist_streams_to_a_mapped_file(monkeypatch, sdist):
+    body = sdist({"foo-1.0/setup.py": b"x" * 100})
+
+    monkeypatch.setattr(inspector.distribution, "DOWNLOAD_CHUNK_SIZE", 7)
+    monkeypatch.setattr(
+        inspector.distribution,
+        "requests_session",
+        lambda: pretend.stub(get=lambda url, stream: _response(body)),
+    )
+
+    dist = inspector.distribution._get_dist("ab", "cd", "ef", "foo-1.0.tar.gz")
+
+    assert isinstance(dist.tarfile.fileobj.fileobj, inspector.distribution.MappedFile)
+    assert dist.archive_size == len(body)
+    assert dist.contents("foo-1.0/setup.py") == b"x" * 100
+
+
+def test_get_dist_rejects_empty_downloads(monkeypatch):
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 0)
+    monkeypatch.setattr(
+        inspector.distribution,
+        "requests_session",
+        lambda: pretend.stub(get=lambda url, stream: _response(b"")),
+    )
+
+    with pytest.raises(inspector.distribution.BadFileError):
+        inspector.distribution._get_dist("ab", "cd", "ef", "empty-1.0.whl")
+
+
+def test_get_dist_skips_unsupported_types(monkeypatch):
+    monkeypatch.setattr(inspector.distribution, "requests_session", None)
+
+    assert inspector.distribution._get_dist("ab", "cd", "ef", "foo.exe") is None
+
+
+def _sdist():
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode="w:gz") as tf:
+
+        def add(name, data=b"", **kw):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            for key, value in kw.items():
+                setattr(info, key, value)
+            tf.addfile(info, io.BytesIO(data))
+
+        add("foo-1.0", type=tarfile.DIRTYPE)
+        add("foo-1.0/setup.py", b"setup()")
+        add("foo-1.0/foo/__init__.py", b"old")
+        add("foo-1.0/foo/__init__.py", b"new")
+        add("foo-1.0/foo/link.py", type=tarfile.SYMTYPE, linkname="__init__.py")
+        add("foo-1.0/hard.py", type=tarfile.LNKTYPE, linkname="./foo-1.0/setup.py")
+        add("foo-1.0/loop", type=tarfile.SYMTYPE, linkname="loop")
+        add("foo-1.0/fifo", type=tarfile.FIFOTYPE)
+    return io.BytesIO(f.getvalue())
+
+
+def test_tar_member_table_matches_tarfile():
+    dist = inspector.distribution.TarGzDistribution(_sdist())
+
+    with tarfile.open(fileobj=_sdist(), mode="r:gz") as tf:
+        assert dist.namelist() == tuple(
+            i.name for i in tf.getmembers() if not i.isdir()
+        )
+        for name in ["foo-1.0/setup.py", "foo-1.0/foo/__init__.py"]:
+            assert dist.contents(name) == tf.extractfile(name).read()
+
+    assert dist.contents("foo-1.0/foo/link.py") == b"new"
+    assert dist.contents("foo-1.0/hard.py") == b"setup()"
+    assert dist.exists("foo-1.0/setup.py")
+    assert not dist.exists("foo-1.0/missing.py")
+    assert dist.size("foo-1.0/setup.py") == 7
+    assert dist.tarfile.members == []
+
+    for name in ["foo-1.0", "foo-1.0/loop", "foo-1.0/fifo", "missing"]:
+        with pytest.raises(FileNotFoundError):
+            dist.contents(name)
+
+
+def test_zip_member_table_matches_zipfile(wheel):
+    body = wheel({"foo/": b"", "foo/a.py": b"a" * 1000, "foo/b.txt": b"b"})
+    dist = inspector.distribution.ZipDistribution(io.BytesIO(body))
+
+    assert dist.namelist() == ("foo/a.py", "foo/b.txt")
+    assert dist.contents("foo/a.py") == b"a" * 1000
+    assert dist.size("foo/b.txt") == 1
+    assert dist.zipfile.NameToInfo == {}
+    with pytest.raises(FileNotFoundError):
+        dist.contents("foo/c.py")
+    with pytest.raises(FileNotFoundError):
+        dist.size("foo/c.py")
+
+
+def test_zip_rejects_overlapping_entries():
+    body = io.BytesIO()
+    with zipfile.ZipFile(body, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("a.py", b"a")
+        zf.writestr("b.py", b"b" * 100)
+    body = bytearray(body.getvalue())
+    # Stretch a.py over b.py's header and data, keeping its CRC valid, so
+    # only the check for overlapping entries catches it.
+    start = zipfile.sizeFileHeader + len("a.py")
+    # a.py's entry comes first in the central directory.
+    central = body.index(b"PK\x01\x02")
+    size = central - start
+    crc = zlib.crc32(body[start:central])
+    struct.pack_into("<LLL", body, central + 16, crc, size, size)
+    dist = inspector.distribution.ZipDistribution(io.BytesIO(bytes(body)))
+
+    assert dist.contents("b.py") == b"b" * 100
+    with pytest.raises(inspector.distribution.BadFileError):
+        dist.contents("a.py")
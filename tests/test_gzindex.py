@@ -0,0 +1,57 @@
+import gzip
+import io
+import random
+
+import pytest
+
+from inspector.gzindex import IndexedGzipFile
+
+
+@pytest.fixture
+def data():
+    rng = random.Random(0)
+    return bytes(rng.choice(b"abcdefgh \n") for _ in range(300_000))
+
+
+def test_random_access_matches_stream(data):
+    f = IndexedGzipFile(io.BytesIO(gzip.compress(data)), span=32 * 1024)
+
+    assert f.read() == data
+    assert len(f.checkpoints) >= len(data) // (64 * 1024)
+
+    rng = random.Random(1)
+    for _ in range(200):
+        offset, size = rng.randrange(len(data)), rng.randrange(10_000)
+        f.seek(offset)
+        assert f.read(size) == data[offset : offset + size]  # noqa: E203
+
+
+def test_reads_restart_from_nearest_checkpoint(data):
+    compressed = io.BytesIO(gzip.compress(data))
+    f = IndexedGzipFile(compressed, span=32 * 1024, chunk_size=1024)
+    f.read()
+
+    reads = []
+    read = compressed.read
+    compressed.read = lambda n: reads.append(n) or read(n)
+
+    f.seek(len(data) - 100)
+    assert f.read() == data[-100:]
+    # Only the span after the last checkpoint was inflated again.
+    assert sum(reads) < len(compressed.getvalue()) // 4
+
+
+def test_multiple_members(data):
+    compressed = gzip.compress(data[:1000]) + gzip.compress(data[1000:])
+    f = IndexedGzipFile(io.BytesIO(compressed))
+
+    f.seek(990)
+    assert f.read(20) == data[990:1010]
+    assert f.seek(0, 2) == len(data)
+
+
+def test_truncated_stream(data):
+    f = IndexedGzipFile(io.BytesIO(gzip.compress(data)[:-100]))
+
+    with pytest.raises(EOFError):
+        f.read()
@@ -0,0 +1,67 @@
+import pretend
+
+from inspector import highlight
+from inspector.cache import LRUCache
+
+
+def _enable(monkeypatch, **settings):
+    monkeypatch.setattr(highlight, "SERVER_HIGHLIGHTING", True)
+    monkeypatch.setattr(highlight, "highlighted", LRUCache(1024 * 1024))
+    for name, value in settings.items():
+        monkeypatch.setattr(highlight, name, value)
+
+
+def test_highlight_is_opt_in(monkeypatch):
+    monkeypatch.setattr(highlight, "SERVER_HIGHLIGHTING", False)
+
+    assert highlight.highlight("import os\n", filename="foo.py") is None
+
+
+def test_highlight(monkeypatch):
+    _enable(monkeypatch)
+
+    html = highlight.highlight(
+        "import os\nprint(os)\nx = 1\n",
+        filename="foo.py",
+        first_line=10,
+        marked_lines=((11, 11),),
+    )
+
+    assert '<span class="kn">import</span>' in html
+    assert '<span class="hll">' in html
+    assert html.count('<span class="hll">') == 1
+
+
+def test_highlight_line_anchors_match_the_browser(monkeypatch):
+    _enable(monkeypatch)
+
+    html = highlight.highlight("x = 1\ny = 2\n", language="python", first_line=10)
+
+    # As linked to by Prism's linkable line numbers, on `<pre id="line">`
+    assert 'id="line.10"' in html
+    assert '<a href="#line.11"><span class="linenos">11</span></a>' in html
+    assert "line-" not in html
+
+
+def test_highlight_is_cached(monkeypatch):
+    _enable(monkeypatch)
+    pygments_highlight = pretend.call_recorder(lambda *a: "<html>")
+    monkeypatch.setattr(highlight, "pygments_highlight", pygments_highlight)
+
+    assert highlight.highlight("x = 1", language="python") == "<html>"
+    assert highlight.highlight("x = 1", language="python") == "<html>"
+    assert highlight.highlight("x = 1", language="python", first_line=2) == "<html>"
+
+    assert len(pygments_highlight.calls) == 2
+
+
+def test_highlight_skips_huge_text(monkeypatch):
+    _enable(monkeypatch, HIGHLIGHT_MAX_CHARS=10)
+
+    assert highlight.highlight("x = 1" * 3, language="python") is None
+
+
+def test_highlight_unknown_language(monkeypatch):
+    _enable(monkeypatch)
+
+    assert "&lt;plain&gt;" in highlight.highlight("<plain>", filename="foo.unknown")
@@ -0,0 +1,33 @@
+import pytest
+
+from inspector.lines import LineIndex, parse_range
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["", "one", "one\n", "one\ntwo", "one\ntwo\n", "\n\n", "ünï\ncödé\n\nlast"],
+)
+def test_line_index(text):
+    index = LineIndex(text)
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+
+    assert index.lines == len(lines)
+    for first in range(1, len(lines) + 1):
+        for last in range(first, len(lines) + 1):
+            start, end = index.span(first, last)
+            assert text[start:end] == "\n".join(lines[first - 1 : last])  # noqa: E203
+
+
+@pytest.mark.parametrize(
+    "value,expected", [("1-10", (1, 10)), ("7", (7, 7)), ("3-3", (3, 3))]
+)
+def test_parse_range(value, expected):
+    assert parse_range(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "0-1", "5-4", "a-b", "1-", "-3", "1-2-3"])
+def test_parse_invalid_range(value):
+    with pytest.raises(ValueError):
+        parse_range(value)
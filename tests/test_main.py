@@ -1,7 +1,15 @@
+import json
+import threading
+import time
+
 import pretend
 import pytest
 
+from werkzeug.exceptions import NotFound
+
+import inspector.deob
 import inspector.main
+import inspector.metadata
 
 
 @pytest.mark.parametrize(
@@ -88,11 +96,15 @@ def test_versions(monkeypatch):
     stub_json = {"releases": {"0.5.1e": None}}
     stub_response = pretend.stub(
         status_code=200,
-        json=lambda: stub_json,
+        headers={},
+        content=json.dumps(stub_json).encode(),
+    )
+    get = pretend.call_recorder(lambda a, headers: stub_response)
+    monkeypatch.setattr(
+        inspector.metadata, "requests_session", lambda: pretend.stub(get=get)
     )
-    get = pretend.call_recorder(lambda a: stub_response)
     monkeypatch.setattr(
-        inspector.main, "requests_session", lambda: pretend.stub(get=get)
+        inspector.metadata, "cache", inspector.metadata.MetadataCache(1024)
     )
 
     render_template = pretend.call_recorder(lambda *a, **kw: None)
@@ -100,7 +112,7 @@ def test_versions(monkeypatch):
 
     inspector.main.versions("foo")
 
-    assert get.calls == [pretend.call("https://pypi.org/pypi/foo/json")]
+    assert get.calls == [pretend.call("https://pypi.org/pypi/foo/json", headers={})]
     assert render_template.calls == [
         pretend.call(
             "releases.html",
@@ -111,3 +123,249 @@ def test_versions(monkeypatch):
             h2_paren_link="https://pypi.org/project/foo",
         )
     ]
+
+
+def test_breadcrumb_labels_fetched_concurrently(monkeypatch):
+    release = threading.Event()
+
+    def metadata(*args):
+        release.wait(1)
+        return pretend.stub(status_code=404)
+
+    monkeypatch.setattr(inspector.main, "project_metadata", metadata)
+    monkeypatch.setattr(inspector.main, "release_metadata", metadata)
+    # Only finishes in time if both wait for `release` at once.
+    threading.Timer(0.1, release.set).start()
+
+    start = time.monotonic()
+    with inspector.main.app.test_request_context():
+        result = inspector.main._breadcrumb_labels("foo", "1.0")
+
+    assert result == ("❌ Project no longer on PyPI", "❌ Release no longer on PyPI")
+    assert time.monotonic() - start < 0.5
+
+
+def test_breadcrumb_labels_degrade_after_deadline(monkeypatch):
+    release = threading.Event()
+
+    def slow(*args):
+        release.wait(1)
+        return pretend.stub(status_code=404)
+
+    monkeypatch.setattr(inspector.main, "REQUEST_DEADLINE", 0.05)
+    monkeypatch.setattr(inspector.main, "project_metadata", slow)
+    monkeypatch.setattr(inspector.main, "release_metadata", slow)
+
+    try:
+        with inspector.main.app.test_request_context():
+            result = inspector.main._breadcrumb_labels("foo", "1.0")
+    finally:
+        release.set()
+
+    assert result == ("View this project on PyPI", "View this release on PyPI")
+
+
+def test_fetch_dist_pending_after_deadline(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(inspector.main, "REQUEST_DEADLINE", 0.05)
+    monkeypatch.setattr(inspector.main, "_get_dist", lambda *a: release.wait(1))
+
+    try:
+        with inspector.main.app.test_request_context():
+            result = inspector.main._fetch_dist("a", "b", "c", "foo.whl")
+    finally:
+        release.set()
+
+    assert result is inspector.main.PENDING
+
+
+def test_breadcrumbs(monkeypatch):
+    monkeypatch.setattr(
+        inspector.main,
+        "_breadcrumb_labels",
+        lambda *a: ("View this project on PyPI", "❌ Release no longer on PyPI"),
+    )
+
+    response = inspector.main.app.test_client().get("/_breadcrumbs/foo/1.0/")
+
+    assert response.status_code == 200
+    assert response.json == {
+        "h2_paren": "View this project on PyPI",
+        "h3_paren": "❌ Release no longer on PyPI",
+    }
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+
+
+def test_distribution_pending(monkeypatch):
+    monkeypatch.setattr(
+        inspector.main, "_fetch_dist", lambda *a: inspector.main.PENDING
+    )
+
+    with inspector.main.app.test_request_context():
+        body, status, headers = inspector.main.distribution(
+            "foo", "1.0", "a", "b", "c", "foo.whl"
+        )
+
+    assert status == 503
+    assert headers == {"Retry-After": "5"}
+    assert "still being downloaded" in body
+
+
+def test_distribution_lists_small_distributions(monkeypatch, zip_dist):
+    dist = zip_dist({"pkg/a b.py": b"", "pkg/c.py": b""})
+    monkeypatch.setattr(inspector.main, "_fetch_dist", lambda *a: dist)
+    render_template = pretend.call_recorder(lambda *a, **kw: "")
+    monkeypatch.setattr(inspector.main, "render_template", render_template)
+
+    with inspector.main.app.test_request_context():
+        inspector.main.distribution("foo", "1.0", "a", "b", "c", "foo.whl")
+
+    [call] = render_template.calls
+    assert call.args == ("links.html",)
+    assert call.kwargs["links"] == ["./pkg/a%20b.py", "./pkg/c.py"]
+
+
+def test_distribution_browses_large_distributions(monkeypatch, zip_dist):
+    dist = zip_dist({f"pkg/{i}.py": b"x" * i for i in range(5)} | {"setup.py": b""})
+    monkeypatch.setattr(inspector.main, "_fetch_dist", lambda *a: dist)
+    monkeypatch.setattr(inspector.main, "FLAT_LISTING_MAX_FILES", 3)
+    monkeypatch.setattr(inspector.main, "LISTING_PAGE_SIZE", 2)
+
+    with inspector.main.app.test_request_context():
+        root = inspector.main.distribution("foo", "1.0", "a", "b", "c", "foo.whl")
+    with inspector.main.app.test_request_context("/?path=pkg/&after=1.py"):
+        page = inspector.main.distribution("foo", "1.0", "a", "b", "c", "foo.whl")
+    with inspector.main.app.test_request_context("/?path=nope"):
+        with pytest.raises(NotFound):
+            inspector.main.distribution("foo", "1.0", "a", "b", "c", "foo.whl")
+
+    assert '<a href="?path=pkg/">pkg/</a> (5 files, 10 Bytes)' in root
+    assert '<a href="./setup.py">setup.py</a>' in root
+    assert '<a href="./pkg/2.py">2.py</a> (2 Bytes)' in page
+    assert '<a href="./pkg/4.py">' not in page
+    assert '<a href="?path=pkg/&amp;after=3.py">Next page</a>' in page
+    assert '<a href="?path=pkg/">First page</a>' in page
+
+
+@pytest.mark.parametrize(
+    "query,code,window",
+    [
+        ("", "1\n2\n3\n", {}),
+        (
+            "?lines=2-3",
+            "2\n3",
+            {"first": 2, "last": 3, "previous_url": "?lines=1-1", "next_url": None},
+        ),
+        (
+            "?lines=1-3",
+            "1\n2",
+            {"first": 1, "last": 2, "previous_url": None, "next_url": "?lines=3-4"},
+        ),
+    ],
+)
+def test_file_windows(monkeypatch, query, code, window, zip_dist):
+    dist = zip_dist({"foo.py": b"1\n2\n3\n"})
+    monkeypatch.setattr(inspector.main, "_fetch_dist", lambda *a: dist)
+    monkeypatch.setattr(inspector.main, "CODE_WINDOW_LINES", 2)
+    render_template = pretend.call_recorder(lambda *a, **kw: "")
+    monkeypatch.setattr(inspector.main, "render_template", render_template)
+
+    with inspector.main.app.test_request_context("/" + query):
+        inspector.main.file("foo", "1.0", "a", "b", "c", "foo.whl", "foo.py")
+
+    [call] = render_template.calls
+    assert call.kwargs["code"] == code
+    assert {key: call.kwargs["window"].get(key) for key in window} == window
+
+
+def test_file_windows_long_lines(monkeypatch, zip_dist):
+    dist = zip_dist({"foo.min.js": b"x" * 100 + b"\ny"})
+    monkeypatch.setattr(inspector.main, "_fetch_dist", lambda *a: dist)
+    monkeypatch.setattr(inspector.main, "CODE_WINDOW_MAX_CHARS", 10)
+    render_template = pretend.call_recorder(lambda *a, **kw: "")
+    monkeypatch.setattr(inspector.main, "render_template", render_template)
+
+    with inspector.main.app.test_request_context("/"):
+        inspector.main.file("foo", "1.0", "a", "b", "c", "foo.whl", "foo.min.js")
+    with inspector.main.app.test_request_context("/?lines=5"):
+        with pytest.raises(NotFound):
+            inspector.main.file("foo", "1.0", "a", "b", "c", "foo.whl", "foo.min.js")
+
+    [call] = render_template.calls
+    assert call.kwargs["code"] == "x" * 10
+    assert call.kwargs["window"]["lines"] == 2
+    assert call.kwargs["window"]["truncated"]
+
+
+def test_distribution_pages_are_immutable(monkeypatch, zip_dist):
+    dist = zip_dist({"foo.py": b"print()\n"})
+    fetch_dist = pretend.call_recorder(lambda *a: dist)
+    monkeypatch.setattr(inspector.main, "_fetch_dist", fetch_dist)
+    client = inspector.main.app.test_client()
+    url = "/project/foo/1.0/packages/a/b/c/foo.whl/foo.py"
+
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert 'content="/_breadcrumbs/foo/1.0/"' in response.text
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    # Answered without fetching the distribution again
+    assert len(fetch_dist.calls) == 1
+
+    other = client.get(url + "?lines=1", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+def test_pending_pages_are_not_cached(monkeypatch):
+    monkeypatch.setattr(
+        inspector.main, "_fetch_dist", lambda *a: inspector.main.PENDING
+    )
+
+    response = inspector.main.app.test_client().get(
+        "/project/foo/1.0/packages/a/b/c/foo.whl/"
+    )
+
+    assert response.status_code == 503
+    assert "ETag" not in response.headers
+    assert "Cache-Control" not in response.headers
+
+
+def test_incomplete_decompilations_are_not_cached(monkeypatch, zip_dist):
+    monkeypatch.setattr(
+        inspector.main, "_fetch_dist", lambda *a: zip_dist({"foo.pyc": b"bytecode"})
+    )
+    truncated = inspector.deob.TRUNCATED_MARKER.format(reason="time limit reached")
+    monkeypatch.setattr(
+        inspector.main,
+        "disassemble_and_decompile",
+        lambda code, digest, deadline: ("disassembly", "decompilation" + truncated),
+    )
+
+    response = inspector.main.app.test_client().get(
+        "/project/foo/1.0/packages/a/b/c/foo.whl/foo.pyc"
+    )
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert response.headers["Cache-Control"] == "no-store"
+
+
+def test_decompilation_gets_the_rest_of_the_deadline(monkeypatch, zip_dist):
+    monkeypatch.setattr(
+        inspector.main, "_fetch_dist", lambda *a: zip_dist({"foo.pyc": b"bytecode"})
+    )
+    decompile = pretend.call_recorder(lambda code, digest, deadline: ("", ""))
+    monkeypatch.setattr(inspector.main, "disassemble_and_decompile", decompile)
+    monkeypatch.setattr(inspector.main, "render_template", lambda *a, **kw: "")
+
+    with inspector.main.app.test_request_context():
+        deadline = inspector.main._deadline()
+        inspector.main.file("foo", "1.0", "a", "b", "c", "foo.whl", "foo.pyc")
+
+    [call] = decompile.calls
+    assert call.args[2] == deadline
@@ -0,0 +1,78 @@
+import pretend
+import pytest
+
+import inspector.metadata
+
+from inspector.metadata import MetadataCache
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    responses = []
+    get = pretend.call_recorder(lambda url, headers: responses.pop(0))
+    monkeypatch.setattr(
+        inspector.metadata, "requests_session", lambda: pretend.stub(get=get)
+    )
+    monkeypatch.setattr(inspector.metadata.time, "monotonic", lambda: 1000.0)
+    return responses, get
+
+
+def _response(status_code, content=b"{}", etag=None):
+    headers = {"ETag": etag} if etag else {}
+    return pretend.stub(status_code=status_code, headers=headers, content=content)
+
+
+def test_fresh_responses_are_served_from_cache(upstream):
+    responses, get = upstream
+    responses.append(_response(200, b'{"a": 1}'))
+    cache = MetadataCache(1024)
+
+    assert cache.get("url", ttl=60).json() == {"a": 1}
+    assert cache.get("url", ttl=60).json() == {"a": 1}
+    assert len(get.calls) == 1
+
+
+def test_expired_responses_are_revalidated(upstream, monkeypatch):
+    responses, get = upstream
+    responses += [_response(200, b'{"a": 1}', etag='"v1"'), _response(304)]
+    cache = MetadataCache(1024, stale_while_revalidate=0)
+
+    cache.get("url", ttl=60)
+    monkeypatch.setattr(inspector.metadata.time, "monotonic", lambda: 2000.0)
+
+    assert cache.get("url", ttl=60).json() == {"a": 1}
+    assert get.calls[-1] == pretend.call("url", headers={"If-None-Match": '"v1"'})
+    assert cache.revalidations == 1
+    # Fresh again after revalidating.
+    assert cache.get("url", ttl=60).json() == {"a": 1}
+    assert len(get.calls) == 2
+
+
+def test_stale_responses_are_served_while_revalidating(upstream, monkeypatch):
+    responses, get = upstream
+    responses += [_response(200, b'{"a": 1}'), _response(200, b'{"a": 2}')]
+    cache = MetadataCache(1024, stale_while_revalidate=3600)
+    submitted = []
+    monkeypatch.setattr(cache, "_executor", pretend.stub(submit=submitted.append))
+
+    cache.get("url", ttl=60)
+    monkeypatch.setattr(inspector.metadata.time, "monotonic", lambda: 2000.0)
+
+    assert cache.get("url", ttl=60).json() == {"a": 1}
+    assert cache.get("url", ttl=60).json() == {"a": 1}
+    assert len(submitted) == 1
+
+    submitted[0]()
+    assert cache.get("url", ttl=60).json() == {"a": 2}
+
+
+def test_not_found_is_cached_and_errors_are_not(upstream):
+    responses, get = upstream
+    responses += [_response(404), _response(502), _response(502)]
+    cache = MetadataCache(1024)
+
+    assert cache.get("missing", ttl=60).status_code == 404
+    assert cache.get("missing", ttl=60).status_code == 404
+    assert cache.get("broken", ttl=60).status_code == 502
+    assert cache.get("broken", ttl=60).status_code == 502
+    assert len(get.calls) == 3
@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pretend
+import pytest
+
+import inspector.distribution
+import inspector.main
+import inspector.metadata
+import inspector.metrics
+
+from inspector.cache import LRUCache
+from inspector.metadata import MetadataCache
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(inspector.metrics, "_counters", {})
+    monkeypatch.setattr(inspector.metrics, "_histograms", {})
+    monkeypatch.setattr(inspector.metrics, "_caches", {})
+
+
+def test_timed():
+    timings = inspector.metrics.start_request()
+
+    with inspector.metrics.timed("dist"):
+        pass
+    inspector.metrics.record("dist", 0.5)
+
+    assert [stage for stage, _ in timings] == ["dist", "dist"]
+    histogram = inspector.metrics._histograms[
+        ("inspector_stage_seconds", (("stage", "dist"),))
+    ]
+    assert sum(histogram.counts) == 2
+    assert histogram.sum >= 0.5
+
+
+def test_submit_records_into_the_request():
+    timings = inspector.metrics.start_request()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        inspector.metrics.submit(
+            executor, inspector.metrics.record, "download", 0.25
+        ).result()
+        executor.submit(inspector.metrics.record, "elsewhere", 1).result()
+
+    assert timings == [("download", 0.25)]
+
+
+def test_server_timing():
+    timings = [("read", 0.001), ("highlight", 0.0125), ("read", 0.002)]
+
+    assert inspector.metrics.server_timing(timings) == (
+        "read;dur=3.0, highlight;dur=12.5"
+    )
+
+
+def test_render():
+    cache = LRUCache(1024)
+    cache["a"] = b"xx"
+    cache.get("a")
+    cache.get("b")
+    inspector.metrics.register_cache("dists", cache)
+    inspector.metrics.inc("inspector_subprocesses_total", tool="pycdc")
+    inspector.metrics.inc("inspector_downloaded_bytes_total", 2048)
+    inspector.metrics.observe("inspector_stage_seconds", 0.003, stage="read")
+    inspector.metrics.observe("inspector_stage_seconds", 20, stage="read")
+
+    lines = inspector.metrics.render().splitlines()
+
+    assert "# TYPE inspector_subprocesses_total counter" in lines
+    assert 'inspector_subprocesses_total{tool="pycdc"} 1' in lines
+    assert "inspector_downloaded_bytes_total 2048" in lines
+    assert "# TYPE inspector_stage_seconds histogram" in lines
+    assert 'inspector_stage_seconds_bucket{stage="read",le="0.0025"} 0' in lines
+    assert 'inspector_stage_seconds_bucket{stage="read",le="0.005"} 1' in lines
+    assert 'inspector_stage_seconds_bucket{stage="read",le="10"} 1' in lines
+    assert 'inspector_stage_seconds_bucket{stage="read",le="+Inf"} 2' in lines
+    assert 'inspector_stage_seconds_count{stage="read"} 2' in lines
+    assert 'inspector_stage_seconds_sum{stage="read"} 20.003' in lines
+    assert 'inspector_cache_hits_total{cache="dists"} 1' in lines
+    assert 'inspector_cache_misses_total{cache="dists"} 1' in lines
+    assert 'inspector_cache_bytes{cache="dists"} 2' in lines
+    # Metrics without samples are left out.
+    assert not any("inspector_request_seconds" in line for line in lines)
+
+
+def test_render_metadata_cache(monkeypatch):
+    cache = MetadataCache(1024)
+    monkeypatch.setattr(
+        inspector.metadata,
+        "requests_session",
+        lambda: pretend.stub(
+            get=lambda url, headers: pretend.stub(
+                status_code=200, headers={}, content=b"{}"
+            )
+        ),
+    )
+    cache.get("url", ttl=60)
+    cache.get("url", ttl=60)
+    inspector.metrics.register_cache("metadata", cache)
+
+    lines = inspector.metrics.render().splitlines()
+
+    assert 'inspector_cache_hits_total{cache="metadata"} 1' in lines
+    assert 'inspector_cache_misses_total{cache="metadata"} 1' in lines
+    assert 'inspector_cache_bytes{cache="metadata"} 202' in lines
+
+
+def test_render_keeps_every_digit():
+    inspector.metrics.inc("inspector_downloaded_bytes_total", 123456789)
+    inspector.metrics.observe("inspector_stage_seconds", 1234.5678, stage="read")
+
+    lines = inspector.metrics.render().splitlines()
+
+    assert "inspector_downloaded_bytes_total 123456789" in lines
+    assert 'inspector_stage_seconds_sum{stage="read"} 1234.5678' in lines
+
+
+def test_download_is_measured(monkeypatch, wheel):
+    body = wheel({"foo/__init__.py": b""})
+    response = pretend.stub(
+        raise_for_status=lambda: None,
+        iter_content=lambda chunk_size: iter([body]),
+        __enter__=lambda: None,
+        __exit__=lambda *a: None,
+    )
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 0)
+    monkeypatch.setattr(
+        inspector.distribution,
+        "requests_session",
+        lambda: pretend.stub(get=lambda url, stream: response),
+    )
+    monkeypatch.setattr(
+        inspector.distribution, "dists", LRUCache(1024 * 1024, sizeof=lambda d: 1)
+    )
+    timings = inspector.metrics.start_request()
+
+    inspector.distribution._get_dist("ab", "cd", "ef", "foo-1.0.whl")
+
+    assert [stage for stage, _ in timings] == ["download", "open"]
+    assert inspector.metrics._counters == {
+        ("inspector_downloaded_bytes_total", ()): len(body)
+    }
+
+
+def test_server_timing_header():
+    response = inspector.main.app.test_client().get("/_health/")
+
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+
+
+def test_metrics_endpoint():
+    client = inspector.main.app.test_client()
+    client.get("/_health/")
+
+    response = client.get("/_metrics/")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'inspector_request_seconds_count{endpoint="health"} 1' in (
+        response.get_data(as_text=True).splitlines()
+    )
+
+
+def test_metrics_are_not_traced():
+    context = {"wsgi_environ": {"PATH_INFO": "/_metrics/"}}
+
+    assert inspector.main.traces_sampler(context) == 0
@@ -0,0 +1,150 @@
+import threading
+
+import pretend
+import pytest
+
+import inspector.main
+import inspector.prefetch
+
+from inspector.cache import LRUCache
+
+
+def _file(filename, packagetype="bdist_wheel", size=1024):
+    return {
+        "filename": filename,
+        "packagetype": packagetype,
+        "size": size,
+        "url": f"https://files.pythonhosted.org/packages/ab/cd/ef01/{filename}",
+    }
+
+
+@pytest.fixture(autouse=True)
+def dists(monkeypatch):
+    dists = LRUCache(1024 * 1024, mapped_sizeof=len)
+    monkeypatch.setattr(inspector.prefetch, "dists", dists)
+    monkeypatch.setattr(
+        inspector.prefetch, "downloads", pretend.stub(in_flight=lambda: 0)
+    )
+    return dists
+
+
+@pytest.fixture
+def get_dist(monkeypatch):
+    get_dist = pretend.call_recorder(lambda *a: None)
+    monkeypatch.setattr(inspector.prefetch, "_get_dist", get_dist)
+    return get_dist
+
+
+def _prefetch(files, **kwargs):
+    prefetcher = inspector.prefetch.Prefetcher(workers=1, **kwargs)
+    queued = prefetcher.schedule(files)
+    prefetcher.executor.shutdown(wait=True)
+    return queued
+
+
+def test_candidates(monkeypatch):
+    monkeypatch.setattr(inspector.prefetch, "PREFETCH_MAX_FILE_BYTES", 2048)
+    files = [
+        _file("foo-1.0-cp311-cp311-manylinux_2_17_x86_64.whl"),
+        _file("foo-1.0-py3-none-any.whl"),
+        _file("foo-1.0.tar.gz", "sdist"),
+        _file("foo-1.0.tar.bz2", "sdist"),
+        _file("foo-1.0-py2.py3-none-any.whl", size=4096),
+    ]
+
+    candidates = inspector.prefetch._candidates(files)
+
+    assert [file["filename"] for file in candidates] == [
+        "foo-1.0.tar.gz",
+        "foo-1.0-py3-none-any.whl",
+        "foo-1.0-cp311-cp311-manylinux_2_17_x86_64.whl",
+    ]
+
+
+def test_schedule(get_dist, dists):
+    dists["foo-1.0-py3-none-any.whl"] = b"cached"
+    files = [
+        _file("foo-1.0-py3-none-any.whl"),
+        _file("foo-1.0.tar.gz", "sdist"),
+        _file("foo-1.0-cp311-cp311-win_amd64.whl"),
+        _file("foo-1.0-cp312-cp312-win_amd64.whl"),
+    ]
+
+    queued = _prefetch(files)
+
+    assert queued == ["foo-1.0.tar.gz"]
+    assert get_dist.calls == [pretend.call("ab", "cd", "ef01", "foo-1.0.tar.gz")]
+
+
+def test_bandwidth_budget(get_dist):
+    files = [_file("foo-1.0.tar.gz", "sdist"), _file("foo-1.0-py3-none-any.whl")]
+
+    _prefetch(files, bytes_per_minute=1536)
+
+    assert get_dist.calls == [pretend.call("ab", "cd", "ef01", "foo-1.0.tar.gz")]
+
+
+def test_cache_budget(get_dist, dists):
+    dists["bar-1.0.tar.gz"] = b"x" * 1024
+
+    _prefetch([_file("foo-1.0.tar.gz", "sdist")], max_cache_bytes=1536)
+
+    assert get_dist.calls == []
+
+
+def test_busy(get_dist, monkeypatch):
+    monkeypatch.setattr(
+        inspector.prefetch, "downloads", pretend.stub(in_flight=lambda: 2)
+    )
+
+    assert _prefetch([_file("foo-1.0.tar.gz", "sdist")]) == []
+    assert get_dist.calls == []
+
+
+def test_busy_cancels_queue(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    in_flight = 0
+
+    def get_dist(*args):
+        calls.append(args)
+        started.set()
+        release.wait(1)
+
+    monkeypatch.setattr(inspector.prefetch, "_get_dist", get_dist)
+    monkeypatch.setattr(
+        inspector.prefetch, "downloads", pretend.stub(in_flight=lambda: in_flight)
+    )
+    prefetcher = inspector.prefetch.Prefetcher(workers=1)
+    files = [_file("foo-1.0.tar.gz", "sdist"), _file("foo-1.0-py3-none-any.whl")]
+
+    assert len(prefetcher.schedule(files)) == 2
+    started.wait(1)
+    # The running prefetch doesn't count, but two more downloads do.
+    in_flight = 3
+    assert prefetcher.schedule([_file("bar-1.0.tar.gz", "sdist")]) == []
+    release.set()
+    prefetcher.executor.shutdown(wait=True)
+
+    assert [args[-1] for args in calls] == ["foo-1.0.tar.gz"]
+    assert prefetcher._queued == {}
+
+
+def test_distributions_prefetches(monkeypatch):
+    files = [_file("foo-1.0.tar.gz", "sdist")]
+    monkeypatch.setattr(
+        inspector.main,
+        "release_metadata",
+        lambda *a: pretend.stub(status_code=200, json=lambda: {"urls": files}),
+    )
+    monkeypatch.setattr(inspector.main, "render_template", lambda *a, **kw: "")
+    schedule = pretend.call_recorder(lambda files: [])
+    monkeypatch.setattr(inspector.main, "prefetcher", pretend.stub(schedule=schedule))
+
+    with inspector.main.app.test_request_context():
+        inspector.main.distributions("foo", "1.0")
+    monkeypatch.setattr(inspector.main, "PREFETCH", True)
+    with inspector.main.app.test_request_context():
+        inspector.main.distributions("foo", "1.0")
+
+    assert schedule.calls == [pretend.call(files)]
@@ -0,0 +1,203 @@
+import http.server
+import io
+import threading
+import zipfile
+
+import pretend
+import pytest
+import requests
+
+import inspector.distribution
+
+from inspector.errors import UpstreamError
+from inspector.remote import HTTPRangeFile, RangeNotSupported
+from inspector.utilities import requests_session
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    body = b""
+    ranges = True
+    requests = []
+
+    def do_GET(self):
+        byte_range = self.headers.get("Range")
+        self.requests.append(byte_range)
+        if not (self.ranges and byte_range):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(self.body)))
+            self.end_headers()
+            self.wfile.write(self.body)
+            return
+
+        start, end = byte_range.removeprefix("bytes=").split("-")
+        if not start:
+            start, end = max(0, len(self.body) - int(end)), len(self.body) - 1
+        start, end = int(start), min(int(end), len(self.body) - 1)
+        data = self.body[start : end + 1]  # noqa: E203
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.body)}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch, wheel):
+    files = {f"pkg/module_{i}.py": f"VALUE = {i}\n" * 2000 for i in range(50)}
+    files["pkg/data.bin"] = bytes(range(256)) * 4000
+    body = wheel(files, compression=zipfile.ZIP_DEFLATED)
+    monkeypatch.setattr(_Handler, "body", body)
+    monkeypatch.setattr(_Handler, "requests", [])
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(
+        target=httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/pkg-1.0-py3-none-any.whl", body
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_http_range_file_reads_only_requested_members(server):
+    url, body = server
+    f = HTTPRangeFile(url, requests_session(), block_size=4096, tail_size=8192)
+    dist = inspector.distribution.ZipDistribution(f)
+
+    # The central directory fits in the tail fetched when opening the file.
+    assert len(dist.namelist()) == 51
+    assert f.requests == 1
+
+    assert dist.contents("pkg/module_7.py") == b"VALUE = 7\n" * 2000
+    assert f.requests == 2
+    assert _Handler.requests[-1] != "bytes=0-%d" % (len(body) - 1)
+
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert dist.contents("pkg/data.bin") == zf.read("pkg/data.bin")
+
+
+def test_http_range_file_opens_with_one_request(server):
+    url, body = server
+    # Blocks larger than the tail, as with the defaults
+    f = HTTPRangeFile(url, requests_session(), block_size=16384, tail_size=8192)
+    dist = inspector.distribution.ZipDistribution(f)
+
+    assert len(dist.namelist()) == 51
+    assert _Handler.requests == ["bytes=-8192"]
+
+    f.seek(len(body) - 100)
+    assert f.read() == body[-100:]
+    assert f.requests == 1
+
+
+def test_http_range_file_requires_range_support(server, monkeypatch):
+    url, body = server
+    monkeypatch.setattr(_Handler, "ranges", False)
+
+    with pytest.raises(RangeNotSupported) as exc:
+        HTTPRangeFile(url, requests_session())
+
+    assert exc.value.response.content == body
+
+
+def test_get_dist_falls_back_to_full_download(server, monkeypatch):
+    url, body = server
+    monkeypatch.setattr(_Handler, "ranges", False)
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 1)
+
+    f = inspector.distribution._open_remote_zip(url, "key")
+
+    assert isinstance(f, inspector.distribution.MappedFile)
+    assert f.read() == body
+    assert len(_Handler.requests) == 1
+
+
+def test_get_dist_downloads_small_archives(server, monkeypatch):
+    url, body = server
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", len(body) + 1)
+
+    f = inspector.distribution._open_remote_zip(url, "key")
+
+    assert isinstance(f, inspector.distribution.MappedFile)
+    assert f.read() == body
+
+
+def test_get_dist_reads_large_archives_remotely(server, monkeypatch):
+    url, body = server
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 1)
+
+    f = inspector.distribution._open_remote_zip(url, "key")
+
+    assert isinstance(f, HTTPRangeFile)
+    assert len(f) == len(body)
+
+
+def test_http_range_file_failed_reads(server):
+    url, _ = server
+    f = HTTPRangeFile(url, requests_session(), block_size=4096, tail_size=8192)
+    dist = inspector.distribution.ZipDistribution(f)
+
+    def get(*args, **kwargs):
+        raise requests.ConnectionError("Connection reset")
+
+    f.session = pretend.stub(get=get)
+
+    with pytest.raises(UpstreamError):
+        dist.contents("pkg/module_7.py")
+
+
+def test_http_range_file_counts_cached_bytes(server):
+    url, _ = server
+    f = HTTPRangeFile(
+        url, requests_session(), block_size=4096, max_cached_bytes=4 * 4096
+    )
+    for offset in range(0, 40000, 3000):
+        f.seek(offset)
+        f.read(100)
+
+    blocks = sum(len(block) for block in f._blocks.values())
+    assert f.nbytes == len(f._tail) + blocks
+    assert blocks <= 4 * 4096
+
+
+def test_http_range_file_fails_to_open(server, monkeypatch):
+    url, _ = server
+
+    def get(*args, **kwargs):
+        raise requests.ConnectionError("Connection refused")
+
+    with pytest.raises(UpstreamError):
+        HTTPRangeFile(url, pretend.stub(get=get))
+
+
+def test_http_range_file_rejects_malformed_partial_content(server, monkeypatch):
+    url, _ = server
+    response = pretend.stub(
+        status_code=206,
+        headers={"Content-Range": "bytes */*"},
+        raise_for_status=lambda: None,
+        close=pretend.call_recorder(lambda: None),
+    )
+    session = pretend.stub(get=lambda *args, **kwargs: response)
+    monkeypatch.setattr(inspector.distribution, "requests_session", lambda: session)
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 1)
+
+    with pytest.raises(UpstreamError):
+        inspector.distribution._open_remote_zip(url, "key")
+
+    assert response.close.calls == [pretend.call()]
+
+
+def test_http_range_file_short_read(server):
+    url, _ = server
+    f = HTTPRangeFile(url, requests_session(), block_size=4096, tail_size=4096)
+    f.session = pretend.stub(
+        get=lambda *args, **kwargs: pretend.stub(
+            status_code=206, raise_for_status=lambda: None, content=b"short"
+        )
+    )
+
+    with pytest.raises(UpstreamError):
+        f.read(100)
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from inspector.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fn, 5)))
+    leader.start()
+    started.wait()
+    waiters = [
+        threading.Thread(target=lambda: results.append(flight.do("k", fn, 5)))
+        for _ in range(5)
+    ]
+    for waiter in waiters:
+        waiter.start()
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join()
+
+    assert results == ["value"] * 6
+    assert calls == [1]
+    assert flight.in_flight() == 0
+
+
+def test_waiters_get_the_leaders_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fn():
+        started.set()
+        release.wait()
+        raise ValueError("download failed")
+
+    def call():
+        try:
+            flight.do("k", fn, 5)
+        except ValueError as exc:
+            errors.append(str(exc))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    release.set()
+    leader.join()
+    waiter.join()
+
+    assert errors == ["download failed"] * 2
+
+
+def test_waiters_time_out():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait()
+
+    leader = threading.Thread(target=lambda: flight.do("k", fn, 5))
+    leader.start()
+    started.wait()
+
+    with pytest.raises(TimeoutError):
+        flight.do("k", fn, 0.01)
+
+    release.set()
+    leader.join()
@@ -0,0 +1,129 @@
+import os
+
+import pretend
+import pytest
+
+import inspector.distribution
+
+from inspector.store import FileStore
+
+
+def test_put_and_get(tmp_path):
+    store = FileStore(str(tmp_path), max_bytes=1024)
+
+    assert store.get("a/b/c/foo.whl") is None
+    path = store.put("a/b/c/foo.whl", [b"foo", b"bar"])
+
+    assert store.get("a/b/c/foo.whl") == path
+    with open(path, "rb") as f:
+        assert f.read() == b"foobar"
+    assert (store.hits, store.misses) == (1, 1)
+    assert os.listdir(tmp_path / "tmp") == []
+
+    # Another process sees the same files.
+    assert FileStore(str(tmp_path), max_bytes=1024).get("a/b/c/foo.whl") == path
+
+
+def test_evicts_least_recently_accessed(tmp_path):
+    store = FileStore(str(tmp_path), max_bytes=10)
+    a = store.put("a", [b"a" * 4])
+    b = store.put("b", [b"b" * 4])
+    store.get("a")
+
+    store.put("c", [b"c" * 4])
+
+    assert store.get("b") is None
+    assert not os.path.exists(b)
+    assert store.get("a") == a
+    assert store.size == 8
+    assert store.evictions == 1
+
+
+def test_keeps_new_files_larger_than_the_store(tmp_path):
+    store = FileStore(str(tmp_path), max_bytes=1)
+
+    path = store.put("a", [b"aa"])
+
+    assert store.get("a") == path
+    assert os.path.exists(path)
+
+
+def test_failed_writes_leave_nothing_behind(tmp_path):
+    store = FileStore(str(tmp_path), max_bytes=1024)
+
+    def chunks():
+        yield b"partial"
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        store.put("a", chunks())
+
+    assert store.get("a") is None
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_get_dist_uses_store(tmp_path, monkeypatch, sdist):
+    store = FileStore(str(tmp_path), max_bytes=1024 * 1024)
+    store.put("ab/cd/ef/foo-1.0.tar.gz", [sdist({"foo-1.0/setup.py": b"setup()"})])
+    monkeypatch.setattr(inspector.distribution, "store", store)
+    monkeypatch.setattr(
+        inspector.distribution, "requests_session", pretend.raiser(AssertionError)
+    )
+    monkeypatch.setattr(
+        inspector.distribution,
+        "dists",
+        inspector.distribution.LRUCache(1024, sizeof=lambda dist: dist.nbytes),
+    )
+
+    # Served from the store, without any download.
+    dist = inspector.distribution._get_dist("ab", "cd", "ef", "foo-1.0.tar.gz")
+
+    assert dist.contents("foo-1.0/setup.py") == b"setup()"
+
+
+def test_download_finds_the_file_stored_while_waiting(tmp_path, monkeypatch):
+    store = FileStore(str(tmp_path), max_bytes=1024)
+    monkeypatch.setattr(inspector.distribution, "store", store)
+
+    def lock(key, timeout):
+        # Another process downloads the file while this one waits.
+        store.put(key, [b"stored"])
+        return FileStore.lock(store, key, timeout)
+
+    monkeypatch.setattr(store, "lock", lock)
+    resp = pretend.stub(close=pretend.call_recorder(lambda: None))
+
+    f = inspector.distribution._download("https://example.com", "a/b/c/foo.whl", resp)
+
+    assert f.read() == b"stored"
+    assert resp.close.calls == [pretend.call()]
+
+
+def test_remote_reads_are_not_locked(tmp_path, monkeypatch):
+    store = FileStore(str(tmp_path), max_bytes=1024)
+    monkeypatch.setattr(store, "lock", pretend.raiser(AssertionError))
+    monkeypatch.setattr(inspector.distribution, "store", store)
+    remote = pretend.stub(__len__=lambda: 1024)
+    monkeypatch.setattr(inspector.distribution, "REMOTE_ZIP_MIN_BYTES", 1)
+    monkeypatch.setattr(
+        inspector.distribution, "HTTPRangeFile", lambda url, session: remote
+    )
+
+    f = inspector.distribution._open(
+        "a/b/c/foo.whl", inspector.distribution.ZipDistribution
+    )
+
+    assert f is remote
+
+
+def test_lock_is_exclusive_across_processes(tmp_path):
+    store = FileStore(str(tmp_path), max_bytes=1024)
+    other = FileStore(str(tmp_path), max_bytes=1024)
+
+    with store.lock("a/b/c/foo.whl", timeout=1):
+        with pytest.raises(TimeoutError):
+            with other.lock("a/b/c/foo.whl", timeout=0.1):
+                pass
+
+    with other.lock("a/b/c/foo.whl", timeout=0.1):
+        pass
@@ -0,0 +1,60 @@
+import pytest
+
+from inspector.members import MemberTable
+from inspector.tree import DirectoryIndex, Entry
+
+
+def _index(files):
+    members = MemberTable()
+    members.add("pkg/", 0, 0, flags=MemberTable.DIRECTORY)
+    for offset, (name, size) in enumerate(files.items()):
+        members.add(name, offset, size)
+    members.freeze()
+    return DirectoryIndex(members)
+
+
+def test_directory_stats():
+    index = _index(
+        {
+            "setup.py": 10,
+            "pkg/__init__.py": 1,
+            "pkg/sub/a.py": 2,
+            "pkg/sub/b.py": 3,
+            "docs/index.rst": 4,
+        }
+    )
+
+    assert index.stats("") == Entry("", "", 5, 20)
+    assert index.page("") == (
+        [
+            Entry("docs/", "docs/", 1, 4),
+            Entry("pkg/", "pkg/", 3, 6),
+            Entry("setup.py", "setup.py", 1, 10),
+        ],
+        None,
+    )
+    assert index.stats("pkg/sub/") == Entry("sub/", "pkg/sub/", 2, 5)
+    assert index.page("pkg/") == (
+        [
+            Entry("__init__.py", "pkg/__init__.py", 1, 1),
+            Entry("sub/", "pkg/sub/", 2, 5),
+        ],
+        None,
+    )
+    assert "pkg/sub/" in index
+    assert "pkg/sub/a.py" not in index
+    with pytest.raises(KeyError):
+        index.page("nope/")
+
+
+def test_pages():
+    index = _index({f"data/{i:03}.json": i for i in range(25)})
+
+    entries, cursor = index.page("data/", limit=10)
+    names = [entry.name for entry in entries]
+    while cursor is not None:
+        entries, cursor = index.page("data/", after=cursor, limit=10)
+        names.extend(entry.name for entry in entries)
+
+    assert names == [f"{i:03}.json" for i in range(25)]
+    assert index.page("data/", after="024.json") == ([], None)
@@ -0,0 +1,31 @@
+import os
+
+import inspector.utilities
+
+
+def test_requests_session_is_shared():
+    session = inspector.utilities.requests_session()
+
+    assert inspector.utilities.requests_session() is session
+    assert inspector.utilities.requests_session("other") is not session
+    assert session.headers["User-Agent"] == "inspector.pypi.io"
+
+
+def test_requests_session_is_not_shared_after_fork(monkeypatch):
+    session = inspector.utilities.requests_session()
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+
+    assert inspector.utilities.requests_session() is not session
+
+
+def test_requests_session_defaults():
+    session = inspector.utilities.requests_session()
+    adapter = session.get_adapter("https://files.pythonhosted.org/")
+
+    assert session.timeout == (
+        inspector.utilities.HTTP_CONNECT_TIMEOUT,
+        inspector.utilities.HTTP_READ_TIMEOUT,
+    )
+    assert adapter.max_retries.total == inspector.utilities.HTTP_RETRIES
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert adapter._pool_maxsize == inspector.utilities.HTTP_POOL_SIZE